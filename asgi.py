@@ -0,0 +1,287 @@
+"""
+ASGI entry point for French Learning App
+=========================================
+Used by asyncio servers such as uvicorn or hypercorn:
+
+    uvicorn asgi:app --workers 2
+
+The quiz and review JSON endpoints polled by quiz.js and flashcard.js
+are served natively with async_api.py, so an idle or slow client holds
+a coroutine, not a thread:
+
+    GET  /user/<name>/quiz/question/<cat>
+    GET  /user/<name>/quiz/questions/<cat>?count=&exclude=
+    POST /user/<name>/quiz/answer
+    POST /user/<name>/flashcard/review
+
+Every other path is handed to the Flask app (web/app.py) on a separate
+thread pool (FRENCH_LEARNING_WSGI_THREADS, default 8), with the response
+buffered, so pages, images and /metrics work unchanged and slow pages
+cannot take the database threads the endpoints above wait on.
+
+WebSocket connections are refused (closed before the handshake is
+accepted), and other scope types are ignored.
+
+Responses from the native endpoints match the Flask routes', and they
+are counted in the request metrics, but they skip the Flask before and
+after request hooks: no Server-Timing header, query budget check,
+profiler or tracing span for the request (the traced module functions
+still record their spans, as trace roots).
+"""
+
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import async_api
+from web.app import app as flask_app, REQUEST_SECONDS, REQUESTS
+
+WSGI_THREADS = int(os.environ.get('FRENCH_LEARNING_WSGI_THREADS', '8'))
+
+# Threads running the Flask app, apart from async_api's database pool
+_wsgi_executor = None
+
+# Request headers whose repeated values are joined with "; " rather than ","
+# when folded into one WSGI environ value
+SEMICOLON_JOINED_HEADERS = {'HTTP_COOKIE'}
+
+# (method, path pattern, endpoint); endpoint names match the Flask views and HANDLERS
+ROUTES = [
+    ('GET', re.compile(r'^/user/([^/]+)/quiz/question/([^/]+)$'), 'get_quiz'),
+    ('GET', re.compile(r'^/user/([^/]+)/quiz/questions/([^/]+)$'), 'get_quiz_batch'),
+    ('POST', re.compile(r'^/user/([^/]+)/quiz/answer$'), 'submit_quiz_answer'),
+    ('POST', re.compile(r'^/user/([^/]+)/flashcard/review$'), 'submit_review'),
+]
+
+
+class BadRequest(Exception):
+    """Client error answered with a 400 JSON error."""
+
+
+async def get_quiz(request, name, cat):
+    """Get a quiz question."""
+    question = await async_api.get_quiz_question(name, cat)
+    if question is None:
+        return 400, {'error': 'Not enough cards for quiz'}
+    return 200, question
+
+
+async def get_quiz_batch(request, name, cat):
+    """Get a batch of quiz questions (count, exclude query params as in web/app.py)."""
+    count = request['query'].get('count', ['5'])[0]
+    count = int(count) if count.lstrip('-').isdigit() else 5
+    exclude = request['query'].get('exclude', [''])[0]
+    exclude_ids = [int(x) for x in exclude.split(',') if x.strip().isdigit()]
+
+    questions = await async_api.get_quiz_questions(name, cat, count=count, exclude_ids=exclude_ids)
+    if questions is None:
+        return 400, {'error': 'Not enough cards for quiz'}
+    return 200, {'questions': questions}
+
+
+async def submit_quiz_answer(request, name):
+    """Submit a quiz answer."""
+    data = request['json']()
+    card_id = data.get('card_id')
+    correct = data.get('correct')
+    if card_id is None or correct is None:
+        return 400, {'error': 'Missing card_id or correct'}
+    return 200, await async_api.answer_quiz(name, card_id, correct)
+
+
+async def submit_review(request, name):
+    """Submit a flashcard review."""
+    data = request['json']()
+    card_id = data.get('card_id')
+    quality = data.get('quality')
+    if card_id is None or quality is None:
+        return 400, {'error': 'Missing card_id or quality'}
+    return 200, await async_api.review_card(name, card_id, quality)
+
+
+HANDLERS = {
+    'get_quiz': get_quiz,
+    'get_quiz_batch': get_quiz_batch,
+    'submit_quiz_answer': submit_quiz_answer,
+    'submit_review': submit_review,
+}
+
+
+async def read_body(receive) -> bytes:
+    """Read the whole request body."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_response(send, status: int, headers: list, body: bytes):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def wsgi_environ(scope: dict, body: bytes) -> dict:
+    """Build a WSGI environ for an ASGI HTTP request."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        if key in environ:
+            separator = '; ' if key in SEMICOLON_JOINED_HEADERS else ','
+            value = f"{environ[key]}{separator}{value}"
+        environ[key] = value
+    return environ
+
+
+def get_wsgi_executor() -> ThreadPoolExecutor:
+    """The Flask app's thread pool, created on first use."""
+    global _wsgi_executor
+    if _wsgi_executor is None:
+        _wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+    return _wsgi_executor
+
+
+def call_wsgi(environ: dict) -> tuple:
+    """Run the Flask app on one request; returns (status, headers, body)."""
+    response = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return written.append
+
+    result = flask_app(environ, start_response)
+    try:
+        for chunk in result:
+            written.append(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], b''.join(written)
+
+
+async def handle_http(scope, receive, send):
+    method = scope['method']
+    path = scope['path']
+
+    for route_method, pattern, endpoint in ROUTES:
+        match = pattern.match(path)
+        if match and method == route_method:
+            break
+    else:
+        body = await read_body(receive)
+        call = functools.partial(contextvars.copy_context().run, call_wsgi, wsgi_environ(scope, body))
+        status, headers, content = await asyncio.get_running_loop().run_in_executor(get_wsgi_executor(), call)
+        await send_response(send, status, headers, content)
+        return
+
+    start = time.perf_counter()
+    body = await read_body(receive)
+
+    def parse_json():
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            raise BadRequest('Invalid JSON body')
+        if not isinstance(data, dict):
+            raise BadRequest('Expected a JSON object')
+        return data
+
+    request = {
+        'query': parse_qs(scope.get('query_string', b'').decode('latin-1')),
+        'json': parse_json,
+    }
+    # scope['path'] is already percent-decoded
+    args = list(match.groups())
+
+    try:
+        status, data = await HANDLERS[endpoint](request, *args)
+    except BadRequest as e:
+        status, data = 400, {'error': str(e)}
+    except Exception:
+        flask_app.logger.exception("Error in %s %s", method, path)
+        status, data = 500, {'error': 'Internal server error'}
+
+    content = json.dumps(data, sort_keys=True).encode('utf-8')
+    await send_response(send, status, [(b'content-type', b'application/json'),
+                                       (b'content-length', str(len(content)).encode())], content)
+
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=method)
+    REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+
+
+async def handle_lifespan(receive, send):
+    global _wsgi_executor
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.get_running_loop().run_in_executor(None, async_api.shutdown)
+            if _wsgi_executor is not None:
+                _wsgi_executor.shutdown(wait=False)
+                _wsgi_executor = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def handle_websocket(receive, send):
+    """Refuse a WebSocket connection; the app has no WebSocket endpoints."""
+    message = await receive()
+    if message['type'] == 'websocket.connect':
+        # Closing before accepting makes the server reject the handshake (HTTP 403)
+        await send({'type': 'websocket.close', 'code': 1000})
+
+
+async def app(scope, receive, send):
+    """ASGI application."""
+    if scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+    elif scope['type'] == 'websocket':
+        await handle_websocket(receive, send)
+
+
+application = app
@@ -0,0 +1,108 @@
+"""
+Async API
+=========
+Awaitable versions of the core functions, for asyncio code such as the
+ASGI app in asgi.py:
+
+    due = await get_due_cards('Jack', category='animals')
+    result = await review_card('Jack', card_id, 4)
+
+The functions themselves stay synchronous. Each call runs on a bounded
+pool of database threads (FRENCH_LEARNING_DB_THREADS, default 8) and the
+coroutine waits without holding a thread, so thousands of mostly idle
+clients cost coroutines rather than threads. Every pool thread pins one
+read-only connection for its lifetime (database.pin_read_connection),
+so reads don't reconnect per call. Writes go through writer.py as
+everywhere else; set FRENCH_LEARNING_SINGLE_WRITER so pool threads hand
+them to the writer thread instead of competing for the lock.
+
+The caller's context variables (current trace span, query stats) are
+carried into the pool thread.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from database import pin_read_connection
+import progress
+import quiz
+import spaced_repetition
+import users
+
+DB_THREADS = int(os.environ.get('FRENCH_LEARNING_DB_THREADS', '8'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """The database thread pool, created on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='db',
+                                               initializer=pin_read_connection)
+    return _executor
+
+
+def shutdown(wait: bool = True):
+    """Stop the thread pool (a new one is started by the next call)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def run(fn, *args, **kwargs):
+    """
+    Run a synchronous function on the database pool and await its result.
+
+    Args:
+        fn: Function to call as fn(*args, **kwargs)
+
+    Returns:
+        Whatever fn returns
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+async def get_due_cards(user: str, category: str = None, topic: str = None, limit: int = 20) -> list:
+    """Awaitable spaced_repetition.get_due_cards."""
+    return await run(spaced_repetition.get_due_cards, user, category, topic, limit)
+
+
+async def review_card(user: str, card_id: int, quality: int) -> dict:
+    """Awaitable spaced_repetition.review_card."""
+    return await run(spaced_repetition.review_card, user, card_id, quality)
+
+
+async def get_quiz_question(user: str, category: str) -> dict:
+    """Awaitable quiz.get_quiz_question."""
+    return await run(quiz.get_quiz_question, user, category)
+
+
+async def get_quiz_questions(user: str, category: str, count: int = 5, exclude_ids: list = None) -> list:
+    """Awaitable quiz.get_quiz_questions."""
+    return await run(quiz.get_quiz_questions, user, category, count, exclude_ids)
+
+
+async def answer_quiz(user: str, card_id: int, correct: bool) -> dict:
+    """Awaitable quiz.answer_quiz."""
+    return await run(quiz.answer_quiz, user, card_id, correct)
+
+
+async def get_summary(user: str) -> dict:
+    """Awaitable progress.get_summary."""
+    return await run(progress.get_summary, user)
+
+
+async def get_all_users() -> list:
+    """Awaitable users.get_all_users."""
+    return await run(users.get_all_users)
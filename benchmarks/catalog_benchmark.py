@@ -0,0 +1,119 @@
+"""
+Catalog Benchmark
+=================
+Compares memory per card and lookup speed of the compact catalog
+snapshot (catalog.CatalogSnapshot) against a dict-per-card snapshot.
+
+Usage:
+    python3 benchmarks/catalog_benchmark.py
+    python3 benchmarks/catalog_benchmark.py --sizes 10000 100000 1000000 --output catalog.json
+
+Each size is built in its own temporary database, so the app database
+is never touched.
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+# Importing search_benchmark points the app at a scratch database first
+from search_benchmark import build_database, _scratch_dir
+
+import database
+from catalog import load_catalog
+
+# Number of random lookups timed per size
+LOOKUPS = 100000
+
+
+def load_dict_catalog() -> dict:
+    """Load cards the dict-per-row way, with the same indexes."""
+    conn = database.get_connection()
+    cards = [dict(row) for row in conn.execute("SELECT * FROM cards ORDER BY category, priority, id")]
+    conn.close()
+
+    by_id, by_category, by_topic = {}, {}, {}
+    for card in cards:
+        by_id[card['id']] = card
+        by_category.setdefault(card['category'], []).append(card)
+        by_topic.setdefault(card['topic'], []).append(card)
+    return {'cards': cards, 'by_id': by_id, 'by_category': by_category, 'by_topic': by_topic}
+
+
+def measure_memory(loader):
+    """Return (result, bytes retained, load seconds) for a loader."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = loader()
+    seconds = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, seconds
+
+
+def time_lookups(get, ids) -> float:
+    """Average ns per lookup-and-read-french."""
+    start = time.perf_counter()
+    for card_id in ids:
+        get(card_id)['french']
+    return (time.perf_counter() - start) / len(ids) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compact vs dict catalog snapshots.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        path = Path(_scratch_dir) / f'catalog_{size}.db'
+        build_database(path, size)
+
+        dict_catalog, dict_bytes, dict_seconds = measure_memory(load_dict_catalog)
+        compact, compact_bytes, compact_seconds = measure_memory(load_catalog)
+
+        count = len(compact)
+        rng = random.Random(1)
+        ids = [rng.choice(compact.ids) for _ in range(LOOKUPS)]
+
+        dict_ns = time_lookups(dict_catalog['by_id'].__getitem__, ids)
+        compact_ns = time_lookups(compact.get, ids)
+
+        category = compact.categories[0]
+        start = time.perf_counter()
+        dict_scan = sum(1 for card in dict_catalog['by_category'][category] if card['priority'] == 1)
+        dict_scan_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        compact_scan = len(compact.select(category, priority=1))
+        compact_scan_ms = (time.perf_counter() - start) * 1000
+        assert dict_scan == compact_scan
+
+        result = {
+            'cards': count,
+            'dict': {'bytes_per_card': round(dict_bytes / count, 1), 'load_seconds': round(dict_seconds, 2),
+                     'lookup_ns': round(dict_ns), 'tier_select_ms': round(dict_scan_ms, 3)},
+            'compact': {'bytes_per_card': round(compact_bytes / count, 1), 'load_seconds': round(compact_seconds, 2),
+                        'lookup_ns': round(compact_ns), 'tier_select_ms': round(compact_scan_ms, 3)},
+        }
+        results.append(result)
+        print(f"{count:>9,} cards  "
+              f"dict {result['dict']['bytes_per_card']:7.1f} B/card {result['dict']['lookup_ns']:6} ns/lookup  "
+              f"compact {result['compact']['bytes_per_card']:7.1f} B/card {result['compact']['lookup_ns']:6} ns/lookup  "
+              f"tier select {dict_scan_ms:.2f}ms -> {compact_scan_ms:.2f}ms")
+
+        del dict_catalog, compact
+        path.unlink()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
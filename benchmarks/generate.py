@@ -0,0 +1,307 @@
+"""
+Synthetic Data Generator
+========================
+Builds a database of synthetic users, cards and review history at a
+configurable scale, for benchmarking.
+
+Usage:
+    python3 benchmarks/generate.py out.db --scale medium
+    python3 benchmarks/generate.py out.db --users 10000 --cards 50000 --reviews 5000 --seed 7
+
+Generation is deterministic for a given seed and scale. Review history
+is shaped like real use rather than uniform noise:
+
+    - learner activity is heavy-tailed (a few very active learners, a
+      long tail of light ones), and some learners have lapsed
+    - learners study one to three categories, working through cards in
+      priority order as the app unlocks them
+    - each studied card carries an SM-2 history replayed through
+      calculate_sm2, so progress rows agree with review_history and a
+      realistic share of cards is due today
+    - quality ratings skew towards 3-5, and weaker learners fail more
+
+The target database is replaced if it exists.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Point the app at a scratch database before any app module is imported
+_scratch_dir = tempfile.mkdtemp(prefix='french_generate_')
+os.environ['FRENCH_LEARNING_DB'] = str(Path(_scratch_dir) / 'bootstrap.db')
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import database
+from spaced_repetition import calculate_sm2
+
+# (users, cards, mean reviews per user)
+SCALES = {
+    'tiny': (20, 1000, 100),
+    'small': (100, 5000, 300),
+    'medium': (1000, 20000, 1000),
+    'large': (10000, 50000, 5000),
+}
+
+# Category -> share of the deck; quiz categories get emoji images
+CATEGORIES = {
+    'general': 0.45, 'podcast': 0.15, 'sentence_frames': 0.08,
+    'animals': 0.08, 'colours': 0.04, 'body': 0.08, 'food_kids': 0.12,
+}
+QUIZ_CATEGORIES = {'animals', 'colours', 'body', 'food_kids'}
+EMOJI = ['🐶', '🐱', '🐭', '🐰', '🦊', '🐻', '🐼', '🐸', '🍎', '🍌', '🍇', '🍓', '🥕',
+         '🍞', '🧀', '👁️', '👂', '👃', '👄', '✋', '🦶', '🔴', '🟢', '🔵', '🟡', '⚫']
+
+# Priority tier -> share of each category (earlier tiers are core vocabulary)
+PRIORITY_SHARES = {1: 0.1, 2: 0.15, 3: 0.25, 4: 0.25, 5: 0.25}
+
+SYLLABLES = ['bon', 'jour', 'mer', 'ci', 'é', 'lè', 've', 'ma', 'ison', 'chat', 'pè', 're',
+             'fê', 'te', 'ça', 'va', 'où', 'gar', 'çon', 'noë', 'l', 'crè', 'me', 'trè', 's']
+ENGLISH = ['hello', 'thank', 'pupil', 'house', 'cat', 'father', 'party', 'boy', 'cream',
+           'very', 'where', 'station', 'good', 'day', 'green', 'blue', 'dog', 'bread']
+TOPICS_PER_CATEGORY = 12
+
+# Quality weights for ratings 0-5 for an average learner
+QUALITY_WEIGHTS = [0.03, 0.05, 0.07, 0.25, 0.35, 0.25]
+
+# Rows per executemany batch
+INSERT_BATCH = 50000
+
+
+def random_word(rng) -> str:
+    """Build a French-looking word from random syllables."""
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def generate_cards(rng, count: int) -> dict:
+    """
+    Build synthetic card rows.
+
+    Returns:
+        dict: category -> list of card tuples in priority order
+    """
+    decks = {}
+    for category, share in CATEGORIES.items():
+        size = max(len(PRIORITY_SHARES), round(count * share))
+        rows = []
+        for priority, tier_share in PRIORITY_SHARES.items():
+            for _ in range(max(1, round(size * tier_share))):
+                image = rng.choice(EMOJI) if category in QUIZ_CATEGORIES else None
+                rows.append((
+                    category, f"{category}_topic_{rng.randrange(TOPICS_PER_CATEGORY)}",
+                    ' '.join(random_word(rng) for _ in range(rng.randint(1, 3))),
+                    ' '.join(rng.choice(ENGLISH) for _ in range(rng.randint(1, 2))),
+                    random_word(rng).upper(), priority, image
+                ))
+        decks[category] = rows
+    return decks
+
+
+def quality_weights(skill: float) -> list:
+    """Shift the quality distribution towards failures for weaker learners."""
+    weights = list(QUALITY_WEIGHTS)
+    for q in range(3):
+        weights[q] *= 2 - skill
+    for q in range(3, 6):
+        weights[q] *= 0.5 + skill
+    return weights
+
+
+def simulate_card(rng, weights: list, reviews: int, last_day: int, days: int):
+    """
+    Replay an SM-2 history for one card.
+
+    Reviews stop early once the gaps between them would reach back past
+    the start of the history, as they would for a real learner.
+
+    Args:
+        rng: Random generator
+        weights: Quality weights for the learner
+        reviews: Maximum number of reviews to simulate
+        last_day: Day offset (0 = today, 1 = yesterday...) of the last review
+        days: Oldest day offset allowed
+
+    Returns:
+        tuple: (progress values, [(day offset, quality), ...])
+    """
+    repetitions, ease, interval = 0, 2.5, 0
+    qualities, gaps = [], []
+    span = last_day
+    while len(qualities) < reviews:
+        if qualities:
+            # Gap before the next review: the interval set by this one,
+            # give or take a day or two of lateness
+            gap = max(1, interval + rng.randint(0, 2))
+            if span + gap > days:
+                break
+            span += gap
+            gaps.append(gap)
+        quality = rng.choices(range(6), weights=weights)[0]
+        qualities.append(quality)
+        repetitions, ease, interval = calculate_sm2(quality, repetitions, ease, interval)
+
+    # Day offsets from the first review to the last
+    history = []
+    day = span
+    for i, quality in enumerate(qualities):
+        history.append((day, quality))
+        if i < len(gaps):
+            day -= gaps[i]
+
+    return (ease, interval, repetitions), history
+
+
+def generate_database(path, users: int, cards: int, reviews: int, seed: int = 42,
+                      days: int = 365, progress=None) -> dict:
+    """
+    Build a synthetic database.
+
+    Args:
+        path: Database file to create (replaced if it exists)
+        users: Number of learners
+        cards: Approximate number of cards
+        reviews: Mean reviews per learner
+        seed: Random seed
+        days: Length of the simulated history in days
+        progress: Optional callback(users_done) for reporting
+
+    Returns:
+        dict: Row counts and build time
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    path = Path(path)
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    database.DB_PATH = path
+    database.init_db()
+
+    conn = database.get_connection()
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    cursor = conn.cursor()
+
+    # Cards, remembering the ids of each category in priority order
+    decks = generate_cards(rng, cards)
+    card_ids = {}
+    for category, rows in decks.items():
+        cursor.executemany("""
+            INSERT INTO cards (category, topic, french, english, pronunciation, priority, image)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        last_id = cursor.execute("SELECT MAX(id) FROM cards").fetchone()[0]
+        card_ids[category] = list(range(last_id - len(rows) + 1, last_id + 1))
+    database.bump_catalog_version(cursor)
+
+    # Learner activity is log-normal, scaled to the requested mean
+    activity = [rng.lognormvariate(0, 1.2) for _ in range(users)]
+    scale = reviews * users / sum(activity)
+
+    cursor.executemany("INSERT INTO users (name) VALUES (?)",
+                       [(f"learner{i:05d}",) for i in range(users)])
+    first_user = cursor.execute("SELECT MIN(id) FROM users WHERE name LIKE 'learner%'").fetchone()[0]
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    progress_rows, history_rows = [], []
+    totals = {'users': users, 'cards': sum(len(ids) for ids in card_ids.values()),
+              'progress': 0, 'reviews': 0}
+
+    def flush():
+        cursor.executemany("""
+            INSERT INTO progress (user_id, card_id, ease_factor, interval, repetitions,
+                                  next_review, last_reviewed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, progress_rows)
+        cursor.executemany("""
+            INSERT INTO review_history (user_id, card_id, quality, reviewed_at)
+            VALUES (?, ?, ?, ?)
+        """, history_rows)
+        totals['progress'] += len(progress_rows)
+        totals['reviews'] += len(history_rows)
+        progress_rows.clear()
+        history_rows.clear()
+
+    for i in range(users):
+        user_id = first_user + i
+        budget = max(1, round(activity[i] * scale))
+        skill = rng.betavariate(4, 2)
+        weights = quality_weights(skill)
+
+        # Most learners were active recently; some lapsed weeks or months ago
+        last_active = 0 if rng.random() < 0.6 else min(days - 1, int(rng.expovariate(1 / 30)))
+
+        # Cards studied: the first N of one to three categories, in priority order
+        per_card = 1 + rng.expovariate(1 / 4)
+        studied = []
+        for category in rng.sample(list(card_ids), rng.randint(1, 3)):
+            studied.extend(card_ids[category])
+        studied = studied[:max(1, math.ceil(budget / per_card))]
+
+        remaining = budget
+        for card_id in studied:
+            if remaining <= 0:
+                break
+            count = min(remaining, max(1, round(rng.expovariate(1 / per_card))))
+            last_day = min(days, last_active + rng.randint(0, 14))
+            (ease, interval, repetitions), history = simulate_card(rng, weights, count, last_day, days)
+            remaining -= len(history)
+
+            last_review = today - timedelta(days=history[-1][0], seconds=-rng.randrange(8 * 3600, 22 * 3600))
+            next_review = (last_review + timedelta(days=interval)).date()
+            progress_rows.append((user_id, card_id, ease, interval, repetitions,
+                                  next_review.isoformat(), last_review.strftime('%Y-%m-%d %H:%M:%S')))
+            for day, quality in history:
+                reviewed_at = today - timedelta(days=day, seconds=-rng.randrange(8 * 3600, 22 * 3600))
+                history_rows.append((user_id, card_id, quality, reviewed_at.strftime('%Y-%m-%d %H:%M:%S')))
+
+        if len(history_rows) >= INSERT_BATCH:
+            flush()
+            if progress:
+                progress(i + 1)
+
+    flush()
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    totals['seconds'] = round(time.perf_counter() - start, 2)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic French learning database.')
+    parser.add_argument('path', help='Database file to create')
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--users', type=int, help='Override the number of learners')
+    parser.add_argument('--cards', type=int, help='Override the number of cards')
+    parser.add_argument('--reviews', type=int, help='Override mean reviews per learner')
+    parser.add_argument('--days', type=int, default=365, help='Days of history')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    users, cards, reviews = SCALES[args.scale]
+    users = args.users or users
+    cards = args.cards or cards
+    reviews = args.reviews or reviews
+
+    def report(done):
+        print(f"  {done:,}/{users:,} users", end='\r', flush=True)
+
+    totals = generate_database(args.path, users, cards, reviews, seed=args.seed,
+                               days=args.days, progress=report)
+    print(f"{args.path}: {totals['users']:,} users, {totals['cards']:,} cards, "
+          f"{totals['progress']:,} progress rows, {totals['reviews']:,} reviews "
+          f"in {totals['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
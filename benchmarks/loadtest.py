@@ -0,0 +1,363 @@
+"""
+Load Test
+=========
+Drives web/app.py with many concurrent simulated learners replaying the
+real client flows, to find where throughput stops scaling and SQLite
+starts returning "database is locked".
+
+Each learner loops over sessions until the test ends:
+
+    flashcards  GET /user/<name>, GET /user/<name>/flashcard/<cat>, then
+                POST /user/<name>/flashcard/review for the due cards,
+                as flashcard.js does
+    quiz        GET /user/<name>/quiz/<cat>, fetch question batches from
+                /user/<name>/quiz/questions/<cat> (excluding answered
+                cards) and POST /user/<name>/quiz/answer, as quiz.js does
+
+Usage:
+    python3 benchmarks/loadtest.py --learners 16 --duration 30
+    python3 benchmarks/loadtest.py --gunicorn --workers 4 --learners 64
+    python3 benchmarks/loadtest.py --url http://127.0.0.1:8000 --db app.db
+
+By default the app runs in-process behind the Flask test client, against
+a database generated with benchmarks/generate.py (--scale) or a copy of
+--db. --gunicorn starts a local gunicorn on that database; --url targets
+a server you started yourself (its database must contain the learners,
+so pass the same --db).
+
+Reports throughput, p50/p95/p99 per route, and errors, with SQLITE_BUSY
+("database is locked") counted separately. In-process the exception is
+seen directly; with --gunicorn the server's log is scanned for it.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Question flow mirrors quiz.js
+QUIZ_BATCH = 5
+QUIZ_LENGTH = 10
+
+# Cards reviewed per flashcard session
+FLASHCARD_SESSION = 20
+
+QUIZ_CATEGORIES = ['animals', 'food_kids', 'colours', 'body']
+QUALITY_WEIGHTS = [3, 5, 7, 25, 35, 25]
+
+BUSY_MESSAGES = ('database is locked', 'database is busy')
+CARDS_PATTERN = re.compile(r'const cards = (.*);')
+
+
+class Stats:
+    """Latency samples and error counts per route, shared by all learners."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.busy = 0
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, status: int, busy: bool = False):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds * 1000)
+            if status >= 400:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            if busy:
+                self.busy += 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        total = 0
+        for route, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            total += len(samples)
+            routes[route] = {
+                'requests': len(samples),
+                'errors': self.errors.get(route, 0),
+                'p50_ms': round(statistics.median(samples), 2),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+                'max_ms': round(samples[-1], 2),
+            }
+        return {
+            'seconds': round(elapsed, 2),
+            'requests': total,
+            'requests_per_second': round(total / elapsed, 1) if elapsed else 0,
+            'errors': sum(self.errors.values()),
+            'sqlite_busy': self.busy,
+            'routes': routes,
+        }
+
+
+class TestClientTransport:
+    """Sends requests through the Flask test client (one per learner)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, body: dict = None):
+        """Return (status, text, busy)."""
+        try:
+            response = self.client.open(path, method=method, json=body)
+        except Exception as e:
+            return 500, '', any(message in str(e) for message in BUSY_MESSAGES)
+        return response.status_code, response.get_data(as_text=True), False
+
+
+class HTTPTransport:
+    """Sends requests over a keep-alive HTTP connection (one per learner)."""
+
+    def __init__(self, base_url: str):
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.conn = None
+
+    def request(self, method: str, path: str, body: dict = None):
+        """Return (status, text, busy); busy is found in the server log instead."""
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                return response.status, response.read().decode('utf-8', 'replace'), False
+            except (http.client.HTTPException, ConnectionError):
+                # Server closed the keep-alive connection; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+class Learner:
+    """One simulated learner running flashcard and quiz sessions."""
+
+    def __init__(self, name: str, transport, stats: Stats, categories: list,
+                 rng: random.Random, think: float):
+        self.name = urllib.parse.quote(name)
+        self.transport = transport
+        self.stats = stats
+        self.categories = categories
+        self.quiz_categories = [c for c in QUIZ_CATEGORIES if c in categories]
+        self.rng = rng
+        self.think = think
+
+    def call(self, route: str, method: str, path: str, body: dict = None):
+        start = time.perf_counter()
+        status, text, busy = self.transport.request(method, path, body)
+        self.stats.record(route, time.perf_counter() - start, status, busy)
+        return status, text
+
+    def pause(self):
+        if self.think:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think)
+
+    def flashcard_session(self, deadline: float):
+        category = self.rng.choice(self.categories)
+        self.call('user_dashboard', 'GET', f"/user/{self.name}")
+        status, html = self.call('flashcard_mode', 'GET', f"/user/{self.name}/flashcard/{category}")
+
+        match = CARDS_PATTERN.search(html) if status == 200 else None
+        cards = json.loads(match.group(1)) if match else []
+
+        for card in cards[:FLASHCARD_SESSION]:
+            if time.monotonic() > deadline:
+                return
+            self.pause()
+            quality = self.rng.choices(range(6), weights=QUALITY_WEIGHTS)[0]
+            self.call('submit_review', 'POST', f"/user/{self.name}/flashcard/review",
+                      {'card_id': card['id'], 'quality': quality})
+
+    def quiz_session(self, deadline: float):
+        category = self.rng.choice(self.quiz_categories)
+        self.call('quiz_mode', 'GET', f"/user/{self.name}/quiz/{category}")
+
+        answered = []
+        while len(answered) < QUIZ_LENGTH and time.monotonic() < deadline:
+            exclude = ','.join(str(card_id) for card_id in answered)
+            status, text = self.call('get_quiz_batch', 'GET',
+                                     f"/user/{self.name}/quiz/questions/{category}"
+                                     f"?count={QUIZ_BATCH}&exclude={exclude}")
+            if status != 200:
+                return
+            questions = json.loads(text)['questions']
+            if not questions:
+                return
+            for question in questions:
+                if len(answered) >= QUIZ_LENGTH or time.monotonic() > deadline:
+                    return
+                self.pause()
+                card_id = question['card']['id']
+                self.call('submit_quiz_answer', 'POST', f"/user/{self.name}/quiz/answer",
+                          {'card_id': card_id, 'correct': self.rng.random() < 0.8})
+                answered.append(card_id)
+
+    def run(self, deadline: float):
+        while time.monotonic() < deadline:
+            if self.quiz_categories and self.rng.random() < 0.4:
+                self.quiz_session(deadline)
+            else:
+                self.flashcard_session(deadline)
+
+
+def pick_learners(db_path, count: int, seed: int) -> tuple:
+    """Choose learner names and the categories they can study."""
+    conn = sqlite3.connect(db_path)
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM users WHERE deleted_at IS NULL ORDER BY id")]
+    categories = [row[0] for row in conn.execute("SELECT DISTINCT category FROM cards ORDER BY category")]
+    conn.close()
+
+    rng = random.Random(seed)
+    return rng.sample(names, min(count, len(names))), categories
+
+
+def start_gunicorn(db_path, workers: int, port: int, log_path):
+    """Start gunicorn serving web/app.py on the database; returns (process, base_url)."""
+    env = dict(os.environ, FRENCH_LEARNING_DB=str(db_path), FLASK_DEBUG='false')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--chdir', str(PROJECT_ROOT / 'web'),
+         '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app'],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    # Wait until it accepts connections
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/users')
+            conn.getresponse().read()
+            conn.close()
+            return process, base_url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited; see {log_path}")
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not start; see {log_path}")
+
+
+def count_busy_in_log(log_path) -> int:
+    with open(log_path, errors='replace') as f:
+        return sum(1 for line in f if any(message in line for message in BUSY_MESSAGES))
+
+
+def prepare_database(args, scratch: Path) -> Path:
+    """Generate or copy the database under test."""
+    db_path = scratch / 'loadtest.db'
+    if args.db:
+        if args.url:
+            return Path(args.db)
+        src = sqlite3.connect(args.db)
+        dst = sqlite3.connect(db_path)
+        src.backup(dst)
+        src.close()
+        dst.close()
+    else:
+        from generate import SCALES, generate_database
+        users, cards, reviews = SCALES[args.scale]
+        generate_database(db_path, max(users, args.learners), cards, reviews, seed=args.seed)
+    return db_path
+
+
+def print_report(report: dict):
+    print(f"\n{report['requests']:,} requests in {report['seconds']}s "
+          f"= {report['requests_per_second']} req/s, {report['errors']} errors, "
+          f"{report['sqlite_busy']} SQLITE_BUSY")
+    print(f"  {'route':<22} {'requests':>9} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for route, stats in report['routes'].items():
+        print(f"  {route:<22} {stats['requests']:>9,} {stats['errors']:>7} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the web app with simulated learners.')
+    parser.add_argument('--learners', type=int, default=16, help='Concurrent simulated learners')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--think', type=float, default=0, help='Mean pause between answers in seconds')
+    parser.add_argument('--scale', default='small', help='Scale from benchmarks/generate.py')
+    parser.add_argument('--db', help='Use a copy of this database instead of generating one')
+    parser.add_argument('--url', help='Target an already running server')
+    parser.add_argument('--gunicorn', action='store_true', help='Start a local gunicorn server')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(prefix='french_loadtest_'))
+    # Point in-process app modules at the scratch directory before importing them
+    os.environ['FRENCH_LEARNING_DB'] = str(scratch / 'loadtest.db')
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    db_path = prepare_database(args, scratch)
+    names, categories = pick_learners(db_path, args.learners, args.seed)
+
+    server = None
+    log_path = scratch / 'gunicorn.log'
+    if args.url:
+        base_url = args.url
+    elif args.gunicorn:
+        server, base_url = start_gunicorn(db_path, args.workers, args.port, log_path)
+    else:
+        os.environ['FRENCH_LEARNING_DB'] = str(db_path)
+        sys.path.insert(0, str(PROJECT_ROOT / 'web'))
+        import database
+        database.DB_PATH = db_path
+        from app import app
+        app.config['PROPAGATE_EXCEPTIONS'] = True
+        base_url = None
+
+    stats = Stats()
+    learners = []
+    for i, name in enumerate(names):
+        transport = HTTPTransport(base_url) if base_url else TestClientTransport(app)
+        learners.append(Learner(name, transport, stats, categories,
+                                random.Random(args.seed + i), args.think))
+
+    mode = base_url or 'in-process'
+    print(f"{len(learners)} learners for {args.duration}s against {mode}")
+
+    deadline = time.monotonic() + args.duration
+    start = time.perf_counter()
+    threads = [threading.Thread(target=learner.run, args=(deadline,), daemon=True) for learner in learners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = stats.report(time.perf_counter() - start)
+    report.update({'learners': len(learners), 'mode': mode})
+
+    if server:
+        server.terminate()
+        server.wait()
+        report['sqlite_busy'] += count_busy_in_log(log_path)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Query Budget Check
+==================
+Requests every page and API route once and compares the number of SQL
+statements each runs with ROUTE_QUERY_BUDGETS in web/app.py.
+
+Usage:
+    python3 benchmarks/query_budgets.py
+
+Runs against a fresh scratch database holding the default deck and
+users (the data the budgets were measured on), with
+FRENCH_LEARNING_QUERY_BUDGETS enabled so an over-budget route fails the
+same way it would in a test. Exits 1 if any route is over budget.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Point the app at a scratch database before any app module is imported
+_scratch_dir = tempfile.mkdtemp(prefix='french_query_budgets_')
+os.environ['FRENCH_LEARNING_DB'] = str(Path(_scratch_dir) / 'budgets.db')
+os.environ['FRENCH_LEARNING_QUERY_BUDGETS'] = 'true'
+
+# Add project root and web app to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'web'))
+
+from app import app, ROUTE_QUERY_BUDGETS
+from query_stats import QueryBudgetExceeded, track
+
+USER = 'Jack'
+CATEGORY = 'animals'
+
+# (method, path, JSON body) per endpoint, in the order a learner would visit them
+REQUESTS = {
+    'home': ('GET', '/', None),
+    'user_dashboard': ('GET', f'/user/{USER}', None),
+    'flashcard_mode': ('GET', f'/user/{USER}/flashcard/{CATEGORY}', None),
+    'submit_review': ('POST', f'/user/{USER}/flashcard/review', {'card_id': 1, 'quality': 4}),
+    'quiz_mode': ('GET', f'/user/{USER}/quiz/{CATEGORY}', None),
+    'get_quiz': ('GET', f'/user/{USER}/quiz/question/{CATEGORY}', None),
+    'get_quiz_batch': ('GET', f'/user/{USER}/quiz/questions/{CATEGORY}?count=5', None),
+    'submit_quiz_answer': ('POST', f'/user/{USER}/quiz/answer', {'card_id': 1, 'correct': True}),
+    'progress_page': ('GET', f'/user/{USER}/progress', None),
+    'api_users': ('GET', '/api/users', None),
+    'api_user_stats': ('GET', f'/api/user/{USER}/stats', None),
+}
+
+
+def main():
+    app.config['TESTING'] = True
+    client = app.test_client()
+
+    # Warm module-level caches so budgets measure steady-state requests
+    # (the first requests also load the catalog and create the user)
+    app.config['ENFORCE_QUERY_BUDGETS'] = False
+    for method, path, body in REQUESTS.values():
+        client.open(path, method=method, json=body)
+    app.config['ENFORCE_QUERY_BUDGETS'] = True
+
+    failures = 0
+    print(f"  {'endpoint':<20} {'statements':>10} {'budget':>7} {'connections':>12}")
+    for endpoint, (method, path, body) in REQUESTS.items():
+        error = None
+        with track() as stats:
+            try:
+                client.open(path, method=method, json=body)
+            except QueryBudgetExceeded as e:
+                error = e
+
+        budget = ROUTE_QUERY_BUDGETS.get(endpoint)
+        mark = '  OVER' if error else ''
+        print(f"  {endpoint:<20} {stats.statements:>10} {budget if budget is not None else '-':>7} "
+              f"{stats.connections:>12}{mark}")
+        if error:
+            failures += 1
+            print(f"      {error}")
+
+    missing = set(ROUTE_QUERY_BUDGETS) - set(REQUESTS)
+    if missing:
+        print(f"\nBudgets without a request here: {', '.join(sorted(missing))}")
+
+    if failures:
+        print(f"\n{failures} route(s) over budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Query Plan Guard
+================
+Captures every SQL statement the app runs during the benchmark workload
+and checks its EXPLAIN QUERY PLAN against a checked-in baseline.
+
+Usage:
+    python3 benchmarks/query_plans.py            # check, exit 1 on regressions
+    python3 benchmarks/query_plans.py --update   # accept current plans as the baseline
+    python3 benchmarks/query_plans.py --show     # print every captured plan
+
+The workload is the benchmark suite from benchmarks/run.py (every public
+function of vocabulary, spaced_repetition, progress and quiz, plus the
+web pages) run against a generated database, with a statement hook from
+database.add_statement_hook recording each distinct statement and one set
+of its parameters.
+
+A check fails when, compared with benchmarks/query_plans.json:
+    - a statement scans a large table it used to search by index
+    - a statement stops using an index it used before
+    - a new statement scans a large table
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+# Importing generate points app modules at a scratch database first
+from generate import SCALES, generate_database, _scratch_dir
+
+import database
+
+BASELINE_PATH = Path(__file__).parent / 'query_plans.json'
+
+# Tables big enough that a full scan is a regression
+LARGE_TABLES = {'cards', 'progress', 'review_history', 'users'}
+
+# Statements whose plans are not interesting
+SKIP_PATTERN = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|PRAGMA|CREATE|DROP|ALTER|ANALYZE|EXPLAIN|SAVEPOINT|RELEASE)\b',
+                          re.IGNORECASE)
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+SQL_KEYWORDS = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'ON', 'GROUP', 'ORDER', 'LIMIT', 'SET', 'VALUES',
+                'SELECT', 'USING', 'AND', 'OR', 'UNION', 'WITH', 'AS', 'CROSS', 'OUTER'}
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so the same statement always has the same key."""
+    return ' '.join(sql.split())
+
+
+def capture_statements(workload) -> dict:
+    """
+    Run a workload and record each distinct statement it executes.
+
+    Args:
+        workload: Callable running the code under test
+
+    Returns:
+        dict: Normalized SQL -> parameters of its first execution
+    """
+    statements = {}
+
+    def hook(sql, params, seconds):
+        key = normalize_sql(sql)
+        if key not in statements and not SKIP_PATTERN.match(key):
+            if isinstance(params, list) and params and isinstance(params[0], (tuple, list, dict)):
+                params = params[0]  # executemany: plan the first row
+            statements[key] = params
+
+    database.add_statement_hook(hook)
+    try:
+        workload()
+    finally:
+        database.remove_statement_hook(hook)
+
+    return statements
+
+
+def table_aliases(sql: str) -> dict:
+    """Map the names and aliases used in a statement to table names."""
+    aliases = {}
+    for table, alias in TABLE_PATTERN.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def explain(conn, sql: str, params) -> dict:
+    """
+    Get the query plan of a statement.
+
+    Returns:
+        dict: {'plan': [details], 'scans': [tables], 'indexes': [index names]}
+    """
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    aliases = table_aliases(sql)
+
+    plan, scans, indexes = [], set(), set()
+    for row in rows:
+        detail = row['detail']
+        plan.append(detail)
+        if 'VIRTUAL TABLE' in detail:
+            continue
+        match = re.match(r'(SCAN|SEARCH) (\w+)', detail)
+        if not match:
+            continue
+        table = aliases.get(match.group(2), match.group(2))
+        if match.group(1) == 'SCAN':
+            scans.add(table)
+        index = re.search(r'USING (?:COVERING )?INDEX (\w+)', detail)
+        if index:
+            indexes.add(index.group(1))
+        elif 'INTEGER PRIMARY KEY' in detail:
+            indexes.add(f"{table}:rowid")
+
+    return {'plan': plan, 'scans': sorted(scans), 'indexes': sorted(indexes)}
+
+
+def explain_all(statements: dict) -> dict:
+    """EXPLAIN every captured statement (statements that fail to plan are skipped)."""
+    conn = database.get_connection()
+    plans = {}
+    for sql, params in sorted(statements.items()):
+        try:
+            plans[sql] = explain(conn, sql, params)
+        except Exception as e:
+            plans[sql] = {'plan': [], 'scans': [], 'indexes': [], 'error': str(e)}
+    conn.close()
+    return plans
+
+
+def compare(baseline: dict, current: dict) -> list:
+    """
+    Compare plans against the baseline.
+
+    Returns:
+        list: Human-readable regressions (empty if none)
+    """
+    problems = []
+    for sql, plan in current.items():
+        large_scans = set(plan['scans']) & LARGE_TABLES
+        old = baseline.get(sql)
+        if old is None:
+            if large_scans:
+                problems.append(f"new statement scans {', '.join(sorted(large_scans))}:\n    {sql}")
+            continue
+
+        new_scans = large_scans - set(old['scans'])
+        if new_scans:
+            problems.append(f"now scans {', '.join(sorted(new_scans))}:\n    {sql}")
+
+        lost = set(old['indexes']) - set(plan['indexes'])
+        if lost:
+            problems.append(f"no longer uses {', '.join(sorted(lost))}:\n    {sql}")
+
+    return problems
+
+
+def run_workload(scale: str, seed: int):
+    """Generate a database and run the benchmark suite's functions against it."""
+    from run import build_benchmarks, build_contexts
+
+    db_path = Path(_scratch_dir) / 'plans.db'
+    users, cards, reviews = SCALES[scale]
+    generate_database(db_path, users, cards, reviews, seed=seed)
+
+    contexts = build_contexts(db_path, seed)
+    benchmarks = build_benchmarks()
+
+    def workload():
+        for name, fn, _ in benchmarks:
+            if 'quiz' in name and contexts[0]['quiz_category'] is None:
+                continue
+            for ctx in contexts[:3]:
+                fn(ctx)
+
+    return capture_statements(workload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check SQL query plans against the baseline.')
+    parser.add_argument('--update', action='store_true', help='Write current plans as the new baseline')
+    parser.add_argument('--show', action='store_true', help='Print every captured plan')
+    parser.add_argument('--scale', default='small', help='Scale from benchmarks/generate.py')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    args = parser.parse_args()
+
+    current = explain_all(run_workload(args.scale, args.seed))
+
+    if args.show:
+        for sql, plan in current.items():
+            print(sql)
+            for detail in plan['plan']:
+                print(f"    {detail}")
+
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write('\n')
+        print(f"Recorded plans for {len(current)} statements in {args.baseline}")
+        return
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    problems = compare(baseline, current)
+    unseen = len(set(baseline) - set(current))
+
+    print(f"Checked {len(current)} statements against {len(baseline)} in the baseline"
+          + (f" ({unseen} baseline statements not exercised)" if unseen else ""))
+    for problem in problems:
+        print(f"  ! {problem}")
+
+    if problems:
+        print("\nFix the query or index, or run with --update if the change is intended.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Review Stress Test
+==================
+Hammers review_card from several processes and threads at once, all on
+the same few (user, card) pairs, then checks that every review was
+applied exactly once and in a consistent order.
+
+Usage:
+    python3 benchmarks/review_stress.py
+    python3 benchmarks/review_stress.py --processes 4 --threads 8 --reviews 100
+    python3 benchmarks/review_stress.py --single-writer --journal-mode wal
+
+Checks, against a fresh scratch database:
+    - review_history holds exactly one row per review_card call that
+      returned, and none for calls that failed
+    - replaying each pair's history through calculate_sm2, in commit
+      (row id) order, gives exactly the stored progress row, so no
+      review was computed from a stale read (a lost update) or applied
+      twice
+    - the repetitions returned to the callers of a pair are the same
+      sequence the replay produces
+
+Reports reviews per second and the busy retries counted by writer.py.
+Exits 1 if any check fails.
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def _configure(db_path: str, single_writer: bool, journal_mode: str):
+    """Point the app at the scratch database; call before importing app modules."""
+    os.environ['FRENCH_LEARNING_DB'] = db_path
+    os.environ['FRENCH_LEARNING_SINGLE_WRITER'] = 'true' if single_writer else 'false'
+    if journal_mode:
+        os.environ['FRENCH_LEARNING_JOURNAL_MODE'] = journal_mode
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def worker(db_path, single_writer, journal_mode, process_index, threads, reviews, pairs, seed, results):
+    """Run reviews from several threads of one process and report what happened."""
+    _configure(db_path, single_writer, journal_mode)
+    from spaced_repetition import review_card
+    import writer
+
+    done = []  # (user, card_id, quality, repetitions returned)
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def run(thread_index):
+        rng = random.Random(seed * 1000 + process_index * 100 + thread_index)
+        start.wait()
+        for _ in range(reviews):
+            user, card_id = rng.choice(pairs)
+            quality = rng.randint(0, 5)
+            try:
+                result = review_card(user, card_id, quality)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                done.append((user, card_id, quality, result['repetitions']))
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    results.put({
+        'done': done,
+        'errors': errors,
+        'retries': sum(writer.WRITE_RETRIES.values.values()),
+        'gave_up': sum(writer.DB_LOCKED.values.values()),
+    })
+
+
+def replay(history: list) -> tuple:
+    """Apply qualities in order from a new card; returns (reps, ease, interval, reps after each)."""
+    from spaced_repetition import calculate_sm2
+
+    repetitions, ease_factor, interval = 0, 2.5, 0
+    sequence = []
+    for quality in history:
+        repetitions, ease_factor, interval = calculate_sm2(quality, repetitions, ease_factor, interval)
+        sequence.append(repetitions)
+    return repetitions, ease_factor, interval, sequence
+
+
+def verify(db_path: str, done: list) -> list:
+    """
+    Compare the database with the reviews the workers saw succeed.
+
+    Returns:
+        list: Problems found (empty if consistent)
+    """
+    conn = sqlite3.connect(db_path)
+    problems = []
+
+    user_ids = dict(conn.execute("SELECT name, id FROM users").fetchall())
+    by_pair = {}
+    for user, card_id, quality, repetitions in done:
+        by_pair.setdefault((user_ids[user], card_id), []).append((quality, repetitions))
+
+    history_count = conn.execute("SELECT COUNT(*) FROM review_history").fetchone()[0]
+    if history_count != len(done):
+        problems.append(f"{history_count} history rows for {len(done)} successful reviews")
+
+    for (user_id, card_id), calls in sorted(by_pair.items()):
+        history = [row[0] for row in conn.execute(
+            "SELECT quality FROM review_history WHERE user_id = ? AND card_id = ? ORDER BY id",
+            (user_id, card_id))]
+        if sorted(history) != sorted(quality for quality, _ in calls):
+            problems.append(f"user {user_id} card {card_id}: history qualities differ from the calls made")
+            continue
+
+        repetitions, ease_factor, interval, sequence = replay(history)
+        row = conn.execute(
+            "SELECT repetitions, ease_factor, interval FROM progress WHERE user_id = ? AND card_id = ?",
+            (user_id, card_id)).fetchone()
+        if row is None:
+            problems.append(f"user {user_id} card {card_id}: no progress row")
+        elif row[0] != repetitions or row[2] != interval or not math.isclose(row[1], ease_factor):
+            problems.append(f"user {user_id} card {card_id}: progress {tuple(row)} but replaying "
+                            f"{len(history)} reviews gives {(repetitions, round(ease_factor, 4), interval)}")
+
+        if sorted(sequence) != sorted(reps for _, reps in calls):
+            problems.append(f"user {user_id} card {card_id}: callers saw repetitions that no serial order produces")
+
+    conn.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress concurrent review_card calls and check consistency.')
+    parser.add_argument('--processes', type=int, default=4, help='Worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per process')
+    parser.add_argument('--reviews', type=int, default=50, help='Reviews per thread')
+    parser.add_argument('--users', type=int, default=2, help='Users reviewing')
+    parser.add_argument('--cards', type=int, default=3, help='Cards per user (fewer means more contention)')
+    parser.add_argument('--single-writer', action='store_true', help='Enable the writer thread (writer.py)')
+    parser.add_argument('--journal-mode', help='Journal mode for the scratch database (e.g. wal)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='french_review_stress_')
+    db_path = str(Path(scratch_dir) / 'stress.db')
+
+    # Set up the database and users in a child, so this process holds no
+    # connections or threads when the workers start
+    context = multiprocessing.get_context('spawn')
+    setup = context.Process(target=_setup, args=(db_path, args.journal_mode, args.users))
+    setup.start()
+    setup.join()
+    if setup.exitcode != 0:
+        sys.exit("Setup failed")
+
+    pairs = [(f"stress{u:02d}", card_id) for u in range(args.users) for card_id in range(1, args.cards + 1)]
+    results = context.Queue()
+    workers = [context.Process(target=worker, args=(db_path, args.single_writer, args.journal_mode, i,
+                                                   args.threads, args.reviews, pairs, args.seed, results))
+               for i in range(args.processes)]
+
+    started = time.perf_counter()
+    for process in workers:
+        process.start()
+    reports = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    done = [review for report in reports for review in report['done']]
+    errors = [error for report in reports for error in report['errors']]
+    retries = sum(report['retries'] for report in reports)
+    gave_up = sum(report['gave_up'] for report in reports)
+
+    attempted = args.processes * args.threads * args.reviews
+    print(f"{len(done):,} of {attempted:,} reviews committed in {elapsed:.2f}s "
+          f"({len(done) / elapsed:,.0f}/s) by {args.processes}x{args.threads} threads "
+          f"on {len(pairs)} (user, card) pairs"
+          f"{', single writer' if args.single_writer else ''}"
+          f"{f', journal {args.journal_mode}' if args.journal_mode else ''}")
+    print(f"  busy retries: {retries:,}, gave up: {gave_up:,}, failed calls: {len(errors):,}")
+    for error in sorted(set(errors))[:5]:
+        print(f"    {error}")
+
+    _configure(db_path, False, None)
+    problems = verify(db_path, done)
+    if problems:
+        print(f"\n{len(problems)} consistency problem(s):")
+        for problem in problems[:20]:
+            print(f"  ! {problem}")
+        sys.exit(1)
+    print("  consistent: every committed review applied exactly once, in order")
+
+
+def _setup(db_path: str, journal_mode: str, users: int):
+    _configure(db_path, False, journal_mode)
+    from users import create_user
+    for u in range(users):
+        create_user(f"stress{u:02d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Scale Benchmark Suite
+=====================
+Times the public functions of vocabulary.py, spaced_repetition.py,
+progress.py and quiz.py (plus the home and dashboard pages, if Flask is
+installed) against synthetic databases of increasing size.
+
+Usage:
+    python3 benchmarks/run.py
+    python3 benchmarks/run.py --scales small medium large --repeat 50 --output results.json
+    python3 benchmarks/run.py --db existing.db
+
+Each scale is generated with benchmarks/generate.py into a temporary
+directory, then measured in a fresh interpreter so module-level caches
+(catalog, quiz indexes) start cold. Calls rotate through a seeded sample
+of learners, from the heaviest to typical ones. Write functions
+(review_card, answer_quiz, add/update/delete_card) are included; the
+database is thrown away afterwards.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Learners sampled per scale (the heaviest learner is always included)
+SAMPLE_USERS = 20
+
+# Functions that touch every user run only this many times
+SLOW_REPEAT = 1
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def time_calls(fn, contexts: list, repeat: int) -> dict:
+    """
+    Time fn(ctx) over repeat calls, rotating through contexts.
+
+    The first call is reported separately (cold caches) and left out of
+    the percentiles.
+
+    Returns:
+        dict: Latency stats in ms
+    """
+    start = time.perf_counter()
+    fn(contexts[0])
+    first = (time.perf_counter() - start) * 1000
+
+    samples = []
+    for i in range(repeat):
+        ctx = contexts[i % len(contexts)]
+        start = time.perf_counter()
+        fn(ctx)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+
+    return {
+        'calls': repeat,
+        'first_ms': round(first, 3),
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(_percentile(samples, 0.95), 3),
+        'max_ms': round(samples[-1], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def build_benchmarks() -> list:
+    """
+    List the benchmarks as (name, fn(ctx), repeat override or None).
+
+    Imports app modules, so FRENCH_LEARNING_DB must already point at the
+    database being measured.
+    """
+    import progress
+    import quiz
+    import spaced_repetition as sr
+    import vocabulary
+
+    def card_round_trip(c):
+        card_id = vocabulary.add_card('bench', 'bench', c['query'], 'bench')
+        vocabulary.update_card(card_id, pronunciation=c['query'])
+        vocabulary.delete_card(card_id)
+
+    benchmarks = [
+        # vocabulary
+        ('vocabulary.get_card', lambda c: vocabulary.get_card(c['card_id']), None),
+        ('vocabulary.get_cards', lambda c: vocabulary.get_cards(c['category']), None),
+        ('vocabulary.get_categories', lambda c: vocabulary.get_categories(), None),
+        ('vocabulary.get_topics', lambda c: vocabulary.get_topics(c['category']), None),
+        ('vocabulary.get_priorities', lambda c: vocabulary.get_priorities(c['category']), None),
+        ('vocabulary.card_count', lambda c: vocabulary.card_count(c['category']), None),
+        ('vocabulary.search_cards', lambda c: vocabulary.search_cards(c['query']), None),
+        ('vocabulary.add_update_delete_card', card_round_trip, None),
+
+        # spaced_repetition
+        ('spaced_repetition.get_due_cards', lambda c: sr.get_due_cards(c['user'], c['category']), None),
+        ('spaced_repetition.get_due_cards_all', lambda c: sr.get_due_cards(c['user']), None),
+        ('spaced_repetition.get_unlocked_priority',
+         lambda c: sr.get_unlocked_priority(c['user'], c['category']), None),
+        ('spaced_repetition.get_priority_status',
+         lambda c: sr.get_priority_status(c['user'], c['category']), None),
+        ('spaced_repetition.get_review_stats', lambda c: sr.get_review_stats(c['user']), None),
+        ('spaced_repetition.get_card_progress',
+         lambda c: sr.get_card_progress(c['user'], c['card_id']), None),
+        ('spaced_repetition.review_card',
+         lambda c: sr.review_card(c['user'], c['card_id'], c['quality']), None),
+
+        # progress
+        ('progress.get_learning_streak', lambda c: progress.get_learning_streak(c['user']), None),
+        ('progress.get_topic_progress', lambda c: progress.get_topic_progress(c['user']), None),
+        ('progress.get_daily_reviews', lambda c: progress.get_daily_reviews(c['user']), None),
+        ('progress.get_difficult_cards', lambda c: progress.get_difficult_cards(c['user']), None),
+        ('progress.get_mastered_cards', lambda c: progress.get_mastered_cards(c['user']), None),
+        ('progress.get_review_quality_distribution',
+         lambda c: progress.get_review_quality_distribution(c['user']), None),
+        ('progress.get_summary', lambda c: progress.get_summary(c['user']), None),
+        ('progress.compare_users', lambda c: progress.compare_users(), SLOW_REPEAT),
+
+        # quiz
+        ('quiz.get_cards_with_images', lambda c: quiz.get_cards_with_images(c['quiz_category']), None),
+        ('quiz.get_quiz_question', lambda c: quiz.get_quiz_question(c['user'], c['quiz_category']), None),
+        ('quiz.get_quiz_questions', lambda c: quiz.get_quiz_questions(c['user'], c['quiz_category']), None),
+        ('quiz.answer_quiz', lambda c: quiz.answer_quiz(c['user'], c['quiz_card_id'], c['quality'] >= 3), None),
+        ('quiz.get_quiz_stats', lambda c: quiz.get_quiz_stats(c['user'], c['quiz_category']), None),
+        ('quiz.get_quiz_stats_by_category', lambda c: quiz.get_quiz_stats_by_category(c['user']), None),
+        ('quiz.get_category_info', lambda c: quiz.get_category_info(c['quiz_category']), None),
+    ]
+
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent / 'web'))
+        from app import app
+    except ImportError:
+        return benchmarks
+
+    client = app.test_client()
+    benchmarks += [
+        ('web.user_dashboard', lambda c: client.get(f"/user/{c['user']}"), None),
+        ('web.progress_page', lambda c: client.get(f"/user/{c['user']}/progress"), None),
+        ('web.home', lambda c: client.get('/'), SLOW_REPEAT),
+    ]
+    return benchmarks
+
+
+def build_contexts(db_path, seed: int) -> list:
+    """Pick sample learners and matching arguments from the database."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    learners = [row['name'] for row in conn.execute("""
+        SELECT u.name FROM users u
+        JOIN review_history r ON r.user_id = u.id
+        GROUP BY u.id ORDER BY COUNT(*) DESC
+    """)]
+    users = learners[:1] + rng.sample(learners[1:], min(SAMPLE_USERS - 1, len(learners) - 1))
+    if not users:
+        users = [row['name'] for row in conn.execute("SELECT name FROM users LIMIT ?", (SAMPLE_USERS,))]
+
+    categories = [row[0] for row in conn.execute("SELECT DISTINCT category FROM cards")]
+    quiz_cards = {}
+    for row in conn.execute("SELECT id, category FROM cards WHERE image IS NOT NULL"):
+        quiz_cards.setdefault(row['category'], []).append(row['id'])
+    max_id = conn.execute("SELECT MAX(id) FROM cards").fetchone()[0]
+    french = [row[0] for row in conn.execute("SELECT french FROM cards ORDER BY id")]
+    words = [word.split()[0][:4] for word in rng.sample(french, min(50, len(french)))]
+    conn.close()
+
+    contexts = []
+    for i in range(max(len(users), 50)):
+        quiz_category = rng.choice(sorted(quiz_cards)) if quiz_cards else None
+        contexts.append({
+            'user': users[i % len(users)],
+            'category': rng.choice(categories),
+            'card_id': rng.randint(1, max_id),
+            'quiz_category': quiz_category,
+            'quiz_card_id': rng.choice(quiz_cards[quiz_category]) if quiz_category else None,
+            'query': rng.choice(words),
+            'quality': rng.choices(range(6), weights=[3, 5, 7, 25, 35, 25])[0],
+        })
+    return contexts
+
+
+def measure(db_path, repeat: int, seed: int) -> dict:
+    """Run every benchmark against a database (call in a fresh interpreter)."""
+    os.environ['FRENCH_LEARNING_DB'] = str(db_path)
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+    contexts = build_contexts(db_path, seed)
+    results = {}
+    for name, fn, repeat_override in build_benchmarks():
+        if 'quiz' in name and contexts[0]['quiz_category'] is None:
+            continue
+        results[name] = time_calls(fn, contexts, repeat_override or repeat)
+    return results
+
+
+def run_scale(db_path, repeat: int, seed: int) -> dict:
+    """Measure a database in a child interpreter and return its results."""
+    result_path = Path(f"{db_path}.results.json")
+    subprocess.run(
+        [sys.executable, __file__, '--measure', str(db_path), '--result', str(result_path),
+         '--repeat', str(repeat), '--seed', str(seed)],
+        check=True
+    )
+    with open(result_path) as f:
+        results = json.load(f)
+    result_path.unlink()
+    return results
+
+
+def database_counts(db_path) -> dict:
+    conn = sqlite3.connect(db_path)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ('users', 'cards', 'progress', 'review_history')}
+    conn.close()
+    return counts
+
+
+def print_results(label: str, counts: dict, results: dict):
+    print(f"\n{label}: {counts['users']:,} users, {counts['cards']:,} cards, "
+          f"{counts['review_history']:,} reviews")
+    print(f"  {'function':<45} {'first':>9} {'p50':>9} {'p95':>9} {'max':>9}  (ms)")
+    for name, stats in results.items():
+        print(f"  {name:<45} {stats['first_ms']:>9.2f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the public API across database scales.')
+    parser.add_argument('--scales', nargs='+', default=['tiny', 'small', 'medium'],
+                        help='Scales from benchmarks/generate.py (tiny, small, medium, large)')
+    parser.add_argument('--db', help='Measure an existing database instead (a copy is used)')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per function')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        results = measure(args.measure, args.repeat, args.seed)
+        with open(args.result, 'w') as f:
+            json.dump(results, f)
+        return
+
+    # Importing generate points app modules at a scratch database
+    from generate import SCALES, generate_database
+
+    scratch = Path(tempfile.mkdtemp(prefix='french_bench_'))
+    report = {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': [],
+    }
+
+    if args.db:
+        targets = [('db', None)]
+    else:
+        targets = [(scale, SCALES[scale]) for scale in args.scales]
+
+    for label, scale in targets:
+        db_path = scratch / f'{label}.db'
+        run = {'scale': label}
+        if scale:
+            users, cards, reviews = scale
+            run['build'] = generate_database(db_path, users, cards, reviews, seed=args.seed)
+        else:
+            src = sqlite3.connect(args.db)
+            dst = sqlite3.connect(db_path)
+            src.backup(dst)
+            src.close()
+            dst.close()
+
+        run['counts'] = database_counts(db_path)
+        run['results'] = run_scale(db_path, args.repeat, args.seed)
+        report['runs'].append(run)
+        print_results(label, run['counts'], run['results'])
+
+        db_path.unlink()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Search Benchmark
+================
+Times vocabulary.search_cards (FTS5 index) against the previous
+LIKE '%q%' scan at several catalog sizes.
+
+Usage:
+    python3 benchmarks/search_benchmark.py
+    python3 benchmarks/search_benchmark.py --sizes 10000 100000 1000000 --output search.json
+
+Each size is built in its own temporary database, so the app database
+is never touched.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a scratch database before any app module is imported
+_scratch_dir = tempfile.mkdtemp(prefix='french_search_bench_')
+os.environ['FRENCH_LEARNING_DB'] = str(Path(_scratch_dir) / 'bootstrap.db')
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import database
+from vocabulary import search_cards
+
+SYLLABLES = ['bon', 'jour', 'mer', 'ci', 'é', 'lè', 've', 'ma', 'ison', 'chat', 'pè', 're',
+             'fê', 'te', 'ça', 'va', 'où', 'gar', 'çon', 'noë', 'l', 'crè', 'me', 'trè', 's']
+ENGLISH = ['hello', 'thank', 'pupil', 'house', 'cat', 'father', 'party', 'boy', 'cream',
+           'very', 'where', 'station', 'good', 'day', 'green', 'blue', 'dog', 'bread']
+TOPICS = ['greetings', 'school', 'home', 'pets', 'family', 'food', 'travel', 'numbers']
+CATEGORIES = ['general', 'animals', 'food_kids', 'colours', 'body']
+
+# Queries as typed keystroke by keystroke, plus accent-free spellings
+QUERIES = ['b', 'bo', 'bon', 'bonj', 'eleve', 'pere', 'fete', 'garcon', 'creme',
+           'cat', 'hou', 'station', 'good day', 'ma']
+
+
+def random_word(rng) -> str:
+    """Build a French-looking word from random syllables."""
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def build_database(path: Path, size: int, seed: int = 42):
+    """Create a database with `size` synthetic cards."""
+    if path.exists():
+        path.unlink()
+    database.DB_PATH = path
+    database.init_db()
+
+    rng = random.Random(seed)
+    conn = database.get_connection()
+    batch = []
+    for _ in range(size):
+        batch.append((
+            rng.choice(CATEGORIES), rng.choice(TOPICS),
+            ' '.join(random_word(rng) for _ in range(rng.randint(1, 3))),
+            ' '.join(rng.choice(ENGLISH) for _ in range(rng.randint(1, 3))),
+            random_word(rng).upper(), rng.randint(1, 5)
+        ))
+        if len(batch) >= 10000:
+            conn.executemany("""
+                INSERT INTO cards (category, topic, french, english, pronunciation, priority)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, batch)
+            batch = []
+    if batch:
+        conn.executemany("""
+            INSERT INTO cards (category, topic, french, english, pronunciation, priority)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, batch)
+    conn.commit()
+    conn.close()
+
+
+def like_search(query: str, limit: int = 50) -> list:
+    """The previous search_cards implementation (LIKE scan), for comparison."""
+    conn = database.get_connection()
+    search = f'%{query}%'
+    rows = conn.execute("""
+        SELECT * FROM cards
+        WHERE french LIKE ? OR english LIKE ?
+        ORDER BY category, priority, id
+        LIMIT ?
+    """, (search, search, limit)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def time_queries(fn, repeat: int) -> dict:
+    """Time fn over all benchmark queries, returning latency stats in ms."""
+    samples = []
+    hits = 0
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            hits += len(fn(query))
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3),
+        'max_ms': round(samples[-1], 3),
+        'avg_hits': round(hits / len(samples), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark card search at several catalog sizes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5, help='Passes over the query set per size')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        path = Path(_scratch_dir) / f'search_{size}.db'
+
+        start = time.perf_counter()
+        build_database(path, size)
+        build_seconds = time.perf_counter() - start
+
+        fts = time_queries(search_cards, args.repeat)
+        like = time_queries(like_search, args.repeat)
+
+        results.append({'cards': size, 'build_seconds': round(build_seconds, 2), 'fts': fts, 'like': like})
+        print(f"{size:>9,} cards  build {build_seconds:6.1f}s  "
+              f"fts p50 {fts['p50_ms']:8.3f}ms p95 {fts['p95_ms']:8.3f}ms  "
+              f"like p50 {like['p50_ms']:8.3f}ms p95 {like['p95_ms']:8.3f}ms")
+
+        path.unlink()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
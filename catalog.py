@@ -0,0 +1,449 @@
+"""
+Card Catalog Snapshot
+=====================
+In-memory, read-only snapshot of the shared cards table.
+
+The cards table is shared by every user and changes rarely, so it is
+loaded once per process into a compact struct-of-arrays form:
+
+    - ids, category/topic codes and priorities are typed arrays
+    - french, english, pronunciation and image live in UTF-8 string
+      pools (one blob plus an offset table per field)
+    - cards are stored in (category, priority, id) order, so a category
+      or a (category, priority) tier is a contiguous position range
+    - topics map to arrays of positions, and ids resolve to positions
+      by binary search
+
+Each snapshot records the catalog version it was built from; any write
+to cards bumps the version (see database.bump_catalog_version) and a
+read that finds a newer version rebuilds the snapshot. Reads compare
+versions at most every FRENCH_LEARNING_CATALOG_RECHECK_MS (default 1000)
+milliseconds, so a write from another process can take that long to
+show. This process's own writes are noticed at once: reads check the
+version on every call from a bump until it shows up.
+
+Cards are handed out as CardView objects: read-only, dict-like views
+that decode fields on access. Use to_dict() for a plain dict (e.g.
+before JSON encoding).
+
+Set FRENCH_LEARNING_CATALOG_FILE to share one memory-mapped copy of
+the snapshot between processes (see catalog_file.py).
+"""
+
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from database import catalog_bumps, get_catalog_version, get_read_connection
+from memory import register_cache
+from metrics import counter
+
+# Fields exposed by every card view, in column order
+CARD_FIELDS = ('id', 'category', 'topic', 'french', 'english', 'pronunciation', 'priority', 'image')
+
+# Typecode of the priorities column, and the value standing for a NULL priority
+PRIORITY_TYPECODE = 'i'
+NULL_PRIORITY = -2 ** 31
+
+# Optional shared, memory-mapped catalog file (see catalog_file.py)
+CATALOG_FILE = os.environ.get('FRENCH_LEARNING_CATALOG_FILE')
+
+# Longest a snapshot is used without checking the catalog version
+RECHECK_SECONDS = float(os.environ.get('FRENCH_LEARNING_CATALOG_RECHECK_MS', '1000')) / 1000
+
+# Current snapshot for this process (None until first use)
+_snapshot = None
+_rebuild_lock = threading.Lock()
+
+# When the snapshot's version was last confirmed, and the catalog_bumps()
+# count it is known to include
+_checked = {'at': 0.0, 'bumps': 0}
+
+# Lookups of per-process caches (catalog snapshot, quiz indexes), hit or miss
+CACHE_REQUESTS = counter('cache_requests_total', 'In-memory cache lookups by cache and result', ['cache', 'result'])
+
+
+class StringPool:
+    """Strings packed into one UTF-8 blob, addressed by an offset table."""
+
+    __slots__ = ('blob', 'offsets', 'nulls')
+
+    def __init__(self, blob, offsets, nulls):
+        """
+        Args:
+            blob: Concatenated UTF-8 bytes (bytes, or a memoryview)
+            offsets: n + 1 start offsets; string i is blob[offsets[i]:offsets[i + 1]]
+            nulls: One byte per string, non-zero where the value is None
+        """
+        self.blob = blob
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, i: int):
+        """Decode string i (None for NULL values)."""
+        if self.nulls[i]:
+            return None
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the pool's buffers."""
+        return len(self.blob) + len(self.offsets) * self.offsets.itemsize + len(self.nulls)
+
+
+class _StringPoolBuilder:
+    """Accumulates strings for a StringPool."""
+
+    def __init__(self):
+        self.blob = bytearray()
+        self.offsets = array('I', [0])
+        self.nulls = bytearray()
+
+    def append(self, value):
+        if value is None:
+            self.nulls.append(1)
+        else:
+            self.nulls.append(0)
+            self.blob += value.encode('utf-8')
+        self.offsets.append(len(self.blob))
+
+    def build(self) -> StringPool:
+        return StringPool(bytes(self.blob), self.offsets, bytes(self.nulls))
+
+
+class CardView(Mapping):
+    """Read-only, dict-like view of one card in a snapshot."""
+
+    __slots__ = ('_catalog', '_pos')
+
+    def __init__(self, catalog, pos: int):
+        self._catalog = catalog
+        self._pos = pos
+
+    def __getitem__(self, key):
+        getter = _FIELD_GETTERS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self._catalog, self._pos)
+
+    def __iter__(self):
+        return iter(CARD_FIELDS)
+
+    def __len__(self):
+        return len(CARD_FIELDS)
+
+    def __repr__(self):
+        return f"CardView({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        """Materialise the card as a plain dict."""
+        catalog = self._catalog
+        pos = self._pos
+        return {field: _FIELD_GETTERS[field](catalog, pos) for field in CARD_FIELDS}
+
+
+def _priority(value: int):
+    return None if value == NULL_PRIORITY else value
+
+
+_FIELD_GETTERS = {
+    'id': lambda c, i: c.ids[i],
+    'category': lambda c, i: c.categories[c.category_codes[i]],
+    'topic': lambda c, i: c.topics[c.topic_codes[i]],
+    'french': lambda c, i: c.french.get(i),
+    'english': lambda c, i: c.english.get(i),
+    'pronunciation': lambda c, i: c.pronunciation.get(i),
+    'priority': lambda c, i: _priority(c.priorities[i]),
+    'image': lambda c, i: c.image.get(i),
+}
+
+
+class CatalogSnapshot:
+    """Compact, read-only view of every card at one catalog version."""
+
+    def __init__(self, version: int, ids, category_codes, topic_codes, priorities,
+                 categories: list, topics: list, french: StringPool, english: StringPool,
+                 pronunciation: StringPool, image: StringPool, indexes: dict = None):
+        """
+        Wrap the column arrays and derive the lookup indexes.
+
+        All columns are indexed by position, with cards ordered by
+        category, priority, id. Columns may be arrays or memoryviews.
+
+        Args:
+            version: Catalog version the cards were read at
+            ids: Card ids
+            category_codes: Index into categories for each card
+            topic_codes: Index into topics for each card
+            priorities: Priority of each card (NULL_PRIORITY for NULL)
+            categories: Category names (sorted)
+            topics: Topic names
+            french, english, pronunciation, image: String pools
+            indexes: Precomputed lookup indexes (see derive_indexes);
+                derived from the columns if omitted
+        """
+        self.version = version
+        self.ids = ids
+        self.category_codes = category_codes
+        self.topic_codes = topic_codes
+        self.priorities = priorities
+        self.categories = categories
+        self.topics = topics
+        self.french = french
+        self.english = english
+        self.pronunciation = pronunciation
+        self.image = image
+
+        if indexes is None:
+            indexes = self.derive_indexes()
+
+        self.category_ranges = indexes['category_ranges']
+        self.tier_ranges = indexes['tier_ranges']
+        self.topic_positions = indexes['topic_positions']
+        self.sorted_ids = indexes['sorted_ids']
+        self.sorted_positions = indexes['sorted_positions']
+        self.topic_codes_by_name = {name: code for code, name in enumerate(self.topics)}
+
+    def derive_indexes(self) -> dict:
+        """
+        Compute the lookup indexes from the columns.
+
+        Returns:
+            dict: category_ranges and tier_ranges (contiguous position
+            ranges per category and per (category, priority)),
+            topic_positions (positions per topic) and sorted_ids /
+            sorted_positions (ids ascending, for binary search)
+        """
+        ids = self.ids
+        category_ranges = {}
+        tier_ranges = {}
+        topic_positions = [array('I') for _ in self.topics]
+
+        for pos in range(len(ids)):
+            category = self.categories[self.category_codes[pos]]
+            tier = (category, self.priorities[pos])
+            start, _ = category_ranges.get(category, (pos, pos))
+            category_ranges[category] = (start, pos + 1)
+            start, _ = tier_ranges.get(tier, (pos, pos))
+            tier_ranges[tier] = (start, pos + 1)
+            topic_positions[self.topic_codes[pos]].append(pos)
+
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+
+        return {
+            'category_ranges': category_ranges,
+            'tier_ranges': tier_ranges,
+            'topic_positions': dict(zip(self.topics, topic_positions)),
+            'sorted_ids': array('q', (ids[pos] for pos in order)),
+            'sorted_positions': array('I', order),
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, card_id: int):
+        """Get the position of a card id, or None if it is not in the catalog."""
+        i = bisect_left(self.sorted_ids, card_id)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == card_id:
+            return self.sorted_positions[i]
+        return None
+
+    def get(self, card_id: int):
+        """Get a card view by id, or None."""
+        pos = self.position(card_id)
+        return CardView(self, pos) if pos is not None else None
+
+    def _positions(self, category: str = None, topic: str = None, priority: int = None):
+        """Positions matching the filters, in category, priority, id order."""
+        if category and priority is not None:
+            positions = range(*self.tier_ranges.get((category, priority), (0, 0)))
+        elif category:
+            positions = range(*self.category_ranges.get(category, (0, 0)))
+        elif topic:
+            positions = self.topic_positions.get(topic, ())
+        else:
+            positions = range(len(self.ids))
+
+        if topic and category:
+            code = self.topic_codes_by_name.get(topic)
+            positions = [pos for pos in positions if self.topic_codes[pos] == code]
+        if priority is not None and not category:
+            positions = [pos for pos in positions if self.priorities[pos] == priority]
+
+        return positions
+
+    def select(self, category: str = None, topic: str = None, priority: int = None) -> list:
+        """
+        Get card views matching the filters, ordered by category, priority, id.
+
+        Starts from the narrowest index for the given filters.
+        """
+        return [CardView(self, pos) for pos in self._positions(category, topic, priority)]
+
+    def count_by(self, field: str, category: str = None) -> dict:
+        """Count cards per value of field ('category', 'topic' or 'priority')."""
+        if field == 'category':
+            ranges = self.category_ranges.items()
+            if category:
+                ranges = [(category, self.category_ranges.get(category, (0, 0)))]
+            return {name: end - start for name, (start, end) in ranges if end > start}
+
+        positions = self._positions(category)
+        counts = {}
+        if field == 'topic':
+            for pos in positions:
+                code = self.topic_codes[pos]
+                counts[code] = counts.get(code, 0) + 1
+            return {self.topics[code]: count for code, count in counts.items()}
+        if field == 'priority':
+            for pos in positions:
+                priority = _priority(self.priorities[pos])
+                counts[priority] = counts.get(priority, 0) + 1
+            return counts
+        raise ValueError(f"Cannot count cards by {field}")
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the snapshot's arrays and pools."""
+        arrays = (self.ids, self.category_codes, self.topic_codes, self.priorities,
+                  self.sorted_ids, self.sorted_positions, *self.topic_positions.values())
+        pools = (self.french, self.english, self.pronunciation, self.image)
+        return (sum(len(a) * a.itemsize for a in arrays) + sum(p.nbytes() for p in pools)
+                + sum(len(name) for name in self.categories + self.topics))
+
+
+def load_catalog(conn=None) -> CatalogSnapshot:
+    """
+    Read every card into a new snapshot.
+
+    Rows are streamed straight into the column arrays, so no per-card
+    dicts are built.
+
+    Args:
+        conn: Optional open connection to reuse
+
+    Returns:
+        CatalogSnapshot: Snapshot at the current catalog version
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+
+    cursor = conn.cursor()
+
+    # Read version and cards in one transaction so they agree
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        cursor.execute("BEGIN")
+
+    version = get_catalog_version(conn)
+
+    cursor.execute("SELECT DISTINCT category FROM cards ORDER BY category")
+    categories = [row[0] for row in cursor.fetchall()]
+    category_codes_by_name = {name: code for code, name in enumerate(categories)}
+
+    ids = array('q')
+    category_codes = array('H')
+    topic_codes = array('I')
+    priorities = array(PRIORITY_TYPECODE)
+    topics = []
+    topic_codes_by_name = {}
+    pools = [_StringPoolBuilder() for _ in range(4)]
+
+    cursor.execute("""
+        SELECT id, category, topic, priority, french, english, pronunciation, image
+        FROM cards ORDER BY category, priority, id
+    """)
+    for card_id, category, topic, priority, *strings in cursor:
+        ids.append(card_id)
+        category_codes.append(category_codes_by_name[category])
+        if topic not in topic_codes_by_name:
+            topic_codes_by_name[topic] = len(topics)
+            topics.append(topic)
+        topic_codes.append(topic_codes_by_name[topic])
+        priorities.append(NULL_PRIORITY if priority is None else priority)
+        for pool, value in zip(pools, strings):
+            pool.append(value)
+
+    if own_transaction:
+        conn.commit()
+
+    if own_conn:
+        conn.close()
+
+    french, english, pronunciation, image = (pool.build() for pool in pools)
+    return CatalogSnapshot(version, ids, category_codes, topic_codes, priorities,
+                           categories, topics, french, english, pronunciation, image)
+
+
+def get_catalog(conn=None) -> CatalogSnapshot:
+    """
+    Get the current catalog snapshot, rebuilding it if the version changed.
+
+    The version is only read when the last check is RECHECK_SECONDS old
+    or this process has bumped it since.
+
+    Args:
+        conn: Optional open connection to reuse
+
+    Returns:
+        CatalogSnapshot: Up-to-date snapshot
+    """
+    global _snapshot
+
+    now = time.monotonic()
+    bumps = catalog_bumps()
+    snapshot = _snapshot
+    if snapshot is not None and bumps == _checked['bumps'] and now - _checked['at'] < RECHECK_SECONDS:
+        CACHE_REQUESTS.inc(cache='catalog', result='hit')
+        return snapshot
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+
+    try:
+        version = get_catalog_version(conn)
+        if snapshot is not None and snapshot.version == version:
+            CACHE_REQUESTS.inc(cache='catalog', result='hit')
+            # A bump that does not show yet is still being committed; keep
+            # checking until it does, or for RECHECK_SECONDS if it rolled back
+            if bumps == _checked['bumps'] or now - _checked['at'] >= RECHECK_SECONDS:
+                _checked.update(at=now, bumps=bumps)
+            return snapshot
+
+        with _rebuild_lock:
+            # Another thread may have rebuilt it while we waited
+            snapshot = _snapshot
+            if snapshot is not None and snapshot.version == version:
+                CACHE_REQUESTS.inc(cache='catalog', result='hit')
+            else:
+                CACHE_REQUESTS.inc(cache='catalog', result='miss')
+                if CATALOG_FILE:
+                    from catalog_file import load_shared_catalog
+                    snapshot = load_shared_catalog(CATALOG_FILE, version, conn)
+                else:
+                    snapshot = load_catalog(conn)
+                _snapshot = snapshot
+            _checked.update(at=now, bumps=bumps)
+            return snapshot
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _snapshot_nbytes() -> int:
+    snapshot = _snapshot
+    return snapshot.nbytes() if snapshot is not None else 0
+
+
+register_cache('catalog', _snapshot_nbytes)
+
+
+def invalidate_catalog():
+    """Drop the current snapshot so the next read reloads it."""
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,275 @@
+"""
+Shared Catalog File
+===================
+Export the card catalog to a read-only binary file and memory-map it.
+
+With FRENCH_LEARNING_CATALOG_FILE set, every gunicorn worker maps the
+same file instead of building its own catalog snapshot, so all workers
+share one physical copy through the page cache. Columns and indexes are
+read as zero-copy memoryviews, and strings are decoded straight out of
+the mapped blob.
+
+The file is versioned with the catalog version. When the version in the
+database moves on, the first worker to notice writes a new file next to
+the old one and atomically renames it into place; snapshots still
+holding the old mapping keep working until they are dropped.
+
+File layout (native byte order, every section 8-byte aligned):
+    header      magic, format, byte order, catalog version, card count,
+                section count
+    sections    (offset, length) table, then the sections in SECTIONS
+                order: JSON metadata (names and ranges), column arrays,
+                id index, topic positions and the four string pools
+
+Usage:
+    python3 catalog_file.py export [path]
+    python3 catalog_file.py info [path]
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from catalog import CatalogSnapshot, StringPool, load_catalog, PRIORITY_TYPECODE
+
+MAGIC = b'FLCATLG\0'
+FORMAT_VERSION = 2
+
+# magic, format version, byte order (1 = little, 2 = big), catalog version, card count, section count
+HEADER = struct.Struct('=8sIIqQI')
+SECTION_ENTRY = struct.Struct('=QQ')
+
+STRING_FIELDS = ('french', 'english', 'pronunciation', 'image')
+
+# (name, memoryview format) for each section, in file order
+SECTIONS = [
+    ('meta', 'B'),
+    ('ids', 'q'),
+    ('category_codes', 'H'),
+    ('topic_codes', 'I'),
+    ('priorities', PRIORITY_TYPECODE),
+    ('sorted_ids', 'q'),
+    ('sorted_positions', 'I'),
+    ('topic_positions', 'I'),
+] + [
+    (f'{field}_{part}', fmt)
+    for field in STRING_FIELDS
+    for part, fmt in (('offsets', 'I'), ('nulls', 'B'), ('blob', 'B'))
+]
+
+ALIGNMENT = 8
+
+
+def _byte_order() -> int:
+    return 1 if sys.byteorder == 'little' else 2
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_catalog(snapshot: CatalogSnapshot, path) -> Path:
+    """
+    Write a snapshot to a catalog file, replacing any existing file atomically.
+
+    Args:
+        snapshot: Catalog snapshot to export
+        path: Destination file
+
+    Returns:
+        Path: The written file
+    """
+    path = Path(path)
+
+    # Topic position arrays are stored back to back; meta records each slice
+    topic_ranges = {}
+    topic_positions = []
+    start = 0
+    for topic in snapshot.topics:
+        positions = snapshot.topic_positions[topic]
+        topic_ranges[topic] = [start, start + len(positions)]
+        topic_positions.append(memoryview(positions).cast('B'))
+        start += len(positions)
+
+    meta = {
+        'categories': snapshot.categories,
+        'topics': snapshot.topics,
+        'category_ranges': {name: list(r) for name, r in snapshot.category_ranges.items()},
+        'tier_ranges': [[category, priority, start, end]
+                        for (category, priority), (start, end) in snapshot.tier_ranges.items()],
+        'topic_ranges': topic_ranges,
+    }
+
+    data = {
+        'meta': [json.dumps(meta).encode('utf-8')],
+        'ids': [snapshot.ids],
+        'category_codes': [snapshot.category_codes],
+        'topic_codes': [snapshot.topic_codes],
+        'priorities': [snapshot.priorities],
+        'sorted_ids': [snapshot.sorted_ids],
+        'sorted_positions': [snapshot.sorted_positions],
+        'topic_positions': topic_positions,
+    }
+    for field in STRING_FIELDS:
+        pool = getattr(snapshot, field)
+        data[f'{field}_offsets'] = [pool.offsets]
+        data[f'{field}_nulls'] = [pool.nulls]
+        data[f'{field}_blob'] = [pool.blob]
+
+    # Lay out sections after the header and section table
+    chunks = [[memoryview(part).cast('B') for part in data[name]] for name, _ in SECTIONS]
+    offset = _align(HEADER.size + SECTION_ENTRY.size * len(SECTIONS))
+    table = []
+    for parts in chunks:
+        length = sum(len(part) for part in parts)
+        table.append((offset, length))
+        offset = _align(offset + length)
+
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, _byte_order(), snapshot.version,
+                            len(snapshot), len(SECTIONS)))
+        for entry in table:
+            f.write(SECTION_ENTRY.pack(*entry))
+        for (offset, _), parts in zip(table, chunks):
+            f.write(b'\0' * (offset - f.tell()))
+            for part in parts:
+                f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_file_version(path):
+    """
+    Read the catalog version stored in a catalog file.
+
+    Returns:
+        int: Catalog version, or None if the file is missing or not a catalog file
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+
+    if len(header) < HEADER.size:
+        return None
+
+    magic, fmt, byte_order, version, _, _ = HEADER.unpack(header)
+    if magic != MAGIC or fmt != FORMAT_VERSION or byte_order != _byte_order():
+        return None
+
+    return version
+
+
+def open_catalog_file(path) -> CatalogSnapshot:
+    """
+    Memory-map a catalog file as a snapshot.
+
+    Args:
+        path: Catalog file written by export_catalog
+
+    Returns:
+        CatalogSnapshot: Snapshot whose columns are views into the mapping
+
+    Raises:
+        ValueError: If the file is not a compatible catalog file
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buf = memoryview(mapped)
+    magic, fmt, byte_order, version, count, section_count = HEADER.unpack_from(buf)
+    if magic != MAGIC or fmt != FORMAT_VERSION or byte_order != _byte_order():
+        raise ValueError(f"{path} is not a compatible catalog file")
+    if section_count != len(SECTIONS):
+        raise ValueError(f"{path} has {section_count} sections, expected {len(SECTIONS)}")
+
+    sections = {}
+    for i, (name, view_format) in enumerate(SECTIONS):
+        offset, length = SECTION_ENTRY.unpack_from(buf, HEADER.size + i * SECTION_ENTRY.size)
+        sections[name] = buf[offset:offset + length].cast(view_format)
+
+    meta = json.loads(bytes(sections['meta']))
+
+    pools = {
+        field: StringPool(sections[f'{field}_blob'], sections[f'{field}_offsets'],
+                          sections[f'{field}_nulls'])
+        for field in STRING_FIELDS
+    }
+
+    topic_positions = sections['topic_positions']
+    indexes = {
+        'category_ranges': {name: tuple(r) for name, r in meta['category_ranges'].items()},
+        'tier_ranges': {(category, priority): (start, end)
+                        for category, priority, start, end in meta['tier_ranges']},
+        'topic_positions': {name: topic_positions[start:end]
+                            for name, (start, end) in meta['topic_ranges'].items()},
+        'sorted_ids': sections['sorted_ids'],
+        'sorted_positions': sections['sorted_positions'],
+    }
+
+    snapshot = CatalogSnapshot(
+        version, sections['ids'], sections['category_codes'], sections['topic_codes'],
+        sections['priorities'], meta['categories'], meta['topics'],
+        pools['french'], pools['english'], pools['pronunciation'], pools['image'],
+        indexes=indexes
+    )
+
+    if len(snapshot) != count:
+        raise ValueError(f"{path} is truncated ({len(snapshot)} of {count} cards)")
+
+    return snapshot
+
+
+def load_shared_catalog(path, version: int, conn=None) -> CatalogSnapshot:
+    """
+    Get a memory-mapped snapshot for the given catalog version.
+
+    Maps the existing file if it is at that version; otherwise builds a
+    snapshot from the database, exports it and maps the new file.
+
+    Args:
+        path: Shared catalog file
+        version: Catalog version currently in the database
+        conn: Optional open connection to reuse
+
+    Returns:
+        CatalogSnapshot: Memory-mapped snapshot
+    """
+    if read_file_version(path) != version:
+        export_catalog(load_catalog(conn), path)
+
+    return open_catalog_file(path)
+
+
+def main():
+    """Command-line entry point."""
+    from catalog import CATALOG_FILE
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('export', 'info'):
+        print(__doc__)
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else CATALOG_FILE
+    if not path:
+        print("No path given and FRENCH_LEARNING_CATALOG_FILE is not set")
+        sys.exit(1)
+
+    if sys.argv[1] == 'export':
+        snapshot = load_catalog()
+        export_catalog(snapshot, path)
+        print(f"Exported {len(snapshot)} cards at catalog version {snapshot.version} to {path}")
+    else:
+        snapshot = open_catalog_file(path)
+        print(f"{path}: {len(snapshot)} cards, catalog version {snapshot.version}, "
+              f"{os.path.getsize(path)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,16 +6,295 @@ Handles SQLite database setup and connections.
 
 import os
 import sqlite3
+import sys
+import threading
+import time
+import weakref
 from pathlib import Path
+from metrics import counter, gauge
 
 # Use environment variable for DB path, with fallback to local file
 DB_PATH = Path(os.environ.get('FRENCH_LEARNING_DB', Path(__file__).parent / "french_learning.db"))
 
+# Journal mode applied by init_db when set, e.g. 'wal' so that readers
+# and the writer thread (see writer.py) don't block each other
+JOURNAL_MODE = os.environ.get('FRENCH_LEARNING_JOURNAL_MODE')
+JOURNAL_MODES = {'delete', 'truncate', 'persist', 'memory', 'wal', 'off'}
 
-def get_connection():
-    """Get a database connection with row factory enabled."""
-    conn = sqlite3.connect(DB_PATH)
+
+# Callbacks run after every statement as hook(sql, params, seconds).
+# Connections only pay for tracing while at least one hook is registered.
+_statement_hooks = []
+
+# Callbacks run once a statement's results have been read, as
+# hook(sql, params, seconds, rows, caller); seconds includes fetching
+_result_hooks = []
+
+# Calls of bump_catalog_version in this process (see catalog_bumps)
+_catalog_bumps = 0
+
+# Callbacks run with no arguments whenever get_connection opens a connection
+_connect_hooks = []
+
+CONNECTIONS_OPENED = counter('db_connections_opened_total', 'SQLite connections opened by get_connection')
+CONNECTIONS_OPEN = gauge('db_connections_open', 'SQLite connections currently held (opened and not yet released)')
+
+
+class Connection(sqlite3.Connection):
+    """Plain connection; a subclass only so it can be weakly referenced."""
+
+
+def _caller() -> str:
+    """Module and function name of the nearest caller outside this module."""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to the registered hooks."""
+
+    # [sql, params, seconds, rows, caller] of the statement whose rows are
+    # still being read, while result hooks are registered
+    _pending = None
+
+    def _traced(self, run, sql, params):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return run()
+        finally:
+            seconds = time.perf_counter() - start
+            for hook in list(_statement_hooks):
+                hook(sql, params, seconds)
+            if _result_hooks:
+                self._pending = [sql, params, seconds, 0, _caller()]
+                if self.description is None:
+                    # Not a query: report now, with the rows it changed
+                    self._pending[3] = max(self.rowcount, 0)
+                    self._finish()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            for hook in list(_result_hooks):
+                hook(*pending)
+
+    def _fetched(self, start, count, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - start
+            pending[3] += count
+            if done:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        return self._traced(lambda: super(TracedCursor, self).execute(sql, parameters), sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Materialise so hooks can see the rows without consuming a generator
+        rows = list(seq_of_parameters)
+        return self._traced(lambda: super(TracedCursor, self).executemany(sql, rows), sql, rows)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass  # e.g. hooks already torn down at interpreter exit
+
+
+class TracedConnection(Connection):
+    """Connection whose cursors (including implicit ones) are TracedCursors."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def add_statement_hook(hook):
+    """
+    Register a callback for every SQL statement run through get_connection.
+
+    Args:
+        hook: Callable taking (sql, params, seconds); for executemany,
+            params is the list of parameter rows
+    """
+    _statement_hooks.append(hook)
+
+
+def remove_statement_hook(hook):
+    """Unregister a callback added with add_statement_hook."""
+    if hook in _statement_hooks:
+        _statement_hooks.remove(hook)
+
+
+def add_result_hook(hook):
+    """
+    Register a callback for every statement once its results are read.
+
+    A query is reported when its rows run out, when its cursor runs the
+    next statement or is closed, or when the cursor is garbage collected.
+    Other statements are reported straight after they execute.
+
+    Args:
+        hook: Callable taking (sql, params, seconds, rows, caller), where
+            seconds covers executing and fetching, rows is the number of
+            rows fetched (or changed, for writes) and caller is the
+            'module.function' that ran the statement
+    """
+    _result_hooks.append(hook)
+
+
+def remove_result_hook(hook):
+    """Unregister a callback added with add_result_hook."""
+    if hook in _result_hooks:
+        _result_hooks.remove(hook)
+
+
+def add_connect_hook(hook):
+    """Register a callback run each time get_connection opens a connection."""
+    _connect_hooks.append(hook)
+
+
+def remove_connect_hook(hook):
+    """Unregister a callback added with add_connect_hook."""
+    if hook in _connect_hooks:
+        _connect_hooks.remove(hook)
+
+
+def get_connection(timeout: float = None):
+    """
+    Get a database connection with row factory enabled.
+
+    Args:
+        timeout: Seconds SQLite waits for a lock before raising
+            "database is locked" (default: sqlite3's 5 seconds)
+    """
+    return _connect(timeout=timeout)
+
+
+def get_read_connection():
+    """
+    Get a connection that can only read.
+
+    Used by functions that never write, so they cannot take the write
+    lock by accident; any write through it fails with
+    "attempt to write a readonly database". Returns the thread's pinned
+    connection if it has one (see pin_read_connection).
+    """
+    conn = getattr(_thread_state, 'read_conn', None)
+    if conn is not None:
+        return conn
+    return _connect(read_only=True)
+
+
+class _Pinned:
+    """Mixin for a pinned connection: close() leaves it open for the next caller."""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def release(self):
+        sqlite3.Connection.close(self)
+
+
+class PinnedConnection(_Pinned, Connection):
+    """A thread's long-lived read connection."""
+
+
+class PinnedTracedConnection(_Pinned, TracedConnection):
+    """A thread's long-lived read connection, with tracing."""
+
+
+# Per-thread pinned read connection
+_thread_state = threading.local()
+
+
+def pin_read_connection():
+    """
+    Keep one read-only connection open for the calling thread.
+
+    Until unpin_read_connection(), get_read_connection() in this thread
+    returns it instead of opening a new one, and callers closing it
+    leave it open. Meant for long-lived pool threads (see async_api.py);
+    statement hooks registered later do not apply to it.
+    """
+    if getattr(_thread_state, 'read_conn', None) is None:
+        traced = _statement_hooks or _result_hooks
+        _thread_state.read_conn = _connect(PinnedTracedConnection if traced else PinnedConnection,
+                                           read_only=True)
+
+
+def unpin_read_connection():
+    """Close the calling thread's pinned read connection, if any."""
+    conn = getattr(_thread_state, 'read_conn', None)
+    if conn is not None:
+        _thread_state.read_conn = None
+        conn.release()
+
+
+def _connect(factory=None, read_only: bool = False, timeout: float = None):
+    for hook in _connect_hooks:
+        hook()
+    if factory is None:
+        factory = TracedConnection if _statement_hooks or _result_hooks else Connection
+    if timeout is None:
+        conn = sqlite3.connect(DB_PATH, factory=factory)
+    else:
+        conn = sqlite3.connect(DB_PATH, timeout=timeout, factory=factory)
     conn.row_factory = sqlite3.Row
+    if read_only:
+        # Set up on a plain cursor: connection setup is not a statement the
+        # hooks (query stats, slow query log, tracing) should see
+        sqlite3.Connection.cursor(conn).execute("PRAGMA query_only = ON")
+
+    # Connections are released when the last reference goes (close() alone
+    # leaves the object alive until the caller returns)
+    CONNECTIONS_OPENED.inc()
+    CONNECTIONS_OPEN.inc()
+    weakref.finalize(conn, CONNECTIONS_OPEN.dec)
     return conn
 
 
@@ -24,12 +303,18 @@ def init_db():
     conn = get_connection()
     cursor = conn.cursor()
 
+    if JOURNAL_MODE:
+        if JOURNAL_MODE.lower() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode {JOURNAL_MODE!r}")
+        cursor.execute(f"PRAGMA journal_mode = {JOURNAL_MODE.lower()}")
+
     # Users table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP
         )
     """)
 
@@ -78,10 +363,233 @@ def init_db():
         )
     """)
 
+    # Per-user history lookups (progress stats, batched user purges)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_history_user ON review_history(user_id)")
+
+    # Card lookups on per-user tables (cascading deletes, per-card history)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_progress_card ON progress(card_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_history_card ON review_history(card_id, user_id)")
+
+    # Natural key lookups for deck imports
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cards_category_french ON cards(category, french)")
+
+    # Catalog version (single row, bumped whenever the shared cards table changes).
+    # Seeded from the clock so a recreated database never reuses a version
+    # that an in-memory snapshot was built at.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, ?)",
+                   (int(time.time() * 1000),))
+
+    conn.commit()
+    conn.close()
+
+    migrate_db()
+    init_search_index()
+    init_image_store()
+
+
+def init_image_store():
+    """
+    Create the tables behind the content-addressed image store.
+
+    image_blobs holds one row per stored file (keyed by SHA-256) with a
+    reference count; card_images indexes which cards use which blob;
+    image_sources maps download URLs to blobs. Triggers derive
+    card_images from cards.image values of the form "blob:<hash>" and
+    keep the reference counts in step, so every write path (card
+    updates, bulk updates, deletes, imports) is covered.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS image_blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            content_type TEXT,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS card_images (
+            card_id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL,
+            FOREIGN KEY (card_id) REFERENCES cards(id),
+            FOREIGN KEY (hash) REFERENCES image_blobs(hash)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_card_images_hash ON card_images(hash)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS image_sources (
+            url TEXT PRIMARY KEY,
+            hash TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_sources_hash ON image_sources(hash)")
+
+    # cards.image -> card_images
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS card_images_insert
+        AFTER INSERT ON cards WHEN new.image LIKE 'blob:%' BEGIN
+            INSERT INTO card_images (card_id, hash) VALUES (new.id, substr(new.image, 6));
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS card_images_update
+        AFTER UPDATE OF image ON cards WHEN old.image IS NOT new.image BEGIN
+            DELETE FROM card_images WHERE card_id = old.id;
+            INSERT INTO card_images (card_id, hash)
+            SELECT new.id, substr(new.image, 6) WHERE new.image LIKE 'blob:%';
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS card_images_delete
+        AFTER DELETE ON cards WHEN old.image LIKE 'blob:%' BEGIN
+            DELETE FROM card_images WHERE card_id = old.id;
+        END
+    """)
+
+    # card_images -> image_blobs.ref_count
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS image_blobs_ref AFTER INSERT ON card_images BEGIN
+            UPDATE image_blobs SET ref_count = ref_count + 1 WHERE hash = new.hash;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS image_blobs_unref AFTER DELETE ON card_images BEGIN
+            UPDATE image_blobs SET ref_count = ref_count - 1 WHERE hash = old.hash;
+        END
+    """)
+
+    conn.commit()
+    conn.close()
+
+
+def init_search_index():
+    """
+    Create the full-text search index over cards, if FTS5 is available.
+
+    cards_fts is an external-content FTS5 table over french, english,
+    pronunciation and topic. The unicode61 tokenizer with
+    remove_diacritics folds accents, so "eleve" matches "élève".
+    Triggers keep it in sync with inserts, updates and deletes on cards.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'cards_fts'")
+    exists = cursor.fetchone() is not None
+
+    if not exists:
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE cards_fts USING fts5(
+                    french, english, pronunciation, topic,
+                    content='cards', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 - search falls back to LIKE
+            conn.close()
+            return
+
+        # Index any cards that existed before the search table
+        cursor.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+            INSERT INTO cards_fts (rowid, french, english, pronunciation, topic)
+            VALUES (new.id, new.french, new.english, new.pronunciation, new.topic);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+            INSERT INTO cards_fts (cards_fts, rowid, french, english, pronunciation, topic)
+            VALUES ('delete', old.id, old.french, old.english, old.pronunciation, old.topic);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS cards_fts_update
+        AFTER UPDATE OF french, english, pronunciation, topic ON cards BEGIN
+            INSERT INTO cards_fts (cards_fts, rowid, french, english, pronunciation, topic)
+            VALUES ('delete', old.id, old.french, old.english, old.pronunciation, old.topic);
+            INSERT INTO cards_fts (rowid, french, english, pronunciation, topic)
+            VALUES (new.id, new.french, new.english, new.pronunciation, new.topic);
+        END
+    """)
+
     conn.commit()
     conn.close()
 
 
+def has_search_index(conn=None) -> bool:
+    """Check whether the cards_fts full-text index exists."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cards_fts'").fetchone()
+
+    if own_conn:
+        conn.close()
+
+    return row is not None
+
+
+def get_catalog_version(conn=None) -> int:
+    """
+    Get the current catalog version.
+
+    In-memory structures built from the cards table (e.g. quiz indexes)
+    compare against this number to know when they are stale.
+
+    Args:
+        conn: Optional open connection to reuse
+
+    Returns:
+        int: Catalog version
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+
+    if own_conn:
+        conn.close()
+
+    return row[0] if row else 0
+
+
+def bump_catalog_version(cursor):
+    """
+    Increment the catalog version inside the caller's transaction.
+
+    Args:
+        cursor: Cursor of the connection that changed the cards table
+    """
+    global _catalog_bumps
+    cursor.execute("UPDATE catalog_meta SET version = version + 1 WHERE id = 1")
+    _catalog_bumps += 1
+
+
+def catalog_bumps() -> int:
+    """
+    Count catalog version bumps made by this process, committed or not.
+
+    Lets in-memory structures notice this process's own writes at once
+    instead of waiting for their next version check.
+    """
+    return _catalog_bumps
+
+
 def migrate_db():
     """Run database migrations for schema updates."""
     conn = get_connection()
@@ -95,6 +603,14 @@ def migrate_db():
         cursor.execute("ALTER TABLE cards ADD COLUMN image TEXT")
         conn.commit()
 
+    # Soft-deleted users are hidden until their rows are purged
+    cursor.execute("PRAGMA table_info(users)")
+    columns = [row['name'] for row in cursor.fetchall()]
+
+    if 'deleted_at' not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN deleted_at TIMESTAMP")
+        conn.commit()
+
     conn.close()
 
 
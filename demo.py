@@ -8,7 +8,7 @@ from spaced_repetition import review_card, get_due_cards, get_priority_status
 from progress import compare_users
 from users import get_all_users, setup_default_users
 from database import reset_db
-from quiz import get_quiz_categories, get_quiz_question, answer_quiz, get_quiz_stats, get_category_info
+from quiz import get_quiz_categories, get_quiz_question, answer_quiz, get_quiz_stats_by_category, get_category_info
 
 
 def show_category_status(user: str, category: str, emoji: str):
@@ -123,8 +123,8 @@ def main():
     print("  Quiz Stats for Jack")
     print("-" * 60)
 
-    for cat in get_quiz_categories():
-        stats = get_quiz_stats("Jack", cat)
+    quiz_stats = get_quiz_stats_by_category("Jack")
+    for cat, stats in quiz_stats['categories'].items():
         info = get_category_info(cat)
         print(f"  {info['emoji']} {info['name']}: {stats['reviewed']}/{stats['total_cards']} "
               f"reviewed ({stats['progress_percent']}%)")
@@ -145,6 +145,9 @@ def main():
     print()
     print("  # Get quiz stats")
     print("  get_quiz_stats('Jack', 'animals')")
+    print()
+    print("  # Get quiz stats for every quiz category at once")
+    print("  get_quiz_stats_by_category('Jack')")
 
 
 if __name__ == '__main__':
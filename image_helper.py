@@ -6,19 +6,112 @@ Uses free image APIs (Unsplash, Pixabay) to fetch appropriate images.
 
 Usage:
     python3 image_helper.py
+    python3 image_helper.py --backfill --category animals --workers 8
+    python3 image_helper.py --backfill --stub
 
-This will scan for cards without images and offer to download them.
+The first form scans for cards without images. --backfill downloads
+images for them concurrently (placeholder images unless --source
+unsplash is given with an API key); --stub runs the backfill against a
+local stand-in server instead of the internet.
 """
 
+import argparse
+import json
 import os
+import random
+import threading
+import time
+import urllib.error
 import urllib.request
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from database import get_connection
-from vocabulary import update_card
+from image_store import image_ref, lookup_source, put_blob
+from vocabulary import update_card, update_cards_bulk
 
 # Directory for downloaded images
-IMAGES_DIR = Path(__file__).parent / "images"
+IMAGES_DIR = Path(os.environ.get('FRENCH_LEARNING_IMAGES_DIR', Path(__file__).parent / "images"))
+
+# Image service endpoints (overridable, e.g. to point at a local stand-in server)
+UNSPLASH_API_URL = os.environ.get('FRENCH_LEARNING_UNSPLASH_API_URL', 'https://api.unsplash.com')
+PLACEHOLDER_URL = os.environ.get('FRENCH_LEARNING_PLACEHOLDER_URL',
+                                 'https://via.placeholder.com/200x200.png?text={text}')
+
+# Network defaults for image downloads
+FETCH_TIMEOUT = 10
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+
+# Default concurrency and per-host request rate for backfills
+BACKFILL_WORKERS = 4
+REQUESTS_PER_HOST_PER_SECOND = 5.0
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Content types of downloaded images, by source
+CONTENT_TYPES = {'placeholder': 'image/png', 'unsplash': 'image/jpeg'}
+
+
+class HostRateLimiter:
+    """Spaces out requests to each host to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Block until a request to url's host is allowed."""
+        if not self.interval:
+            return
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch_url(url: str, headers: dict = None, timeout: float = FETCH_TIMEOUT,
+              retries: int = FETCH_RETRIES, backoff: float = FETCH_BACKOFF,
+              limiter: HostRateLimiter = None) -> bytes:
+    """
+    Fetch a URL with a timeout, retrying transient failures.
+
+    Retries connection errors, timeouts and 429/5xx responses with
+    exponential backoff plus jitter.
+
+    Args:
+        url: URL to fetch
+        headers: Optional request headers
+        timeout: Seconds per attempt
+        retries: Extra attempts after the first
+        backoff: Base delay in seconds (doubles each retry)
+        limiter: Optional per-host rate limiter
+
+    Returns:
+        bytes: Response body
+
+    Raises:
+        urllib.error.URLError: If every attempt fails
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.wait(url)
+        try:
+            req = urllib.request.Request(url, headers=headers or {})
+            with urllib.request.urlopen(req, timeout=timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == retries:
+                raise
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            if attempt == retries:
+                raise
+        time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
 
 
 def ensure_images_dir():
@@ -58,46 +151,62 @@ def get_cards_without_images(category: str = None) -> list:
     return cards
 
 
+def _unsplash_image_url(query: str, access_key: str, limiter: HostRateLimiter = None) -> str:
+    """Look up the first Unsplash result for a query (None if no results)."""
+    search_url = f"{UNSPLASH_API_URL}/search/photos?query={urllib.parse.quote(query)}&per_page=1"
+    data = json.loads(fetch_url(search_url, headers={'Authorization': f'Client-ID {access_key}'},
+                                limiter=limiter).decode())
+
+    if not data.get('results'):
+        return None
+
+    # Get the small image URL
+    return data['results'][0]['urls']['small']
+
+
+def _placeholder_image_url(query: str) -> str:
+    """Placeholder image URL showing the query text."""
+    return PLACEHOLDER_URL.format(text=urllib.parse.quote(query[:20]))
+
+
+def _save_image(data: bytes, content_type: str, source_url: str = None) -> str:
+    """Put image bytes in the image store and return the card image reference."""
+    ensure_images_dir()
+    return image_ref(put_blob(data, content_type, source_url))
+
+
+def _fetch_image(image_url: str, content_type: str, **fetch_options) -> str:
+    """Store the image at a URL, skipping the download if it is already stored."""
+    stored = lookup_source(image_url)
+    if stored:
+        return image_ref(stored)
+    return _save_image(fetch_url(image_url, **fetch_options), content_type, image_url)
+
+
 def download_image_unsplash(query: str, filename: str, access_key: str = None) -> str:
     """
     Download an image from Unsplash.
 
     Args:
         query: Search query for the image
-        filename: Filename to save as (without extension)
+        filename: Unused; images are stored by content hash
         access_key: Unsplash API access key
 
     Returns:
-        str: Path to downloaded image, or None if failed
+        str: Card image reference ("blob:<hash>"), or None if failed
     """
     if not access_key:
         print("Unsplash requires an API key. Get one at: https://unsplash.com/developers")
         return None
 
-    ensure_images_dir()
-
     try:
-        # Search for image
-        search_url = f"https://api.unsplash.com/search/photos?query={urllib.parse.quote(query)}&per_page=1"
-        req = urllib.request.Request(search_url)
-        req.add_header('Authorization', f'Client-ID {access_key}')
+        image_url = _unsplash_image_url(query, access_key)
 
-        with urllib.request.urlopen(req) as response:
-            import json
-            data = json.loads(response.read().decode())
+        if not image_url:
+            print(f"No images found for: {query}")
+            return None
 
-            if not data.get('results'):
-                print(f"No images found for: {query}")
-                return None
-
-            # Get the small image URL
-            image_url = data['results'][0]['urls']['small']
-
-            # Download the image
-            filepath = IMAGES_DIR / f"{filename}.jpg"
-            urllib.request.urlretrieve(image_url, filepath)
-
-            return str(filepath)
+        return _fetch_image(image_url, CONTENT_TYPES['unsplash'])
 
     except Exception as e:
         print(f"Error downloading image for '{query}': {e}")
@@ -110,22 +219,13 @@ def download_image_placeholder(query: str, filename: str) -> str:
 
     Args:
         query: Search query (used for placeholder text)
-        filename: Filename to save as
+        filename: Unused; images are stored by content hash
 
     Returns:
-        str: Path to downloaded image
+        str: Card image reference ("blob:<hash>"), or None if failed
     """
-    ensure_images_dir()
-
     try:
-        # Use a placeholder service
-        text = urllib.parse.quote(query[:20])
-        url = f"https://via.placeholder.com/200x200.png?text={text}"
-
-        filepath = IMAGES_DIR / f"{filename}.png"
-        urllib.request.urlretrieve(url, filepath)
-
-        return str(filepath)
+        return _fetch_image(_placeholder_image_url(query), CONTENT_TYPES['placeholder'])
 
     except Exception as e:
         print(f"Error downloading placeholder for '{query}': {e}")
@@ -138,7 +238,7 @@ def set_card_image(card_id: int, image_path: str) -> bool:
 
     Args:
         card_id: Card ID
-        image_path: Path to the image file
+        image_path: Image value (emoji, file path or "blob:<hash>" store reference)
 
     Returns:
         bool: Success status
@@ -146,6 +246,113 @@ def set_card_image(card_id: int, image_path: str) -> bool:
     return update_card(card_id, image=image_path)
 
 
+def set_card_images(images: dict) -> list:
+    """
+    Set image paths for many cards in one transaction.
+
+    Args:
+        images: Mapping of card ID to image value
+
+    Returns:
+        list: Per-card outcomes from update_cards_bulk
+    """
+    return update_cards_bulk([{'id': card_id, 'image': path} for card_id, path in images.items()])
+
+
+def _load_backfill_progress(path) -> dict:
+    """Read {card_id: image} from a progress file (empty if missing)."""
+    if not path or not Path(path).exists():
+        return {}
+    with open(path) as f:
+        return {int(card_id): image for card_id, image in json.load(f).items()}
+
+
+def _save_backfill_progress(path, done: dict):
+    """Atomically write {card_id: image} to a progress file."""
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(done, f)
+    os.replace(tmp_path, path)
+
+
+def backfill_images(cards: list = None, category: str = None, source: str = 'placeholder',
+                    access_key: str = None, workers: int = BACKFILL_WORKERS,
+                    rate: float = REQUESTS_PER_HOST_PER_SECOND, timeout: float = FETCH_TIMEOUT,
+                    retries: int = FETCH_RETRIES, progress_file=None) -> dict:
+    """
+    Download images for many cards concurrently, then store them in one update.
+
+    Downloads run on a bounded thread pool with per-host rate limiting,
+    timeouts and retries. Images go into the content-addressed image
+    store, and URLs already downloaded (e.g. the same placeholder text on
+    several cards) are not fetched again. Finished cards are recorded in
+    progress_file as they complete, so an interrupted run resumes where
+    it stopped. Card image references are written to the database in a
+    single bulk update at the end.
+
+    Args:
+        cards: Cards to fetch images for (default: get_cards_without_images(category))
+        category: Category filter when cards is not given
+        source: 'placeholder' or 'unsplash'
+        access_key: Unsplash API key (required for source='unsplash')
+        workers: Concurrent downloads
+        rate: Maximum requests per second per host
+        timeout: Seconds per request attempt
+        retries: Extra attempts per request
+        progress_file: Optional JSON file for resumable progress
+
+    Returns:
+        dict: {'fetched', 'resumed', 'failed', 'updated', 'errors'}
+    """
+    if source == 'unsplash' and not access_key:
+        raise ValueError("Unsplash requires an API key")
+    if source not in ('placeholder', 'unsplash'):
+        raise ValueError(f"Unknown image source: {source}")
+
+    if cards is None:
+        cards = get_cards_without_images(category)
+
+    done = _load_backfill_progress(progress_file)
+    pending = [card for card in cards if card['id'] not in done]
+    report = {'fetched': 0, 'resumed': len(cards) - len(pending), 'failed': 0, 'updated': 0, 'errors': {}}
+
+    limiter = HostRateLimiter(rate)
+    lock = threading.Lock()
+
+    def fetch(card):
+        query = card['english'].split('/')[0].strip()
+        if source == 'unsplash':
+            image_url = _unsplash_image_url(query, access_key, limiter)
+            if not image_url:
+                raise LookupError(f"no images found for '{query}'")
+        else:
+            image_url = _placeholder_image_url(query)
+        return _fetch_image(image_url, CONTENT_TYPES[source],
+                            timeout=timeout, retries=retries, limiter=limiter)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch, card): card for card in pending}
+        for future in as_completed(futures):
+            card = futures[future]
+            try:
+                path = future.result()
+            except Exception as e:
+                report['failed'] += 1
+                report['errors'][card['id']] = str(e)
+                continue
+            with lock:
+                done[card['id']] = path
+                report['fetched'] += 1
+                if progress_file:
+                    _save_backfill_progress(progress_file, done)
+
+    wanted = {card['id'] for card in cards}
+    outcomes = set_card_images({card_id: path for card_id, path in done.items() if card_id in wanted})
+    report['updated'] = sum(1 for outcome in outcomes if outcome['status'] == 'updated')
+
+    return report
+
+
 def list_missing_images(categories: list = None):
     """
     List all cards that are missing images.
@@ -169,12 +376,51 @@ def list_missing_images(categories: list = None):
 
 def main():
     """Main function to run when script is executed directly."""
+    parser = argparse.ArgumentParser(description='Find and download images for vocabulary cards.')
+    parser.add_argument('--backfill', action='store_true', help='Download images for cards without one')
+    parser.add_argument('--category', help='Only this category')
+    parser.add_argument('--source', choices=['placeholder', 'unsplash'], default='placeholder')
+    parser.add_argument('--access-key', default=os.environ.get('UNSPLASH_ACCESS_KEY'),
+                        help='Unsplash API key (or set UNSPLASH_ACCESS_KEY)')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_HOST_PER_SECOND,
+                        help='Max requests per second per host')
+    parser.add_argument('--progress-file', help='JSON file to resume an interrupted backfill')
+    parser.add_argument('--stub', action='store_true', help='Fetch from a local stand-in server')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  Image Helper - French Learning App")
     print("=" * 60)
 
     from quiz import QUIZ_CATEGORIES
 
+    if args.backfill:
+        global PLACEHOLDER_URL, UNSPLASH_API_URL
+        server = None
+        if args.stub:
+            from image_stub_server import start_stub_server
+            server, base_url = start_stub_server()
+            PLACEHOLDER_URL = f"{base_url}/placeholder.png?text={{text}}"
+            UNSPLASH_API_URL = base_url
+            print(f"\nUsing local stand-in server at {base_url}")
+
+        start = time.perf_counter()
+        report = backfill_images(category=args.category, source=args.source,
+                                 access_key=args.access_key or ('stub' if args.stub else None),
+                                 workers=args.workers, rate=args.rate,
+                                 progress_file=args.progress_file)
+        seconds = time.perf_counter() - start
+
+        if server:
+            server.shutdown()
+
+        print(f"\nFetched {report['fetched']}, resumed {report['resumed']}, "
+              f"failed {report['failed']}, updated {report['updated']} cards in {seconds:.1f}s")
+        for card_id, error in list(report['errors'].items())[:10]:
+            print(f"  ! card {card_id}: {error}")
+        return
+
     print("\nChecking for cards without images in quiz categories...")
     list_missing_images(QUIZ_CATEGORIES)
 
@@ -182,7 +428,7 @@ def main():
     print("Options:")
     print("  1. Most quiz categories use emoji (no downloads needed)")
     print("  2. To add custom images, use set_card_image(card_id, path)")
-    print("  3. For bulk downloads, provide an Unsplash API key")
+    print("  3. For bulk downloads, run with --backfill (Unsplash needs an API key)")
     print("-" * 60)
 
 
@@ -0,0 +1,263 @@
+"""
+Content-Addressed Image Store
+=============================
+Stores card images on disk keyed by the SHA-256 of their bytes.
+
+    images/blobs/ab/cd/abcd1234...    (two levels of sharding)
+
+Identical pictures are stored once, however many cards or decks use
+them. A card points at a blob by setting its image to "blob:<hash>";
+triggers keep the card_images index table in step with cards.image and
+maintain each blob's reference count. Blobs whose count drops to zero
+are removed by collect_garbage.
+
+image_sources remembers which URL produced which blob, so downloaders
+can skip URLs whose content is already stored.
+
+Usage:
+    python3 image_store.py stats
+    python3 image_store.py gc [--dry-run] [--now]
+"""
+
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+from database import get_connection
+from writer import run_write
+
+# Prefix marking a card image as a reference to a stored blob
+IMAGE_REF_PREFIX = 'blob:'
+
+# Unreferenced blobs younger than this are kept by collect_garbage, so a
+# blob stored moments before its card is updated is not swept in between
+GC_GRACE_SECONDS = 3600
+
+
+def blobs_dir() -> Path:
+    """Root directory of the blob store (under image_helper.IMAGES_DIR)."""
+    from image_helper import IMAGES_DIR
+    return IMAGES_DIR / 'blobs'
+
+
+def blob_path(hash_hex: str) -> Path:
+    """Path of the blob file for a hash."""
+    return blobs_dir() / hash_hex[:2] / hash_hex[2:4] / hash_hex
+
+
+def image_ref(hash_hex: str) -> str:
+    """Card image value referencing a blob."""
+    return f"{IMAGE_REF_PREFIX}{hash_hex}"
+
+
+def parse_image_ref(image: str):
+    """Get the blob hash from a card image value, or None if it isn't a blob reference."""
+    if image and image.startswith(IMAGE_REF_PREFIX):
+        return image[len(IMAGE_REF_PREFIX):]
+    return None
+
+
+def has_blob(hash_hex: str) -> bool:
+    """Check whether a blob is stored (both indexed and on disk)."""
+    conn = get_connection()
+    row = conn.execute("SELECT 1 FROM image_blobs WHERE hash = ?", (hash_hex,)).fetchone()
+    conn.close()
+    return row is not None and blob_path(hash_hex).exists()
+
+
+def _record_blob(cursor, hash_hex: str, size: int, content_type: str, source_url: str):
+    """Index a stored blob and its source URL (write function, see writer.py)."""
+    # Cards may reference the hash before the blob is stored (e.g. an import
+    # run ahead of the upload); the triggers had no row to count them on
+    cursor.execute("""
+        INSERT INTO image_blobs (hash, size, content_type, ref_count)
+        VALUES (?, ?, ?, (SELECT COUNT(*) FROM card_images WHERE hash = ?))
+        ON CONFLICT(hash) DO UPDATE SET stored_at = CURRENT_TIMESTAMP, ref_count = excluded.ref_count
+    """, (hash_hex, size, content_type, hash_hex))
+    if source_url:
+        cursor.execute("""
+            INSERT INTO image_sources (url, hash) VALUES (?, ?)
+            ON CONFLICT(url) DO UPDATE SET hash = excluded.hash
+        """, (source_url, hash_hex))
+
+
+def put_blob(data: bytes, content_type: str = None, source_url: str = None) -> str:
+    """
+    Store image bytes, deduplicating by content.
+
+    Args:
+        data: Image bytes
+        content_type: MIME type to serve the image with
+        source_url: Optional URL the bytes came from (recorded for lookup_source)
+
+    Returns:
+        str: SHA-256 hex digest of the data
+    """
+    hash_hex = hashlib.sha256(data).hexdigest()
+    path = blob_path(hash_hex)
+
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{hash_hex}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    run_write(_record_blob, hash_hex, len(data), content_type, source_url)
+
+    return hash_hex
+
+
+def lookup_source(url: str):
+    """
+    Find the stored blob previously downloaded from a URL.
+
+    Returns:
+        str: Blob hash, or None if the URL is unknown or its blob is gone
+    """
+    conn = get_connection()
+    row = conn.execute("SELECT hash FROM image_sources WHERE url = ?", (url,)).fetchone()
+    conn.close()
+
+    if row and blob_path(row['hash']).exists():
+        return row['hash']
+    return None
+
+
+def get_blob(hash_hex: str) -> dict:
+    """
+    Get metadata for a stored blob.
+
+    Returns:
+        dict: hash, size, content_type, ref_count and path; None if unknown
+    """
+    conn = get_connection()
+    row = conn.execute("SELECT * FROM image_blobs WHERE hash = ?", (hash_hex,)).fetchone()
+    conn.close()
+
+    if not row:
+        return None
+
+    blob = dict(row)
+    blob['path'] = str(blob_path(hash_hex))
+    return blob
+
+
+def get_card_blob(card_id: int) -> dict:
+    """Get blob metadata for a card's stored image (None if it has none)."""
+    conn = get_connection()
+    row = conn.execute("SELECT hash FROM card_images WHERE card_id = ?", (card_id,)).fetchone()
+    conn.close()
+    return get_blob(row['hash']) if row else None
+
+
+def _sweep_blobs(cursor, grace_seconds: int, dry_run: bool) -> tuple:
+    """
+    Delete rows of unreferenced blobs older than grace_seconds (write function, see writer.py).
+
+    Returns:
+        tuple: (report, hashes whose rows were deleted); the files are
+        left for the caller to remove once the deletes are committed
+    """
+    cursor.execute("""
+        SELECT hash, size FROM image_blobs
+        WHERE ref_count <= 0 AND stored_at <= datetime('now', ?)
+          AND NOT EXISTS (SELECT 1 FROM card_images WHERE card_images.hash = image_blobs.hash)
+    """, (f'-{int(grace_seconds)} seconds',))
+    unreferenced = cursor.fetchall()
+    report = {
+        'blobs_removed': len(unreferenced),
+        'bytes_freed': sum(row['size'] for row in unreferenced),
+        'orphan_files_removed': 0
+    }
+
+    if dry_run or not unreferenced:
+        return report, []
+
+    hashes = [row['hash'] for row in unreferenced]
+    cursor.executemany("DELETE FROM image_sources WHERE hash = ?", [(h,) for h in hashes])
+    cursor.executemany("DELETE FROM image_blobs WHERE hash = ?", [(h,) for h in hashes])
+    return report, hashes
+
+
+def collect_garbage(dry_run: bool = False, grace_seconds: int = GC_GRACE_SECONDS) -> dict:
+    """
+    Delete blobs that no card references.
+
+    Removes unreferenced blob rows, their source records and files, plus
+    any files in the store that have no blob row. Anything stored within
+    the last grace_seconds is left alone.
+
+    Args:
+        dry_run: Only report what would be removed
+        grace_seconds: Minimum age of a blob before it can be removed
+
+    Returns:
+        dict: {'blobs_removed', 'bytes_freed', 'orphan_files_removed'}
+    """
+    # A write holds the lock, so no card can take a reference mid-sweep
+    report, removed = run_write(_sweep_blobs, grace_seconds, dry_run)
+
+    conn = get_connection()
+    known = {row['hash'] for row in conn.execute("SELECT hash FROM image_blobs")}
+    conn.close()
+
+    # Files go only once their rows are deleted for good: a sweep that
+    # rolls back (or is retried) leaves every file in place. A blob
+    # stored again since the sweep has a row once more and is kept.
+    for hash_hex in removed:
+        if hash_hex not in known:
+            blob_path(hash_hex).unlink(missing_ok=True)
+
+    root = blobs_dir()
+    cutoff = time.time() - grace_seconds
+    if root.exists():
+        for path in root.glob('*/*/*'):
+            if path.name not in known and path.stat().st_mtime <= cutoff:
+                report['orphan_files_removed'] += 1
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+
+    return report
+
+
+def store_stats() -> dict:
+    """
+    Summarise the image store.
+
+    Returns:
+        dict: blobs, total_bytes, referenced_cards and unreferenced blobs
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) as blobs, COALESCE(SUM(size), 0) as total_bytes,
+               COUNT(CASE WHEN ref_count <= 0 THEN 1 END) as unreferenced
+        FROM image_blobs
+    """)
+    stats = dict(cursor.fetchone())
+    cursor.execute("SELECT COUNT(*) FROM card_images")
+    stats['referenced_cards'] = cursor.fetchone()[0]
+    conn.close()
+    return stats
+
+
+def main():
+    """Command-line entry point."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+
+    if command == 'stats':
+        for key, value in store_stats().items():
+            print(f"  {key}: {value}")
+    elif command == 'gc':
+        grace = 0 if '--now' in sys.argv else GC_GRACE_SECONDS
+        report = collect_garbage(dry_run='--dry-run' in sys.argv, grace_seconds=grace)
+        print(f"  Removed {report['blobs_removed']} blobs ({report['bytes_freed']} bytes), "
+              f"{report['orphan_files_removed']} orphan files")
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
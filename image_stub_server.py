@@ -0,0 +1,130 @@
+"""
+Image Stub Server
+=================
+Local stand-in for the image services used by image_helper.
+
+Serves deterministic images so backfills can be exercised without
+network access or API keys:
+
+    /placeholder.png?text=...    PNG image for the text (placeholder service)
+    /search/photos?query=...     Unsplash-style search result JSON
+    /photo/<name>.jpg            Image referenced by search results
+
+Optionally injects latency and transient errors (at random, or for the
+first N requests) to exercise the retry and rate-limiting paths.
+
+Usage:
+    python3 image_stub_server.py [port]
+"""
+
+import json
+import random
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_png(text: str) -> bytes:
+    """Build a small solid-colour PNG whose colour is derived from text."""
+    colour = zlib.crc32(text.encode('utf-8')).to_bytes(4, 'big')[:3]
+    width = height = 8
+    raw = b''.join(b'\0' + colour * width for _ in range(height))
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw))
+            + chunk(b'IEND', b''))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler; behaviour is configured on the server object."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.stats['requests'] += 1
+            fail = server.stats['requests'] <= server.fail_first
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        if fail or (server.fail_rate and random.random() < server.fail_rate):
+            with server.stats_lock:
+                server.stats['failures'] += 1
+            self.send_error(server.fail_status, 'Injected failure')
+            return
+
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+
+        if url.path == '/placeholder.png':
+            self.send_body(make_png(params.get('text', [''])[0]), 'image/png')
+        elif url.path == '/search/photos':
+            query = params.get('query', [''])[0]
+            base = f"http://{self.headers['Host']}"
+            results = [{'urls': {'small': f"{base}/photo/{urllib.parse.quote(query)}.jpg"}}] if query else []
+            self.send_body(json.dumps({'results': results}).encode(), 'application/json')
+        elif url.path.startswith('/photo/'):
+            self.send_body(make_png(urllib.parse.unquote(url.path[len('/photo/'):])), 'image/jpeg')
+        else:
+            self.send_error(404)
+
+
+def start_stub_server(port: int = 0, delay: float = 0, fail_rate: float = 0,
+                      fail_first: int = 0, fail_status: int = 503):
+    """
+    Start the stub server on a background thread.
+
+    Args:
+        port: Port to bind on 127.0.0.1 (0 picks a free port)
+        delay: Seconds to wait before answering each request
+        fail_rate: Fraction of requests answered with fail_status
+        fail_first: Number of initial requests answered with fail_status
+        fail_status: HTTP status of injected failures
+
+    Returns:
+        tuple: (server, base_url); call server.shutdown() to stop it.
+        server.stats counts requests and injected failures
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.fail_rate = fail_rate
+    server.fail_first = fail_first
+    server.fail_status = fail_status
+    server.stats = {'requests': 0, 'failures': 0}
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, name='image-stub-server', daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == '__main__':
+    server, base_url = start_stub_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Image stub server running at {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,343 @@
+"""
+Deck Importer
+=============
+Stream vocabulary decks from CSV, TSV or JSON-lines files into the cards table.
+
+Rows are read and written in chunks inside a single transaction (one
+write through writer.py), so large files import in bounded memory and
+a failed import leaves the catalog untouched. Cards are matched on their
+natural key (category, french): existing cards are updated, new ones
+inserted, and identical rows skipped, so re-importing a deck never
+duplicates it.
+
+With --commit-chunks (atomic=False) each chunk is committed as its own
+write instead, letting reviews take the lock in between on a very large
+import. A failure then keeps the chunks already written; since the
+import is an idempotent upsert, running it again completes it.
+
+Usage:
+    python3 importer.py deck.csv
+    python3 importer.py deck.jsonl --chunk-size 10000 --no-update
+    python3 importer.py huge.csv --commit-chunks
+
+Columns / keys:
+    topic, french, english (required)
+    category (default 'general'), priority (1-5, default 3),
+    pronunciation, image (optional)
+"""
+
+import argparse
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+from database import bump_catalog_version
+from writer import run_write
+
+# File extensions recognised for each format
+FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Card columns written by the importer, in insert order
+CARD_FIELDS = ('category', 'topic', 'french', 'english', 'pronunciation', 'priority', 'image')
+
+# Values for optional fields missing from a new card
+INSERT_DEFAULTS = {'priority': 3}
+
+# Number of keys looked up per SELECT when matching existing cards
+LOOKUP_BATCH = 500
+
+# Number of error messages kept in the import report
+MAX_REPORTED_ERRORS = 20
+
+
+def detect_format(path) -> str:
+    """Guess the deck format from the file extension."""
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if not fmt:
+        raise ValueError(f"Unknown deck format for '{path}' (use --format csv, tsv or jsonl)")
+    return fmt
+
+
+def iter_deck_rows(path, fmt: str = None):
+    """
+    Lazily read rows from a deck file.
+
+    Args:
+        path: Path to the deck file
+        fmt: 'csv', 'tsv' or 'jsonl' (detected from the extension if omitted)
+
+    Yields:
+        dict: One raw row per card
+    """
+    fmt = fmt or detect_format(path)
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt in ('csv', 'tsv'):
+            reader = csv.DictReader(f, delimiter='\t' if fmt == 'tsv' else ',')
+            yield from reader
+        elif fmt == 'jsonl':
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {'_error': f"line {line_no}: invalid JSON ({e.msg})"}
+        else:
+            raise ValueError(f"Unknown deck format: {fmt}")
+
+
+def validate_row(row: dict) -> tuple:
+    """
+    Validate and normalise a raw deck row.
+
+    Args:
+        row: Raw row from iter_deck_rows
+
+    Returns:
+        tuple: Card values in CARD_FIELDS order. Optional fields that are
+        absent (pronunciation, priority, image) are None
+
+    Raises:
+        ValueError: If the row is missing required fields or has a bad priority
+    """
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    if '_error' in row:
+        raise ValueError(row['_error'])
+
+    def text(key):
+        value = row.get(key)
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+
+    missing = [key for key in ('topic', 'french', 'english') if not text(key)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    priority = text('priority')
+    if priority is not None:
+        try:
+            priority = int(priority)
+        except ValueError:
+            raise ValueError(f"priority '{priority}' is not a number")
+        if not 1 <= priority <= 5:
+            raise ValueError(f"priority {priority} is not between 1 and 5")
+
+    return (text('category') or 'general', text('topic'), text('french'), text('english'),
+            text('pronunciation'), priority, text('image'))
+
+
+def _find_existing(cursor, keys: list) -> dict:
+    """Map (category, french) keys to their existing card rows."""
+    by_category = {}
+    for category, french in keys:
+        by_category.setdefault(category, []).append(french)
+
+    existing = {}
+    for category, words in by_category.items():
+        for start in range(0, len(words), LOOKUP_BATCH):
+            batch = words[start:start + LOOKUP_BATCH]
+            cursor.execute(f"""
+                SELECT id, {', '.join(CARD_FIELDS)} FROM cards
+                WHERE category = ? AND french IN ({', '.join('?' for _ in batch)})
+            """, [category] + batch)
+            for row in cursor.fetchall():
+                existing.setdefault((row['category'], row['french']), row)
+    return existing
+
+
+def _new_report() -> dict:
+    return {'inserted': 0, 'updated': 0, 'skipped': 0, 'invalid': 0, 'rows': 0, 'errors': []}
+
+
+def _merge_report(report: dict, part: dict):
+    for key in ('inserted', 'updated', 'skipped', 'invalid', 'rows'):
+        report[key] += part[key]
+    report['errors'].extend(part['errors'][:MAX_REPORTED_ERRORS - len(report['errors'])])
+
+
+def _validate_chunk(chunk: list, report: dict, first_row: int) -> dict:
+    """Validate raw rows, keeping the last row for each (category, french) key."""
+    cards = {}
+    for number, raw in enumerate(chunk, first_row):
+        report['rows'] += 1
+        try:
+            card = validate_row(raw)
+        except ValueError as e:
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append(f"row {number}: {e}")
+            continue
+        key = (card[0], card[2])
+        if key in cards:
+            report['skipped'] += 1
+        cards[key] = card
+    return cards
+
+
+def _upsert_cards(cursor, cards: dict, update_existing: bool, report: dict):
+    """Insert or update validated cards, counting outcomes in report."""
+    existing = _find_existing(cursor, list(cards))
+
+    inserts = []
+    updates = []
+    for key, card in cards.items():
+        row = existing.get(key)
+        if row is None:
+            inserts.append(tuple(
+                INSERT_DEFAULTS.get(field) if value is None else value
+                for field, value in zip(CARD_FIELDS, card)
+            ))
+            continue
+
+        merged = tuple(
+            row[field] if value is None else value
+            for field, value in zip(CARD_FIELDS, card)
+        )
+        if update_existing and merged != tuple(row[field] for field in CARD_FIELDS):
+            updates.append(merged[1:] + (row['id'],))
+        else:
+            report['skipped'] += 1
+
+    if inserts:
+        cursor.executemany(f"""
+            INSERT INTO cards ({', '.join(CARD_FIELDS)})
+            VALUES ({', '.join('?' for _ in CARD_FIELDS)})
+        """, inserts)
+    if updates:
+        cursor.executemany(f"""
+            UPDATE cards SET {', '.join(f'{field} = ?' for field in CARD_FIELDS[1:])}
+            WHERE id = ?
+        """, updates)
+
+    report['inserted'] += len(inserts)
+    report['updated'] += len(updates)
+
+
+def _import_rows(cursor, rows, chunk_size: int, update_existing: bool, attempts: list) -> dict:
+    """Import every chunk of rows in one transaction; returns the report (write function, see writer.py)."""
+    if attempts:
+        # A retried transaction: the rows read by the first attempt are gone
+        raise RuntimeError("Import transaction was retried after reading rows; run the import again")
+    attempts.append(True)
+
+    report = _new_report()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        cards = _validate_chunk(chunk, report, report['rows'] + 1)
+        _upsert_cards(cursor, cards, update_existing, report)
+
+    if report['inserted'] or report['updated']:
+        bump_catalog_version(cursor)
+    return report
+
+
+def _import_chunk(cursor, cards: dict, update_existing: bool) -> dict:
+    """Import one validated chunk; returns its counts (write function, see writer.py)."""
+    report = _new_report()
+    _upsert_cards(cursor, cards, update_existing, report)
+    if report['inserted'] or report['updated']:
+        bump_catalog_version(cursor)
+    return report
+
+
+def import_cards(rows, chunk_size: int = 5000, update_existing: bool = True, atomic: bool = True) -> dict:
+    """
+    Upsert an iterable of card rows in chunks within a single transaction.
+
+    Cards are matched on (category, french). Later rows for the same key
+    win. Optional fields missing from a row keep their current value on
+    update and take the usual defaults on insert. The catalog version is
+    bumped once if anything changed.
+
+    Args:
+        rows: Iterable of raw row dicts (consumed lazily)
+        chunk_size: Rows processed per chunk
+        update_existing: Update matching cards (otherwise they are skipped)
+        atomic: Import everything in one transaction; if False, commit
+            each chunk separately (a failure keeps the chunks written
+            so far, and the catalog version is bumped per chunk)
+
+    Returns:
+        dict: Import report with inserted, updated, skipped, invalid,
+        rows, seconds, rows_per_second and a sample of errors
+    """
+    start_time = time.perf_counter()
+    rows = iter(rows)
+
+    if atomic:
+        report = run_write(_import_rows, rows, chunk_size, update_existing, [])
+    else:
+        report = _new_report()
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            cards = _validate_chunk(chunk, report, report['rows'] + 1)
+            _merge_report(report, run_write(_import_chunk, cards, update_existing))
+
+    seconds = time.perf_counter() - start_time
+    report['seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round(report['rows'] / seconds) if seconds > 0 else 0
+
+    return report
+
+
+def import_deck(path, fmt: str = None, chunk_size: int = 5000, update_existing: bool = True,
+                atomic: bool = True) -> dict:
+    """
+    Import a deck file (CSV, TSV or JSON-lines) into the cards table.
+
+    Args:
+        path: Path to the deck file
+        fmt: 'csv', 'tsv' or 'jsonl' (detected from the extension if omitted)
+        chunk_size: Rows processed per chunk
+        update_existing: Update cards that already exist
+        atomic: Import in one transaction (see import_cards)
+
+    Returns:
+        dict: Import report (see import_cards)
+    """
+    return import_cards(iter_deck_rows(path, fmt), chunk_size=chunk_size,
+                        update_existing=update_existing, atomic=atomic)
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Import a vocabulary deck into the French learning database.')
+    parser.add_argument('path', help='Deck file (.csv, .tsv, .jsonl)')
+    parser.add_argument('--format', choices=['csv', 'tsv', 'jsonl'], help='Override format detection')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per chunk (default 5000)')
+    parser.add_argument('--no-update', action='store_true', help='Skip cards that already exist')
+    parser.add_argument('--commit-chunks', action='store_true',
+                        help='Commit each chunk separately instead of one transaction')
+    args = parser.parse_args()
+
+    report = import_deck(args.path, fmt=args.format, chunk_size=args.chunk_size,
+                         update_existing=not args.no_update, atomic=not args.commit_chunks)
+
+    print(f"Imported {args.path}")
+    print(f"  Rows:      {report['rows']}")
+    print(f"  Inserted:  {report['inserted']}")
+    print(f"  Updated:   {report['updated']}")
+    print(f"  Skipped:   {report['skipped']}")
+    print(f"  Invalid:   {report['invalid']}")
+    print(f"  Time:      {report['seconds']}s ({report['rows_per_second']} rows/s)")
+    for error in report['errors']:
+        print(f"  ! {error}")
+
+
+if __name__ == '__main__':
+    main()
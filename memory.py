@@ -0,0 +1,236 @@
+"""
+Memory Report
+=============
+Per-cache byte estimates and tracemalloc snapshot diffs for a worker
+process, served by the admin-only /admin/memory route in web/app.py.
+
+Every module-level cache registers a function returning its current
+size in bytes:
+
+    register_cache('quiz_index', lambda: deep_sizeof(_quiz_indexes))
+
+cache_report() lists them against optional budgets, set as
+FRENCH_LEARNING_CACHE_BUDGETS="catalog=64MB,quiz_index=8MB". The sizes
+are also exported as the cache_bytes gauge on /metrics.
+
+tracemalloc_diff() starts tracemalloc on first use and from then on
+reports the allocation sites that grew most since the previous call.
+Tracing slows allocation noticeably, so stop it (stop_tracemalloc())
+once done.
+"""
+
+import gc
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from array import array
+from collections import deque
+from metrics import gauge
+
+CACHE_BYTES = gauge('cache_bytes', 'Estimated size of each in-process cache', ['cache'])
+RESIDENT_BYTES = gauge('process_resident_memory_bytes', 'Resident set size of the process')
+
+# Registered caches: name -> callable returning bytes
+_caches = {}
+
+# Previous tracemalloc snapshot, compared against by the next diff
+_tracemalloc_lock = threading.Lock()
+_previous_snapshot = None
+
+# Allocations by these modules are tracemalloc's own bookkeeping
+_IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>',
+                  '<unknown>')
+
+_SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size such as '512KB', '64MB' or '1048576'.
+
+    Raises:
+        ValueError: If the size is not understood
+    """
+    text = text.strip().upper()
+    number = text.rstrip('KMGB')
+    unit = text[len(number):]
+    if unit not in _SIZE_UNITS:
+        raise ValueError(f"Unknown size unit in {text!r}")
+    return int(float(number) * _SIZE_UNITS[unit])
+
+
+def _parse_budgets(spec: str) -> dict:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, size = item.partition('=')
+        budgets[name.strip()] = parse_size(size)
+    return budgets
+
+
+CACHE_BUDGETS = _parse_budgets(os.environ.get('FRENCH_LEARNING_CACHE_BUDGETS', ''))
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """
+    Approximate size of an object and everything it holds, in bytes.
+
+    Follows containers and instance attributes; objects reachable more
+    than once are counted once. Memory-mapped buffers are not counted.
+
+    Args:
+        obj: Object to measure
+        seen: ids already counted (shared across calls to avoid double counting)
+
+    Returns:
+        int: Bytes
+    """
+    if seen is None:
+        seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, array, memoryview, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(item.__dict__)
+            for slot in getattr(type(item), '__slots__', ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def register_cache(name: str, estimate):
+    """
+    Register a cache for memory reporting.
+
+    Args:
+        name: Cache name (also the budget key and metric label)
+        estimate: Callable returning the cache's current size in bytes
+    """
+    _caches[name] = estimate
+
+
+def cache_report() -> list:
+    """
+    Current size of every registered cache, with its budget.
+
+    Returns:
+        list: Dicts with name, bytes, budget (or None) and over_budget,
+            largest first
+    """
+    report = []
+    for name, estimate in list(_caches.items()):
+        try:
+            size = int(estimate())
+        except Exception as e:
+            report.append({'name': name, 'bytes': None, 'budget': CACHE_BUDGETS.get(name),
+                           'over_budget': False, 'error': str(e)})
+            continue
+        budget = CACHE_BUDGETS.get(name)
+        report.append({'name': name, 'bytes': size, 'budget': budget,
+                       'over_budget': budget is not None and size > budget})
+    report.sort(key=lambda entry: -(entry['bytes'] or 0))
+    return report
+
+
+def process_memory() -> dict:
+    """
+    Resident memory of this process.
+
+    Returns:
+        dict: rss_bytes (None where /proc is unavailable) and peak_rss_bytes
+    """
+    rss = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak_bytes = peak if sys.platform == 'darwin' else peak * 1024
+    return {'rss_bytes': rss, 'peak_rss_bytes': peak_bytes}
+
+
+def update_metrics():
+    """Refresh the cache_bytes and resident memory gauges."""
+    for entry in cache_report():
+        if entry['bytes'] is not None:
+            CACHE_BYTES.set(entry['bytes'], cache=entry['name'])
+    rss = process_memory()['rss_bytes']
+    if rss is not None:
+        RESIDENT_BYTES.set(rss)
+
+
+def _take_snapshot():
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    return snapshot.filter_traces([tracemalloc.Filter(False, name) for name in _IGNORED_FILES])
+
+
+def tracemalloc_diff(limit: int = 20, group_by: str = 'lineno', frames: int = 1) -> dict:
+    """
+    Compare memory allocations with the previous call.
+
+    The first call starts tracemalloc and records a baseline, so its
+    report has no differences yet.
+
+    Args:
+        limit: Number of allocation sites to report
+        group_by: 'lineno', 'filename' or 'traceback'
+        frames: Stack frames stored per allocation when starting
+
+    Returns:
+        dict: started (True if tracing began with this call),
+            traced_bytes, peak_traced_bytes and top, a list of sites
+            with size_diff, size, count_diff and count
+    """
+    global _previous_snapshot
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        raise ValueError(f"Cannot group allocations by {group_by}")
+
+    with _tracemalloc_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+            _previous_snapshot = None
+
+        snapshot = _take_snapshot()
+        top = []
+        if _previous_snapshot is not None:
+            for stat in snapshot.compare_to(_previous_snapshot, group_by)[:limit]:
+                top.append({
+                    'site': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    'size_diff': stat.size_diff,
+                    'size': stat.size,
+                    'count_diff': stat.count_diff,
+                    'count': stat.count,
+                })
+        _previous_snapshot = snapshot
+
+        traced, peak = tracemalloc.get_traced_memory()
+        return {'started': started, 'traced_bytes': traced, 'peak_traced_bytes': peak, 'top': top}
+
+
+def stop_tracemalloc():
+    """Stop tracing allocations and drop the stored snapshot."""
+    global _previous_snapshot
+    with _tracemalloc_lock:
+        _previous_snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,335 @@
+"""
+Metrics
+=======
+In-process counters, gauges and histograms, exported in the Prometheus
+text format by the /metrics route in web/app.py.
+
+    LATENCY = histogram('app_latency_seconds', 'Handler latency', ['endpoint'])
+    LATENCY.observe(0.012, endpoint='home')
+    print(render())
+
+Metrics are registered at import time by the modules that update them
+(database, catalog, spaced_repetition, web/app.py). Registering the same
+name again returns the existing metric.
+
+Multi-process mode
+------------------
+Under gunicorn every worker has its own registry. Set
+FRENCH_LEARNING_METRICS_DIR to a directory shared by the workers and
+each process writes its values to <dir>/metrics-<pid>.json, at most once
+every FLUSH_INTERVAL seconds from a background thread and again at exit.
+render() adds up every process's file, so any worker can answer a
+scrape. Counters and histograms of workers that have exited are kept,
+so totals do not go backwards when gunicorn recycles a worker; gauges
+only count live processes. Empty the directory when the server restarts.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+# Shared directory for multi-process aggregation (None: this process only)
+METRICS_DIR = os.environ.get('FRENCH_LEARNING_METRICS_DIR') or None
+
+# Seconds between writes of this process's values in multi-process mode
+FLUSH_INTERVAL = 1.0
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Registered metrics by name, in registration order
+_registry = {}
+_lock = threading.Lock()
+
+# Multi-process state: whether values changed since the last flush, and
+# the process that started the flush thread (a forked worker needs its own)
+_dirty = False
+_flusher_pid = None
+
+
+class Metric:
+    """Base class: a named family of values keyed by label values."""
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+
+    def _meta(self) -> dict:
+        return {'type': self.type, 'help': self.documentation, 'labelnames': list(self.labelnames)}
+
+
+class Counter(Metric):
+    """Monotonically increasing total."""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+            _mark_dirty()
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = value
+            _mark_dirty()
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+            _mark_dirty()
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values.
+
+    Each label set stores a count per bucket (plus +Inf) followed by the
+    sum of observations; render() makes the buckets cumulative.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+            _mark_dirty()
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _meta(self) -> dict:
+        meta = super()._meta()
+        meta['buckets'] = list(self.buckets)
+        return meta
+
+
+def _register(cls, name: str, *args, **kwargs) -> Metric:
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames=()) -> Counter:
+    """Register (or get) a counter."""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames=()) -> Gauge:
+    """Register (or get) a gauge."""
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Register (or get) a histogram."""
+    return _register(Histogram, name, documentation, labelnames, buckets)
+
+
+def _mark_dirty():
+    # Called with _lock held
+    global _dirty
+    _dirty = True
+    if METRICS_DIR and _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+def _start_flusher():
+    global _flusher_pid
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        if _dirty:
+            try:
+                flush()
+            except OSError:
+                pass
+
+
+def snapshot() -> dict:
+    """
+    Copy this process's metrics.
+
+    Returns:
+        dict: name -> {'type', 'help', 'labelnames', ['buckets'],
+            'values': [[label values, value], ...]}
+    """
+    global _dirty
+    with _lock:
+        _dirty = False
+        data = {}
+        for name, metric in _registry.items():
+            entry = metric._meta()
+            entry['values'] = [[list(key), list(value) if isinstance(value, list) else value]
+                               for key, value in metric.values.items()]
+            data[name] = entry
+        return data
+
+
+def flush():
+    """Write this process's values to METRICS_DIR (multi-process mode only)."""
+    if not METRICS_DIR:
+        return
+    directory = Path(METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"metrics-{os.getpid()}.json"
+    tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(snapshot()))
+    os.replace(tmp_path, path)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(merged: dict, data: dict, include_gauges: bool = True):
+    for name, entry in data.items():
+        target = merged.get(name)
+        if target is None:
+            target = merged[name] = dict(entry, values={})
+        if entry['type'] == 'gauge' and not include_gauges:
+            continue
+        values = target['values']
+        for key, value in entry['values']:
+            key = tuple(key)
+            current = values.get(key)
+            if current is None:
+                values[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                values[key] = [a + b for a, b in zip(current, value)]
+            else:
+                values[key] = current + value
+
+
+def collect() -> dict:
+    """
+    Gather metric values, from every process in multi-process mode.
+
+    Returns:
+        dict: name -> metric entry as in snapshot(), with 'values' as a
+            {label values tuple: value} dict
+    """
+    merged = {}
+    if not METRICS_DIR:
+        _merge(merged, snapshot())
+        return merged
+
+    flush()
+    pid = os.getpid()
+    for path in sorted(Path(METRICS_DIR).glob('metrics-*.json')):
+        try:
+            file_pid = int(path.stem.split('-', 1)[1])
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        _merge(merged, data, include_gauges=file_pid == pid or _process_alive(file_pid))
+    return merged
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render() -> str:
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: Exposition text, served with CONTENT_TYPE
+    """
+    lines = []
+    for name, entry in collect().items():
+        labelnames = entry['labelnames']
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['type']}")
+
+        for key, value in sorted(entry['values'].items()):
+            pairs = list(zip(labelnames, key))
+            if entry['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                continue
+
+            cumulative = 0
+            bounds = entry['buckets'] + [float('inf')]
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                le = _format_value(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(pairs)} {cumulative}")
+
+    return '\n'.join(lines) + '\n'
+
+
+if METRICS_DIR:
+    atexit.register(flush)
@@ -0,0 +1,359 @@
+"""
+Request Profiler
+================
+Opt-in profiling of single web requests, safe to leave enabled in
+production.
+
+Set FRENCH_LEARNING_PROFILE_DIR to turn it on. Then:
+
+    FRENCH_LEARNING_PROFILE=header (default)
+        profile requests sent with an "X-Profile: 1" header (or
+        "X-Profile: <token>" when FRENCH_LEARNING_PROFILE_TOKEN is set)
+    FRENCH_LEARNING_PROFILE=always
+        profile every request, subject to the rate limit
+
+and FRENCH_LEARNING_PROFILER picks the backend:
+
+    cprofile (default)
+        cProfile: exact call counts, but every function call pays for
+        the instrumentation, which inflates call-heavy code
+    sample
+        a helper thread records the request thread's stack every
+        FRENCH_LEARNING_PROFILE_INTERVAL_MS (default 1) milliseconds;
+        overhead does not depend on the number of calls, and stacks are
+        whole rather than rebuilt, but short functions may be missed
+
+Each process profiles at most one request at a time and at most
+FRENCH_LEARNING_PROFILES_PER_MINUTE (default 2) per minute; requests
+over the limit run unprofiled. A profiled request writes two files,
+named by route, time and process:
+
+    progress_page-20250105-101203-4121-0001.prof        pstats dump
+    progress_page-20250105-101203-4121-0001.collapsed   collapsed stacks
+
+The sampling backend writes only the .collapsed file.
+
+The collapsed stacks ("a;b;c <microseconds>" per line) feed
+flamegraph.pl or speedscope. cProfile records caller/callee pairs rather
+than whole stacks, so the stacks are rebuilt by splitting each function's
+time between its callers in proportion to the calls they made.
+
+Usage:
+    python3 profiler.py aggregate [dir] [--route progress_page] [--top 30]
+                                  [--collapsed merged.collapsed]
+"""
+
+import argparse
+import cProfile
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROFILE_DIR = os.environ.get('FRENCH_LEARNING_PROFILE_DIR')
+PROFILE_MODE = os.environ.get('FRENCH_LEARNING_PROFILE', 'header').lower()
+PROFILE_TOKEN = os.environ.get('FRENCH_LEARNING_PROFILE_TOKEN')
+PROFILES_PER_MINUTE = float(os.environ.get('FRENCH_LEARNING_PROFILES_PER_MINUTE', '2'))
+PROFILER = os.environ.get('FRENCH_LEARNING_PROFILER', 'cprofile').lower()
+SAMPLE_INTERVAL_MS = float(os.environ.get('FRENCH_LEARNING_PROFILE_INTERVAL_MS', '1'))
+
+PROFILE_HEADER = 'X-Profile'
+
+# Deeper call paths are cut off when rebuilding stacks
+MAX_STACK_DEPTH = 100
+
+# Only one profile per process at a time
+_active = threading.Lock()
+_limiter_lock = threading.Lock()
+_allowance = {'tokens': 1.0, 'updated': time.monotonic()}
+_sequence = itertools.count(1)
+
+
+def enabled() -> bool:
+    """Whether request profiling is configured."""
+    return bool(PROFILE_DIR)
+
+
+def wants_profile(headers) -> bool:
+    """
+    Whether a request asks to be profiled.
+
+    Args:
+        headers: Request headers (any mapping with get())
+
+    Returns:
+        bool: True if it should be profiled (before rate limiting)
+    """
+    if not PROFILE_DIR:
+        return False
+    if PROFILE_MODE == 'always':
+        return True
+    value = headers.get(PROFILE_HEADER)
+    if not value:
+        return False
+    return value == PROFILE_TOKEN if PROFILE_TOKEN else value.lower() in ('1', 'true', 'yes')
+
+
+def _take_token() -> bool:
+    """Token bucket: PROFILES_PER_MINUTE, with a burst of one."""
+    with _limiter_lock:
+        now = time.monotonic()
+        tokens = min(1.0, _allowance['tokens'] + (now - _allowance['updated']) * PROFILES_PER_MINUTE / 60)
+        _allowance['updated'] = now
+        if tokens < 1.0:
+            _allowance['tokens'] = tokens
+            return False
+        _allowance['tokens'] = tokens - 1.0
+        return True
+
+
+class SamplingProfile:
+    """
+    Samples one thread's stack at a fixed interval from a helper thread.
+
+    Each sample is weighted by the time since the previous one, so
+    stacks still add up to wall time when the sampler runs late.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            # Once stopping, the thread is only waiting in disable()
+            if frame is None or self._stop.is_set():
+                break
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(_frame_name((code.co_filename, code.co_firstlineno, code.co_name)))
+                frame = frame.f_back
+            stack = ';'.join(reversed(frames[-MAX_STACK_DEPTH:]))
+            self.stacks[stack] = self.stacks.get(stack, 0) + int((now - last) * 1e6)
+            last = now
+
+
+def start():
+    """
+    Start profiling the current request, if the rate limit allows.
+
+    Returns:
+        cProfile.Profile or SamplingProfile (per FRENCH_LEARNING_PROFILER):
+            running profile to pass to stop(), or None
+    """
+    if not _active.acquire(blocking=False):
+        return None
+    if not _take_token():
+        _active.release()
+        return None
+
+    if PROFILER == 'sample':
+        profile = SamplingProfile(threading.get_ident(), SAMPLE_INTERVAL_MS / 1000)
+        profile.enable()
+        return profile
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler (e.g. a debugger) is already active
+        _active.release()
+        return None
+    return profile
+
+
+def stop(profile, route: str) -> Path:
+    """
+    Stop a profile started by start() and write its dump files.
+
+    Args:
+        profile: Profile returned by start()
+        route: Route (endpoint) name used in the file names
+
+    Returns:
+        Path: The .prof file written (the .collapsed file is beside it),
+            or the .collapsed file for a sampled profile
+    """
+    try:
+        profile.disable()
+    finally:
+        _active.release()
+
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_route = re.sub(r'[^\w.-]', '_', route)
+    stem = f"{safe_route}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence):04d}"
+
+    if isinstance(profile, SamplingProfile):
+        collapsed_path = directory / f"{stem}.collapsed"
+        write_collapsed(profile.stacks, collapsed_path)
+        return collapsed_path
+
+    prof_path = directory / f"{stem}.prof"
+    profile.dump_stats(str(prof_path))
+    stacks = collapsed_stacks(pstats.Stats(profile).stats)
+    write_collapsed(stacks, directory / f"{stem}.collapsed")
+    return prof_path
+
+
+def _frame_name(func: tuple) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in, e.g. <method 'execute' of 'sqlite3.Cursor' objects>
+    return f"{Path(filename).stem}:{name}:{line}".replace(';', ',')
+
+
+def collapsed_stacks(stats: dict) -> dict:
+    """
+    Rebuild approximate call stacks from pstats data.
+
+    Args:
+        stats: pstats.Stats(...).stats mapping
+
+    Returns:
+        dict: 'root;...;leaf' -> self time in microseconds
+    """
+    callees = {}
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, path, on_path, share):
+        tt, ct = stats[func][2], stats[func][3]
+        label = f"{path};{_frame_name(func)}" if path else _frame_name(func)
+        self_us = int(tt * share * 1e6)
+        if self_us:
+            stacks[label] = stacks.get(label, 0) + self_us
+        if len(on_path) >= MAX_STACK_DEPTH:
+            return
+        on_path.add(func)
+        for callee, edge_ct in callees.get(func, ()):
+            callee_ct = stats[callee][3]
+            # Skip recursion and paths too small to show up
+            if callee in on_path or callee_ct <= 0 or edge_ct * share < 1e-6:
+                continue
+            walk(callee, label, on_path, share * edge_ct / callee_ct)
+        on_path.discard(func)
+
+    for func, entry in stats.items():
+        if not entry[4]:
+            walk(func, '', set(), 1.0)
+    return stacks
+
+
+def write_collapsed(stacks: dict, path):
+    """Write collapsed stacks, one 'stack count' line each."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def read_collapsed(path) -> dict:
+    """Read a collapsed stacks file."""
+    stacks = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] = stacks.get(stack, 0) + int(count)
+    return stacks
+
+
+def find_dumps(directory, route: str = None) -> list:
+    """
+    List dumps in a directory (from any worker), oldest first.
+
+    Args:
+        directory: Profile directory
+        route: Only dumps for this route
+
+    Returns:
+        list: Paths of .prof files, and of .collapsed files without one
+            (from the sampling backend)
+    """
+    directory = Path(directory)
+    dumps = list(directory.glob('*.prof'))
+    dumps += [p for p in directory.glob('*.collapsed') if not p.with_suffix('.prof').exists()]
+    dumps.sort(key=lambda p: p.stat().st_mtime)
+    if route:
+        dumps = [p for p in dumps if p.name.rsplit('-', 4)[0] == route]
+    return dumps
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Aggregate request profiles.')
+    parser.add_argument('command', choices=['aggregate'])
+    parser.add_argument('directory', nargs='?', default=PROFILE_DIR,
+                        help='Profile directory (default $FRENCH_LEARNING_PROFILE_DIR)')
+    parser.add_argument('--route', help='Only aggregate profiles of this route')
+    parser.add_argument('--top', type=int, default=30, help='Functions to list')
+    parser.add_argument('--sort', default='cumulative', help='pstats sort key (cumulative, tottime, calls...)')
+    parser.add_argument('--collapsed', help='Also write merged collapsed stacks to this file')
+    args = parser.parse_args()
+
+    if not args.directory:
+        parser.error('no directory given and FRENCH_LEARNING_PROFILE_DIR is not set')
+
+    dumps = find_dumps(args.directory, args.route)
+    if not dumps:
+        print("No profiles found")
+        return
+
+    routes = {}
+    for path in dumps:
+        route = path.name.rsplit('-', 4)[0]
+        routes[route] = routes.get(route, 0) + 1
+    print(f"{len(dumps)} profiles: " + ', '.join(f"{r} ({n})" for r, n in sorted(routes.items())))
+
+    prof_dumps = [p for p in dumps if p.suffix == '.prof']
+    if prof_dumps:
+        stats = pstats.Stats(*[str(p) for p in prof_dumps])
+        stats.sort_stats(args.sort).print_stats(args.top)
+
+    merged = {}
+    for path in dumps:
+        collapsed = path.with_suffix('.collapsed')
+        if collapsed.exists():
+            for stack, count in read_collapsed(collapsed).items():
+                merged[stack] = merged.get(stack, 0) + count
+
+    if len(prof_dumps) < len(dumps):
+        # Sampled profiles have no pstats; list the functions seen running
+        self_us = {}
+        for stack, count in merged.items():
+            leaf = stack.rpartition(';')[2]
+            self_us[leaf] = self_us.get(leaf, 0) + count
+        total = sum(self_us.values()) or 1
+        print(f"\n  {'self ms':>10} {'%':>6}  function (all profiles)")
+        for leaf, count in sorted(self_us.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {count / 1000:>10.1f} {count / total * 100:>6.1f}  {leaf}")
+
+    if args.collapsed:
+        write_collapsed(merged, args.collapsed)
+        print(f"Wrote {len(merged)} stacks to {args.collapsed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,12 @@ Track learning progress, streaks, and statistics per user.
 """
 
 from datetime import datetime, timedelta
-from database import get_connection
+from database import get_read_connection
+from tracing import traced
 from users import get_or_create_user
 
 
+@traced
 def get_learning_streak(user: str):
     """
     Calculate the current learning streak for a user.
@@ -22,7 +24,7 @@ def get_learning_streak(user: str):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -34,6 +36,43 @@ def get_learning_streak(user: str):
     dates = [row['review_date'] for row in cursor.fetchall()]
     conn.close()
 
+    return _streaks(dates)
+
+
+@traced
+def get_learning_streaks(users: list) -> dict:
+    """
+    Calculate learning streaks for several users in one query.
+
+    Args:
+        users: User dicts (with 'id'), e.g. from get_all_users
+
+    Returns:
+        dict: {user_id: streak dict, as from get_learning_streak}
+    """
+    user_ids = [user['id'] for user in users]
+    if not user_ids:
+        return {}
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f"""
+        SELECT DISTINCT user_id, date(reviewed_at) as review_date
+        FROM review_history
+        WHERE user_id IN ({', '.join('?' for _ in user_ids)})
+        ORDER BY user_id, review_date DESC
+    """, user_ids)
+    dates = {user_id: [] for user_id in user_ids}
+    for row in cursor.fetchall():
+        dates[row['user_id']].append(row['review_date'])
+    conn.close()
+
+    return {user_id: _streaks(user_dates) for user_id, user_dates in dates.items()}
+
+
+def _streaks(dates: list) -> dict:
+    """Current and longest streak from distinct review dates, newest first."""
     if not dates:
         return {'current_streak': 0, 'longest_streak': 0}
 
@@ -71,6 +110,7 @@ def get_learning_streak(user: str):
     }
 
 
+@traced
 def get_topic_progress(user: str):
     """
     Get progress breakdown by topic for a user.
@@ -84,7 +124,7 @@ def get_topic_progress(user: str):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     today = datetime.now().date().isoformat()
@@ -115,6 +155,7 @@ def get_topic_progress(user: str):
     return topics
 
 
+@traced
 def get_daily_reviews(user: str, days: int = 30):
     """
     Get review counts for the past N days for a user.
@@ -129,7 +170,7 @@ def get_daily_reviews(user: str, days: int = 30):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -154,6 +195,7 @@ def get_daily_reviews(user: str, days: int = 30):
     return result
 
 
+@traced
 def get_difficult_cards(user: str, limit: int = 10):
     """
     Get cards that the user struggles with.
@@ -168,7 +210,7 @@ def get_difficult_cards(user: str, limit: int = 10):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -187,6 +229,7 @@ def get_difficult_cards(user: str, limit: int = 10):
     return cards
 
 
+@traced
 def get_mastered_cards(user: str, limit: int = 10):
     """
     Get well-learned cards for a user.
@@ -201,7 +244,7 @@ def get_mastered_cards(user: str, limit: int = 10):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -218,6 +261,7 @@ def get_mastered_cards(user: str, limit: int = 10):
     return cards
 
 
+@traced
 def get_review_quality_distribution(user: str):
     """
     Get distribution of review quality ratings for a user.
@@ -231,7 +275,7 @@ def get_review_quality_distribution(user: str):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -250,6 +294,7 @@ def get_review_quality_distribution(user: str):
     return distribution
 
 
+@traced
 def get_summary(user: str):
     """
     Get a complete learning summary for a user.
@@ -286,6 +331,7 @@ def get_summary(user: str):
     }
 
 
+@traced
 def compare_users():
     """
     Compare progress across all users.
@@ -294,18 +340,19 @@ def compare_users():
         list: Summary for each user
     """
     from users import get_all_users
-    from spaced_repetition import get_review_stats
+    from spaced_repetition import get_review_stats_for_users
 
     users = get_all_users()
+    all_stats = get_review_stats_for_users(users)
+    streaks = get_learning_streaks(users)
     comparison = []
 
     for user in users:
-        name = user['name']
-        stats = get_review_stats(name)
-        streak = get_learning_streak(name)
+        stats = all_stats[user['id']]
+        streak = streaks[user['id']]
 
         comparison.append({
-            'name': name,
+            'name': user['name'],
             'cards_learned': stats['cards_learned'],
             'cards_due': stats['cards_due'],
             'reviews_today': stats['reviews_today'],
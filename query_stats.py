@@ -0,0 +1,166 @@
+"""
+Query Statistics
+================
+Counts SQL statements, SQL time and connection opens per unit of work
+(typically one web request), using the hooks in database.py.
+
+    install()
+    with track() as stats:
+        get_summary('Jack')
+    print(stats.statements, stats.seconds, stats.connections)
+
+Stats are kept in a context variable, so concurrent requests on
+different threads each see only their own statements. Tracking can be
+nested; statements count towards every enclosing track(). Statements run
+outside track() are not counted.
+
+query_budget() turns the counts into an assertion, for catching N+1
+loops (one query per user, per category...) in checks and tests:
+
+    with query_budget(statements=12):
+        client.get('/user/Jack')
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from database import add_connect_hook, add_statement_hook
+
+# A statement run this many times in one unit of work is reported as N+1
+REPEAT_THRESHOLD = 10
+
+_current = ContextVar('query_stats', default=None)
+_installed = False
+
+
+class QueryStats:
+    """Statement count, SQL time and connection opens for one unit of work."""
+
+    __slots__ = ('statements', 'seconds', 'connections', 'counts', 'parent')
+
+    def __init__(self, parent=None):
+        self.statements = 0
+        self.seconds = 0.0
+        self.connections = 0
+        self.counts = {}
+        self.parent = parent
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> list:
+        """
+        Statements executed at least threshold times (likely N+1 loops).
+
+        Returns:
+            list: (sql, count) pairs, most repeated first
+        """
+        return sorted(((sql, n) for sql, n in self.counts.items() if n >= threshold),
+                      key=lambda item: -item[1])
+
+    def to_dict(self) -> dict:
+        return {
+            'statements': self.statements,
+            'sql_ms': round(self.seconds * 1000, 3),
+            'connections': self.connections,
+            'repeated': [{'sql': sql, 'count': n} for sql, n in self.repeated()],
+        }
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget when a block runs more queries than allowed."""
+
+
+def _on_statement(sql, params, seconds):
+    stats = _current.get()
+    if stats is None:
+        return
+    key = ' '.join(sql.split())
+    while stats is not None:
+        stats.statements += 1
+        stats.seconds += seconds
+        stats.counts[key] = stats.counts.get(key, 0) + 1
+        stats = stats.parent
+
+
+def _on_connect():
+    stats = _current.get()
+    while stats is not None:
+        stats.connections += 1
+        stats = stats.parent
+
+
+def install():
+    """Register the database hooks (idempotent). Until called, nothing is counted."""
+    global _installed
+    if not _installed:
+        add_statement_hook(_on_statement)
+        add_connect_hook(_on_connect)
+        _installed = True
+
+
+def begin() -> tuple:
+    """
+    Start counting for the current context.
+
+    Returns:
+        tuple: (stats, token); pass token to end()
+    """
+    stats = QueryStats(_current.get())
+    return stats, _current.set(stats)
+
+
+def end(token):
+    """Stop counting for the context started by begin()."""
+    _current.reset(token)
+
+
+def current() -> QueryStats:
+    """Stats being collected for the current context, or None."""
+    return _current.get()
+
+
+@contextmanager
+def track():
+    """Count the statements run inside the block."""
+    install()
+    stats, token = begin()
+    try:
+        yield stats
+    finally:
+        end(token)
+
+
+@contextmanager
+def query_budget(statements: int = None, connections: int = None):
+    """
+    Fail if the block runs more statements or opens more connections than allowed.
+
+    Args:
+        statements: Maximum statements (None for no limit)
+        connections: Maximum connection opens (None for no limit)
+
+    Raises:
+        QueryBudgetExceeded: If a limit is exceeded
+    """
+    with track() as stats:
+        yield stats
+
+    check_budget(stats, statements, connections)
+
+
+def check_budget(stats: QueryStats, statements: int = None, connections: int = None, label: str = 'block'):
+    """
+    Raise QueryBudgetExceeded if stats exceed the given limits.
+
+    Args:
+        stats: Collected stats
+        statements: Maximum statements (None for no limit)
+        connections: Maximum connection opens (None for no limit)
+        label: Name used in the error message
+    """
+    problems = []
+    if statements is not None and stats.statements > statements:
+        problems.append(f"{stats.statements} statements (budget {statements})")
+    if connections is not None and stats.connections > connections:
+        problems.append(f"{stats.connections} connections (budget {connections})")
+
+    if problems:
+        detail = ''.join(f"\n    {n}x {sql}" for sql, n in stats.repeated())
+        raise QueryBudgetExceeded(f"{label} ran {' and '.join(problems)}{detail}")
@@ -6,14 +6,33 @@ Integrates with the spaced repetition system for tracking progress.
 """
 
 import random
-from database import get_connection
-from spaced_repetition import review_card, get_due_cards, get_unlocked_priority
+from array import array
+from datetime import datetime
+from database import get_read_connection
+from memory import deep_sizeof, register_cache
+from catalog import get_catalog, CACHE_REQUESTS
+from spaced_repetition import review_card, get_unlocked_priority
+from tracing import traced
 from users import get_or_create_user
 
 # Categories that support picture quizzes (have image data)
 QUIZ_CATEGORIES = ['animals', 'food_kids', 'colours', 'body']
 
+# Number of options shown per question (1 correct + distractors)
+QUIZ_OPTION_COUNT = 4
 
+# How many due cards to consider when picking a question target
+DUE_CANDIDATE_LIMIT = 50
+
+# Maximum number of questions returned by a single batch request
+MAX_QUESTION_BATCH = 10
+
+# Per-category quiz indexes, keyed by category and rebuilt on catalog version change
+_quiz_indexes = {}
+register_cache('quiz_index', lambda: deep_sizeof(_quiz_indexes))
+
+
+@traced
 def get_quiz_categories() -> list:
     """
     Get list of categories that support picture quizzes.
@@ -24,6 +43,7 @@ def get_quiz_categories() -> list:
     return QUIZ_CATEGORIES.copy()
 
 
+@traced
 def get_cards_with_images(category: str) -> list:
     """
     Get all cards from a category that have images.
@@ -34,28 +54,148 @@ def get_cards_with_images(category: str) -> list:
     Returns:
         list: Cards with non-null image field
     """
-    conn = get_connection()
+    cards = get_catalog().select(category)
+    return [card.to_dict() for card in cards if card['image'] is not None]
+
+
+def _build_quiz_index(catalog, category: str) -> dict:
+    """Load the picture cards of a category into parallel arrays."""
+    index = {
+        'version': catalog.version,
+        'ids': array('q'),
+        'images': [],
+        'french': [],
+        'english': [],
+        'pronunciation': [],
+        'positions': {}
+    }
+
+    # Category cards are already ordered by priority, id
+    for card in catalog.select(category):
+        if card['image'] is None:
+            continue
+        index['positions'][card['id']] = len(index['ids'])
+        index['ids'].append(card['id'])
+        index['images'].append(card['image'])
+        index['french'].append(card['french'])
+        index['english'].append(card['english'])
+        index['pronunciation'].append(card['pronunciation'])
+
+    return index
+
+
+@traced
+def get_quiz_index(category: str, conn=None) -> dict:
+    """
+    Get the in-memory quiz index for a category.
+
+    The index holds the category's picture cards as parallel arrays
+    (ids, images, french, english, pronunciation) plus an id -> position
+    map. It is built from the catalog snapshot once per process and
+    rebuilt only when the catalog version changes.
+
+    Args:
+        category: Quiz category
+        conn: Optional open connection to reuse
+
+    Returns:
+        dict: The quiz index for the category
+    """
+    catalog = get_catalog(conn)
+    index = _quiz_indexes.get(category)
+
+    if index is None or index['version'] != catalog.version:
+        CACHE_REQUESTS.inc(cache='quiz_index', result='miss')
+        index = _build_quiz_index(catalog, category)
+        _quiz_indexes[category] = index
+    else:
+        CACHE_REQUESTS.inc(cache='quiz_index', result='hit')
+
+    return index
+
+
+def sample_distractors(index: dict, target_pos: int, count: int = QUIZ_OPTION_COUNT - 1) -> list:
+    """
+    Pick distinct distractor positions from a quiz index, excluding the target.
+
+    Samples from the n-1 positions that are not the target and shifts
+    picks at or past the target up by one, so selection costs O(count)
+    regardless of category size.
+
+    Args:
+        index: Quiz index from get_quiz_index
+        target_pos: Position of the target card in the index
+        count: Number of distractors
+
+    Returns:
+        list: Distractor positions (empty if the index is too small)
+    """
+    size = len(index['ids'])
+    if size - 1 < count:
+        return []
+
+    picks = random.sample(range(size - 1), count)
+    return [p + 1 if p >= target_pos else p for p in picks]
+
+
+def _get_due_positions(conn, user_id: int, max_priority: int, category: str, index: dict) -> list:
+    """Get index positions of the user's due picture cards in a category."""
     cursor = conn.cursor()
+    today = datetime.now().date().isoformat()
 
     cursor.execute("""
-        SELECT * FROM cards
-        WHERE category = ? AND image IS NOT NULL
-        ORDER BY priority, id
-    """, (category,))
+        SELECT c.id FROM cards c
+        LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
+        WHERE (p.next_review IS NULL OR p.next_review <= ?)
+        AND c.priority <= ? AND c.category = ? AND c.image IS NOT NULL
+        ORDER BY c.priority ASC, p.next_review IS NULL ASC, p.next_review ASC
+        LIMIT ?
+    """, (user_id, today, max_priority, category, DUE_CANDIDATE_LIMIT))
 
-    cards = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    positions = index['positions']
+    return [positions[row['id']] for row in cursor.fetchall() if row['id'] in positions]
 
-    return cards
 
+def _build_question(index: dict, target_pos: int) -> dict:
+    """Build a question dict for the card at target_pos."""
+    distractors = sample_distractors(index, target_pos)
 
+    if len(distractors) < QUIZ_OPTION_COUNT - 1:
+        return None  # Not enough distractors
+
+    ids = index['ids']
+    images = index['images']
+
+    # Create options list with correct answer and distractors
+    options = [{'id': ids[pos], 'image': images[pos]} for pos in [target_pos] + distractors]
+
+    # Shuffle options
+    random.shuffle(options)
+
+    # Find correct index after shuffle
+    correct_index = next(i for i, opt in enumerate(options) if opt['id'] == ids[target_pos])
+
+    return {
+        'card': {
+            'id': ids[target_pos],
+            'french': index['french'][target_pos],
+            'english': index['english'][target_pos],
+            'pronunciation': index['pronunciation'][target_pos]
+        },
+        'options': options,
+        'correct_index': correct_index
+    }
+
+
+@traced
 def get_quiz_question(user: str, category: str) -> dict:
     """
     Generate a quiz question for a user in a specific category.
 
     Selects a due card from the category (or random if none due),
     finds 3 distractors from the same category, and returns the
-    question data.
+    question data. Cards and distractors come from the in-memory
+    quiz index; only the user's due subset is read from the database.
 
     Args:
         user: User name
@@ -72,53 +212,89 @@ def get_quiz_question(user: str, category: str) -> dict:
     if category not in QUIZ_CATEGORIES:
         return None
 
-    # Get all cards with images in this category
-    all_cards = get_cards_with_images(category)
+    user_data = get_or_create_user(user)
+    max_priority = get_unlocked_priority(user, category)
+
+    conn = get_read_connection()
+    index = get_quiz_index(category, conn)
 
-    if len(all_cards) < 4:
+    if len(index['ids']) < QUIZ_OPTION_COUNT:
+        conn.close()
         return None  # Need at least 4 cards for a quiz
 
     # Try to get a due card first
-    due_cards = get_due_cards(user, category=category, limit=50)
-    due_cards_with_images = [c for c in due_cards if c.get('image')]
+    due_positions = _get_due_positions(conn, user_data['id'], max_priority, category, index)
+    conn.close()
 
-    if due_cards_with_images:
+    if due_positions:
         # Pick a random due card with image
-        target_card = random.choice(due_cards_with_images)
+        target_pos = random.choice(due_positions)
     else:
         # No due cards, pick a random card from category
-        target_card = random.choice(all_cards)
+        target_pos = random.randrange(len(index['ids']))
 
-    # Get 3 distractors (different cards with images)
-    distractor_pool = [c for c in all_cards if c['id'] != target_card['id']]
-    distractors = random.sample(distractor_pool, min(3, len(distractor_pool)))
+    return _build_question(index, target_pos)
 
-    if len(distractors) < 3:
-        return None  # Not enough distractors
 
-    # Create options list with correct answer and distractors
-    options = [{'id': target_card['id'], 'image': target_card['image']}]
-    for d in distractors:
-        options.append({'id': d['id'], 'image': d['image']})
+@traced
+def get_quiz_questions(user: str, category: str, count: int = 5, exclude_ids: list = None) -> list:
+    """
+    Generate a batch of quiz questions for a user in a specific category.
 
-    # Shuffle options
-    random.shuffle(options)
+    Targets are distinct within the batch. Due cards are preferred, then
+    random cards from the category. Cards in exclude_ids (e.g. ones the
+    client already answered or has buffered) are skipped while enough
+    other cards remain.
 
-    # Find correct index after shuffle
-    correct_index = next(i for i, opt in enumerate(options) if opt['id'] == target_card['id'])
+    Args:
+        user: User name
+        category: Category to quiz from (must be in QUIZ_CATEGORIES)
+        count: Number of questions (capped at MAX_QUESTION_BATCH)
+        exclude_ids: Optional card IDs to avoid as targets
 
-    return {
-        'card': {
-            'id': target_card['id'],
-            'french': target_card['french'],
-            'english': target_card['english'],
-            'pronunciation': target_card.get('pronunciation')
-        },
-        'options': options,
-        'correct_index': correct_index
-    }
+    Returns:
+        list: Question dicts in the same format as get_quiz_question.
+        Returns None if not enough cards with images in category
+    """
+    if category not in QUIZ_CATEGORIES:
+        return None
+
+    count = max(0, min(count, MAX_QUESTION_BATCH))
+
+    user_data = get_or_create_user(user)
+    max_priority = get_unlocked_priority(user, category)
+
+    conn = get_read_connection()
+    index = get_quiz_index(category, conn)
+    size = len(index['ids'])
+
+    if size < QUIZ_OPTION_COUNT:
+        conn.close()
+        return None  # Need at least 4 cards for a quiz
+
+    due_positions = _get_due_positions(conn, user_data['id'], max_priority, category, index)
+    conn.close()
 
+    positions = index['positions']
+    excluded = {positions[card_id] for card_id in (exclude_ids or []) if card_id in positions}
 
+    # Due cards first (in random order), then random fill from the rest
+    targets = [pos for pos in dict.fromkeys(due_positions) if pos not in excluded]
+    random.shuffle(targets)
+    targets = targets[:count]
+
+    if len(targets) < count:
+        chosen = set(targets)
+        remaining = [pos for pos in range(size) if pos not in chosen and pos not in excluded]
+        if len(targets) + len(remaining) < count:
+            # Small category: allow excluded cards again rather than come up short
+            remaining += [pos for pos in excluded if pos not in chosen]
+        targets += random.sample(remaining, min(count - len(targets), len(remaining)))
+
+    return [_build_question(index, pos) for pos in targets]
+
+
+@traced
 def answer_quiz(user: str, card_id: int, correct: bool) -> dict:
     """
     Process a quiz answer and update spaced repetition progress.
@@ -140,6 +316,54 @@ def answer_quiz(user: str, card_id: int, correct: bool) -> dict:
     return review_card(user, card_id, quality)
 
 
+def _format_quiz_stats(total_cards: int, reviewed: int, mastered: int) -> dict:
+    """Build a quiz stats dict from raw counts."""
+    return {
+        'total_cards': total_cards,
+        'reviewed': reviewed,
+        'mastered': mastered,
+        'progress_percent': round(reviewed / total_cards * 100, 1) if total_cards > 0 else 0
+    }
+
+
+def _fetch_quiz_counts(user_id: int, categories: list) -> dict:
+    """
+    Count picture cards, reviewed and mastered cards per category in one query.
+
+    Args:
+        user_id: User ID
+        categories: Categories to include (any number)
+
+    Returns:
+        dict: {category: (total, reviewed, mastered)}
+    """
+    if not categories:
+        return {}
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    placeholders = ', '.join('?' for _ in categories)
+    cursor.execute(f"""
+        SELECT
+            c.category,
+            COUNT(c.id) as total,
+            COUNT(CASE WHEN p.repetitions > 0 THEN 1 END) as reviewed,
+            COUNT(CASE WHEN p.repetitions >= 3 THEN 1 END) as mastered
+        FROM cards c
+        LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
+        WHERE c.category IN ({placeholders}) AND c.image IS NOT NULL
+        GROUP BY c.category
+    """, [user_id] + list(categories))
+
+    counts = {row['category']: (row['total'], row['reviewed'], row['mastered'])
+              for row in cursor.fetchall()}
+    conn.close()
+
+    return counts
+
+
+@traced
 def get_quiz_stats(user: str, category: str = None) -> dict:
     """
     Get quiz statistics for a user.
@@ -151,68 +375,47 @@ def get_quiz_stats(user: str, category: str = None) -> dict:
     Returns:
         dict: Quiz statistics
     """
-    user_data = get_or_create_user(user)
-    user_id = user_data['id']
-
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Base query for cards with images
     if category:
-        cursor.execute("""
-            SELECT COUNT(*) as total FROM cards
-            WHERE category = ? AND image IS NOT NULL
-        """, (category,))
-    else:
-        cursor.execute("""
-            SELECT COUNT(*) as total FROM cards
-            WHERE category IN (?, ?, ?, ?) AND image IS NOT NULL
-        """, tuple(QUIZ_CATEGORIES))
+        user_data = get_or_create_user(user)
+        total, reviewed, mastered = _fetch_quiz_counts(user_data['id'], [category]).get(category, (0, 0, 0))
+        return _format_quiz_stats(total, reviewed, mastered)
 
-    total_cards = cursor.fetchone()['total']
+    return get_quiz_stats_by_category(user)['overall']
 
-    # Cards reviewed (have progress)
-    if category:
-        cursor.execute("""
-            SELECT COUNT(*) as reviewed FROM cards c
-            JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-            WHERE c.category = ? AND c.image IS NOT NULL AND p.repetitions > 0
-        """, (user_id, category))
-    else:
-        cursor.execute("""
-            SELECT COUNT(*) as reviewed FROM cards c
-            JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-            WHERE c.category IN (?, ?, ?, ?) AND c.image IS NOT NULL AND p.repetitions > 0
-        """, (user_id,) + tuple(QUIZ_CATEGORIES))
 
-    reviewed = cursor.fetchone()['reviewed']
+@traced
+def get_quiz_stats_by_category(user: str) -> dict:
+    """
+    Get quiz statistics for a user, broken down by quiz category.
 
-    # Cards mastered (repetitions >= 3)
-    if category:
-        cursor.execute("""
-            SELECT COUNT(*) as mastered FROM cards c
-            JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-            WHERE c.category = ? AND c.image IS NOT NULL AND p.repetitions >= 3
-        """, (user_id, category))
-    else:
-        cursor.execute("""
-            SELECT COUNT(*) as mastered FROM cards c
-            JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-            WHERE c.category IN (?, ?, ?, ?) AND c.image IS NOT NULL AND p.repetitions >= 3
-        """, (user_id,) + tuple(QUIZ_CATEGORIES))
+    All categories are counted in a single query.
 
-    mastered = cursor.fetchone()['mastered']
+    Args:
+        user: User name
 
-    conn.close()
+    Returns:
+        dict: {
+            'categories': {category: stats, ...} for every quiz category,
+            'overall': stats across all quiz categories
+        }
+    """
+    user_data = get_or_create_user(user)
+    counts = _fetch_quiz_counts(user_data['id'], QUIZ_CATEGORIES)
+
+    categories = {}
+    totals = [0, 0, 0]
+    for category in QUIZ_CATEGORIES:
+        row = counts.get(category, (0, 0, 0))
+        categories[category] = _format_quiz_stats(*row)
+        totals = [a + b for a, b in zip(totals, row)]
 
     return {
-        'total_cards': total_cards,
-        'reviewed': reviewed,
-        'mastered': mastered,
-        'progress_percent': round(reviewed / total_cards * 100, 1) if total_cards > 0 else 0
+        'categories': categories,
+        'overall': _format_quiz_stats(*totals)
     }
 
 
+@traced
 def get_category_info(category: str) -> dict:
     """
     Get information about a quiz category.
@@ -233,10 +436,10 @@ def get_category_info(category: str) -> dict:
     if category not in QUIZ_CATEGORIES:
         return None
 
-    cards = get_cards_with_images(category)
+    index = get_quiz_index(category)
 
     info = category_display.get(category, {'name': category.title(), 'emoji': '\U0001F4DA'})
     info['category'] = category
-    info['card_count'] = len(cards)
+    info['card_count'] = len(index['ids'])
 
     return info
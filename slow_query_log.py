@@ -0,0 +1,328 @@
+"""
+Slow Query Log
+==============
+Writes SQL statements slower than a threshold to a rotating JSON-lines
+file, one record per statement:
+
+    {"ts": "2025-01-05T10:12:03", "ms": 182.4, "slow": true,
+     "sql": "SELECT ... WHERE user_id = ? AND card_id IN (...)",
+     "params": ["int", "int"], "rows": 240,
+     "caller": "spaced_repetition.get_unlocked_priority", "pid": 4121}
+
+The time covers executing the statement and fetching its rows (see
+database.add_result_hook). SQL is normalized (whitespace collapsed,
+literals and IN lists replaced by placeholders) so the same query
+always groups together; parameters are logged by type only, never by
+value.
+
+A fraction of the faster statements can be logged too (slow: false),
+as a baseline for what normal looks like.
+
+Multi-process servers
+---------------------
+RotatingFileHandler is only safe with a single writer: two gunicorn
+workers rotating the same file would rename it from under each other
+and lose records. So, as metrics.py does with metrics-<pid>.json, each
+process logs to its own file next to the configured path, named with
+its pid (slow_queries.jsonl -> slow_queries-4121.jsonl), and rotates
+only that file. A worker forked after install() reopens under its own
+pid on its first record. read_log and the summarize command read every
+process's files; empty the directory when the server restarts.
+
+Configuration (read by web/app.py, which installs the log when a path
+is set):
+    FRENCH_LEARNING_SLOW_QUERY_LOG      log file path (per-process files are named from it)
+    FRENCH_LEARNING_SLOW_QUERY_MS       threshold in ms (default 50)
+    FRENCH_LEARNING_SLOW_QUERY_SAMPLE   fraction of other statements to log (default 0)
+
+Usage:
+    python3 slow_query_log.py summarize [log file] [--top 20] [--slow-only]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+SLOW_QUERY_LOG = os.environ.get('FRENCH_LEARNING_SLOW_QUERY_LOG')
+SLOW_QUERY_MS = float(os.environ.get('FRENCH_LEARNING_SLOW_QUERY_MS', '50'))
+SAMPLE_RATE = float(os.environ.get('FRENCH_LEARNING_SLOW_QUERY_SAMPLE', '0'))
+
+# Rotation, per process: keep BACKUP_COUNT old files of up to MAX_BYTES each
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+_logger = logging.getLogger('french_learning.slow_queries')
+_logger.propagate = False
+_settings = {'threshold_ms': SLOW_QUERY_MS, 'sample_rate': SAMPLE_RATE}
+
+# Configured log path (None until installed), the handler and the
+# process whose file it writes (a forked worker opens its own)
+_log_path = None
+_handler = None
+_handler_pid = None
+_handler_lock = threading.Lock()
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduce a statement to its shape, so variants group together.
+
+    Args:
+        sql: SQL as executed
+
+    Returns:
+        str: SQL with whitespace collapsed, literals replaced by ? and
+            IN lists of placeholders collapsed to IN (...)
+    """
+    sql = ' '.join(sql.split())
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def param_shape(params):
+    """
+    Describe bound parameters by type, without their values.
+
+    Args:
+        params: Sequence or mapping of parameters; for executemany, the
+            list of parameter rows
+
+    Returns:
+        Type names in the same structure, e.g. ['int', 'str'],
+        {'name': 'str'} or {'rows': 120, 'each': ['int', 'int']}
+    """
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    if isinstance(params, list) and params and isinstance(params[0], (tuple, list, dict)):
+        return {'rows': len(params), 'each': param_shape(params[0])}
+    types = [type(value).__name__ for value in params or ()]
+    if len(types) > 10 and len(set(types)) == 1:
+        return [f"{types[0]} x{len(types)}"]
+    return types
+
+
+def process_log_path(path, pid: int = None) -> Path:
+    """
+    File one process logs to.
+
+    Args:
+        path: Configured log path
+        pid: Process ID (default: this process)
+
+    Returns:
+        Path: e.g. slow_queries-4121.jsonl for slow_queries.jsonl
+    """
+    path = Path(path)
+    return path.with_name(f"{path.stem}-{pid or os.getpid()}{path.suffix}")
+
+
+def _close_handler():
+    global _handler, _handler_pid
+    if _handler is not None:
+        _logger.removeHandler(_handler)
+        _handler.close()
+        _handler = _handler_pid = None
+
+
+def _open_handler():
+    """Point the logger at this process's file, closing any inherited one."""
+    global _handler, _handler_pid
+    _close_handler()
+    _handler = RotatingFileHandler(process_log_path(_log_path), maxBytes=MAX_BYTES,
+                                   backupCount=BACKUP_COUNT, encoding='utf-8')
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    _logger.addHandler(_handler)
+    _handler_pid = os.getpid()
+
+
+def _on_result(sql, params, seconds, rows, caller):
+    ms = seconds * 1000
+    slow = ms >= _settings['threshold_ms']
+    if not slow and (not _settings['sample_rate'] or random.random() >= _settings['sample_rate']):
+        return
+
+    if _handler_pid != os.getpid():
+        with _handler_lock:
+            if _log_path is None:
+                return
+            if _handler_pid != os.getpid():
+                _open_handler()
+
+    _logger.info(json.dumps({
+        'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ms': round(ms, 3),
+        'slow': slow,
+        'sql': normalize_sql(sql),
+        'params': param_shape(params),
+        'rows': rows,
+        'caller': caller,
+        'pid': os.getpid(),
+    }))
+
+
+def install(path=None, threshold_ms: float = None, sample_rate: float = None):
+    """
+    Start logging slow statements (idempotent).
+
+    Args:
+        path: Log file; each process writes process_log_path(path)
+            (default FRENCH_LEARNING_SLOW_QUERY_LOG)
+        threshold_ms: Statements at least this slow are logged
+        sample_rate: Fraction of faster statements to log as well
+    """
+    global _log_path
+    path = path or SLOW_QUERY_LOG
+    if not path:
+        raise ValueError("No slow query log path (set FRENCH_LEARNING_SLOW_QUERY_LOG)")
+    if threshold_ms is not None:
+        _settings['threshold_ms'] = threshold_ms
+    if sample_rate is not None:
+        _settings['sample_rate'] = sample_rate
+
+    # Imported here so summarizing a log doesn't open the database
+    from database import add_result_hook
+
+    if _log_path is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with _handler_lock:
+            _log_path = path
+            _open_handler()
+        _logger.setLevel(logging.INFO)
+        add_result_hook(_on_result)
+
+
+def uninstall():
+    """Stop logging and close the log file."""
+    global _log_path
+    from database import remove_result_hook
+    remove_result_hook(_on_result)
+    with _handler_lock:
+        _close_handler()
+        _log_path = None
+
+
+def log_files(path) -> list:
+    """
+    Every file of a log: each process's current file and its rotations.
+
+    Args:
+        path: Configured log path
+
+    Returns:
+        list: Paths, each process's rotations oldest first
+    """
+    path = Path(path)
+    pattern = re.compile(rf'{re.escape(path.stem)}-\d+{re.escape(path.suffix)}')
+    # The plain path is read too, for logs written before files were per process
+    current = [path] + sorted(file for file in path.parent.glob(f"{path.stem}-*")
+                              if pattern.fullmatch(file.name))
+    files = []
+    for file in current:
+        files += [file.with_name(f"{file.name}.{n}") for n in range(BACKUP_COUNT, 0, -1)] + [file]
+    return [file for file in files if file.exists()]
+
+
+def read_log(path) -> list:
+    """
+    Read log records from every process's files, including rotated ones.
+
+    Args:
+        path: Configured log path
+
+    Returns:
+        list: Records as dicts, oldest first (malformed lines are skipped)
+    """
+    records = []
+    for file in log_files(path):
+        with open(file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    records.sort(key=lambda record: record.get('ts', ''))
+    return records
+
+
+def summarize(records: list, slow_only: bool = False) -> list:
+    """
+    Group records by normalized SQL, worst total time first.
+
+    Args:
+        records: Records from read_log
+        slow_only: Ignore sampled (below threshold) records
+
+    Returns:
+        list: Dicts with sql, count, slow, total_ms, mean_ms, max_ms,
+            mean_rows and callers
+    """
+    groups = {}
+    for record in records:
+        if slow_only and not record.get('slow'):
+            continue
+        group = groups.setdefault(record['sql'], {
+            'sql': record['sql'], 'count': 0, 'slow': 0, 'total_ms': 0.0,
+            'max_ms': 0.0, 'rows': 0, 'callers': {}
+        })
+        group['count'] += 1
+        group['slow'] += bool(record.get('slow'))
+        group['total_ms'] += record['ms']
+        group['max_ms'] = max(group['max_ms'], record['ms'])
+        group['rows'] += record.get('rows') or 0
+        caller = record.get('caller') or '?'
+        group['callers'][caller] = group['callers'].get(caller, 0) + 1
+
+    summary = []
+    for group in groups.values():
+        count = group['count']
+        summary.append({
+            'sql': group['sql'],
+            'count': count,
+            'slow': group['slow'],
+            'total_ms': round(group['total_ms'], 3),
+            'mean_ms': round(group['total_ms'] / count, 3),
+            'max_ms': round(group['max_ms'], 3),
+            'mean_rows': round(group.pop('rows') / count, 1),
+            'callers': sorted(group['callers'], key=lambda c: -group['callers'][c]),
+        })
+    summary.sort(key=lambda g: -g['total_ms'])
+    return summary
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Summarize the slow query log.')
+    parser.add_argument('command', choices=['summarize'])
+    parser.add_argument('path', nargs='?', default=SLOW_QUERY_LOG, help='Log file (default $FRENCH_LEARNING_SLOW_QUERY_LOG)')
+    parser.add_argument('--top', type=int, default=20, help='Number of statements to show')
+    parser.add_argument('--slow-only', action='store_true', help='Ignore sampled statements')
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error('no log file given and FRENCH_LEARNING_SLOW_QUERY_LOG is not set')
+
+    records = read_log(args.path)
+    summary = summarize(records, slow_only=args.slow_only)
+    print(f"{len(records)} records, {len(summary)} distinct statements\n")
+    print(f"  {'total ms':>10} {'count':>6} {'slow':>5} {'mean ms':>9} {'max ms':>9} {'rows':>7}")
+    for group in summary[:args.top]:
+        print(f"  {group['total_ms']:>10.1f} {group['count']:>6} {group['slow']:>5} "
+              f"{group['mean_ms']:>9.2f} {group['max_ms']:>9.2f} {group['mean_rows']:>7}")
+        print(f"      {group['sql'][:160]}")
+        print(f"      called from {', '.join(group['callers'][:3])}")
+
+
+if __name__ == '__main__':
+    main()
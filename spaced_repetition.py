@@ -13,9 +13,18 @@ Quality ratings:
     5 - Perfect response, instant recall
 """
 
+import time
 from datetime import datetime, timedelta
-from database import get_connection
+from database import get_read_connection
+from metrics import counter, histogram
+from tracing import traced
 from users import get_or_create_user
+from writer import run_write
+
+REVIEWS = counter('reviews_total', 'Card reviews recorded, by SM-2 quality rating', ['quality'])
+REVIEW_SECONDS = histogram('review_duration_seconds', 'Time to record one review, end to end')
+WRITE_LOCK_SECONDS = histogram('db_write_lock_seconds',
+                               'Time to run and commit a review\'s write, mostly waiting for the write lock')
 
 
 def calculate_sm2(quality: int, repetitions: int, ease_factor: float, interval: int):
@@ -52,24 +61,13 @@ def calculate_sm2(quality: int, repetitions: int, ease_factor: float, interval:
     return new_repetitions, new_ease_factor, new_interval
 
 
-def review_card(user: str, card_id: int, quality: int):
+def _apply_review(cursor, user_id: int, card_id: int, quality: int) -> tuple:
     """
-    Process a card review and update spaced repetition data.
-
-    Args:
-        user: User name
-        card_id: The card being reviewed
-        quality: Rating 0-5
+    Read a card's progress, apply SM-2 and write the result (write function, see writer.py).
 
     Returns:
-        dict: Updated progress data including next review date
+        tuple: (repetitions, ease_factor, interval, next_review)
     """
-    user_data = get_or_create_user(user)
-    user_id = user_data['id']
-
-    conn = get_connection()
-    cursor = conn.cursor()
-
     # Get current progress
     cursor.execute("""
         SELECT ease_factor, interval, repetitions
@@ -111,8 +109,38 @@ def review_card(user: str, card_id: int, quality: int):
         VALUES (?, ?, ?)
     """, (user_id, card_id, quality))
 
-    conn.commit()
-    conn.close()
+    return new_reps, new_ease, new_interval, next_review
+
+
+@traced
+def review_card(user: str, card_id: int, quality: int):
+    """
+    Process a card review and update spaced repetition data.
+
+    Reading the progress, computing SM-2 and writing the result happen
+    in one transaction that takes the write lock up front (BEGIN
+    IMMEDIATE, retried with backoff while busy; see writer.py), so
+    concurrent reviews of the same card are applied one after another.
+
+    Args:
+        user: User name
+        card_id: The card being reviewed
+        quality: Rating 0-5
+
+    Returns:
+        dict: Updated progress data including next review date
+    """
+    start = time.perf_counter()
+    user_data = get_or_create_user(user)
+    user_id = user_data['id']
+
+    write_start = time.perf_counter()
+    new_reps, new_ease, new_interval, next_review = run_write(_apply_review, user_id, card_id, quality)
+
+    now = time.perf_counter()
+    WRITE_LOCK_SECONDS.observe(now - write_start)
+    REVIEW_SECONDS.observe(now - start)
+    REVIEWS.inc(quality=quality)
 
     return {
         'user': user,
@@ -125,6 +153,7 @@ def review_card(user: str, card_id: int, quality: int):
     }
 
 
+@traced
 def get_unlocked_priority(user: str, category: str = None):
     """
     Determine which priority levels are unlocked for a user.
@@ -143,45 +172,53 @@ def get_unlocked_priority(user: str, category: str = None):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
+    # Per-priority stats in one grouped query rather than one query per level
     if category:
-        cursor.execute("SELECT DISTINCT priority FROM cards WHERE category = ? ORDER BY priority", (category,))
+        cursor.execute("""
+            SELECT
+                c.priority,
+                COUNT(c.id) as total,
+                COUNT(CASE WHEN p.repetitions >= 1 THEN 1 END) as reviewed,
+                AVG(CASE WHEN p.ease_factor IS NOT NULL THEN p.ease_factor END) as avg_ease
+            FROM cards c
+            LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
+            WHERE c.category = ?
+            GROUP BY c.priority
+            ORDER BY c.priority
+        """, (user_id, category))
     else:
-        cursor.execute("SELECT DISTINCT priority FROM cards ORDER BY priority")
+        cursor.execute("""
+            SELECT
+                c.priority,
+                COUNT(c.id) as total,
+                COUNT(CASE WHEN p.repetitions >= 1 THEN 1 END) as reviewed,
+                AVG(CASE WHEN p.ease_factor IS NOT NULL THEN p.ease_factor END) as avg_ease
+            FROM cards c
+            LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
+            GROUP BY c.priority
+            ORDER BY c.priority
+        """, (user_id,))
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    return _unlocked_priority(rows)
 
-    priorities = [row['priority'] for row in cursor.fetchall()]
 
-    if not priorities:
-        conn.close()
+def _unlocked_priority(rows: list) -> int:
+    """
+    Highest unlocked priority from per-priority rows (priority, total,
+    reviewed, avg_ease) in priority order; see get_unlocked_priority.
+    """
+    if not rows:
         return 1
 
-    unlocked = priorities[0]
-
-    for priority in priorities:
-        if category:
-            cursor.execute("""
-                SELECT
-                    COUNT(c.id) as total,
-                    COUNT(CASE WHEN p.repetitions >= 1 THEN 1 END) as reviewed,
-                    AVG(CASE WHEN p.ease_factor IS NOT NULL THEN p.ease_factor END) as avg_ease
-                FROM cards c
-                LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-                WHERE c.priority = ? AND c.category = ?
-            """, (user_id, priority, category))
-        else:
-            cursor.execute("""
-                SELECT
-                    COUNT(c.id) as total,
-                    COUNT(CASE WHEN p.repetitions >= 1 THEN 1 END) as reviewed,
-                    AVG(CASE WHEN p.ease_factor IS NOT NULL THEN p.ease_factor END) as avg_ease
-                FROM cards c
-                LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-                WHERE c.priority = ?
-            """, (user_id, priority))
-
-        row = cursor.fetchone()
+    unlocked = rows[0]['priority']
+
+    for row in rows:
         total = row['total']
         reviewed = row['reviewed'] or 0
         avg_ease = row['avg_ease'] or 2.5
@@ -189,14 +226,49 @@ def get_unlocked_priority(user: str, category: str = None):
         review_rate = reviewed / total if total > 0 else 0
 
         if review_rate >= 0.8 and avg_ease >= 2.3:
-            unlocked = priority + 1
+            unlocked = row['priority'] + 1
         else:
             break
 
-    conn.close()
     return unlocked
 
 
+def _category_priority_rows(user_id: int) -> dict:
+    """
+    Per-priority progress of a user in every category, in one query.
+
+    Returns:
+        dict: {category: [row, ...]} with rows in priority order, each with
+        priority, total, reviewed, learned, avg_ease and due (cards due
+        today, locked or not)
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT
+            c.category,
+            c.priority,
+            COUNT(c.id) as total,
+            COUNT(CASE WHEN p.repetitions >= 1 THEN 1 END) as reviewed,
+            COUNT(CASE WHEN p.repetitions >= 3 THEN 1 END) as learned,
+            AVG(CASE WHEN p.ease_factor IS NOT NULL THEN p.ease_factor END) as avg_ease,
+            COUNT(CASE WHEN p.next_review IS NULL OR p.next_review <= ? THEN 1 END) as due
+        FROM cards c
+        LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
+        GROUP BY c.category, c.priority
+        ORDER BY c.category, c.priority
+    """, (datetime.now().date().isoformat(), user_id))
+
+    by_category = {}
+    for row in cursor.fetchall():
+        by_category.setdefault(row['category'], []).append(row)
+    conn.close()
+
+    return by_category
+
+
+@traced
 def get_due_cards(user: str, category: str = None, topic: str = None, limit: int = 20):
     """
     Get cards due for review for a specific user.
@@ -213,7 +285,7 @@ def get_due_cards(user: str, category: str = None, topic: str = None, limit: int
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     today = datetime.now().date().isoformat()
@@ -249,6 +321,7 @@ def get_due_cards(user: str, category: str = None, topic: str = None, limit: int
     return cards
 
 
+@traced
 def get_priority_status(user: str, category: str = None):
     """
     Get mastery status for each priority level for a user.
@@ -263,7 +336,11 @@ def get_priority_status(user: str, category: str = None):
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    # Before opening our own read: a second connection while this one holds
+    # a read lock can deadlock against a writer waiting to commit
+    unlocked = get_unlocked_priority(user, category)
+
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     if category:
@@ -294,10 +371,14 @@ def get_priority_status(user: str, category: str = None):
             ORDER BY c.priority
         """, (user_id,))
 
-    unlocked = get_unlocked_priority(user, category)
+    result = _format_priority_status(cursor.fetchall(), unlocked)
+    conn.close()
+    return result
 
+
+def _format_priority_status(rows: list, unlocked: int) -> list:
     result = []
-    for row in cursor.fetchall():
+    for row in rows:
         total = row['total']
         reviewed = row['reviewed'] or 0
         result.append({
@@ -309,11 +390,39 @@ def get_priority_status(user: str, category: str = None):
             'review_rate': round(reviewed / total * 100, 1) if total > 0 else 0,
             'unlocked': row['priority'] <= unlocked
         })
-
-    conn.close()
     return result
 
 
+@traced
+def get_category_overview(user: str, due_limit: int = 100) -> dict:
+    """
+    Get priority status and due count for every category at once.
+
+    Same results as calling get_priority_status(user, category) and
+    len(get_due_cards(user, category, limit=due_limit)) per category, in
+    a fixed number of queries however many categories there are.
+
+    Args:
+        user: User name
+        due_limit: Cap on each category's due count
+
+    Returns:
+        dict: {category: {'tiers': priority status list, 'due_count': int}}
+    """
+    user_data = get_or_create_user(user)
+
+    overview = {}
+    for category, rows in _category_priority_rows(user_data['id']).items():
+        unlocked = _unlocked_priority(rows)
+        due = sum(row['due'] for row in rows if row['priority'] is not None and row['priority'] <= unlocked)
+        overview[category] = {
+            'tiers': _format_priority_status(rows, unlocked),
+            'due_count': min(due, due_limit),
+        }
+    return overview
+
+
+@traced
 def get_review_stats(user: str):
     """
     Get overall review statistics for a user.
@@ -325,60 +434,97 @@ def get_review_stats(user: str):
         dict: Review statistics
     """
     user_data = get_or_create_user(user)
-    user_id = user_data['id']
+    return get_review_stats_for_users([user_data])[user_data['id']]
 
-    conn = get_connection()
+
+@traced
+def get_review_stats_for_users(users: list) -> dict:
+    """
+    Get overall review statistics for several users at once.
+
+    Runs a fixed number of queries however many users there are.
+
+    Args:
+        users: User dicts (with 'id'), e.g. from get_all_users
+
+    Returns:
+        dict: {user_id: review statistics, as from get_review_stats}
+    """
+    user_ids = [user['id'] for user in users]
+    if not user_ids:
+        return {}
+
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     today = datetime.now().date().isoformat()
+    placeholders = ', '.join('?' for _ in user_ids)
 
     cursor.execute("SELECT COUNT(*) as total FROM cards")
     total_cards = cursor.fetchone()['total']
 
-    cursor.execute("""
-        SELECT COUNT(*) as learned FROM progress
-        WHERE user_id = ? AND repetitions > 0
-    """, (user_id,))
-    learned = cursor.fetchone()['learned']
-
-    max_priority = get_unlocked_priority(user)
-    cursor.execute("""
-        SELECT COUNT(*) as due FROM cards c
-        LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = ?
-        WHERE (p.next_review IS NULL OR p.next_review <= ?)
-        AND c.priority <= ?
-    """, (user_id, today, max_priority))
-    due_today = cursor.fetchone()['due']
-
-    cursor.execute("""
-        SELECT COUNT(*) as reviews FROM review_history
-        WHERE user_id = ? AND date(reviewed_at) = date('now')
-    """, (user_id,))
-    reviews_today = cursor.fetchone()['reviews']
+    cursor.execute(f"""
+        SELECT user_id,
+            COUNT(CASE WHEN repetitions > 0 THEN 1 END) as learned,
+            AVG(ease_factor) as avg_ease
+        FROM progress
+        WHERE user_id IN ({placeholders})
+        GROUP BY user_id
+    """, user_ids)
+    progress = {row['user_id']: row for row in cursor.fetchall()}
+
+    # Per-priority progress across all categories, for unlocking and due counts
+    cursor.execute(f"""
+        SELECT
+            u.id as user_id,
+            c.priority,
+            COUNT(c.id) as total,
+            COUNT(CASE WHEN p.repetitions >= 1 THEN 1 END) as reviewed,
+            AVG(CASE WHEN p.ease_factor IS NOT NULL THEN p.ease_factor END) as avg_ease,
+            COUNT(CASE WHEN p.next_review IS NULL OR p.next_review <= ? THEN 1 END) as due
+        FROM users u
+        CROSS JOIN cards c
+        LEFT JOIN progress p ON c.id = p.card_id AND p.user_id = u.id
+        WHERE u.id IN ({placeholders})
+        GROUP BY u.id, c.priority
+        ORDER BY u.id, c.priority
+    """, [today] + user_ids)
+    tiers = {}
+    for row in cursor.fetchall():
+        tiers.setdefault(row['user_id'], []).append(row)
 
-    cursor.execute("""
-        SELECT AVG(ease_factor) as avg_ease FROM progress
-        WHERE user_id = ?
-    """, (user_id,))
-    avg_ease = cursor.fetchone()['avg_ease'] or 2.5
+    cursor.execute(f"""
+        SELECT user_id, COUNT(*) as reviews FROM review_history
+        WHERE user_id IN ({placeholders}) AND date(reviewed_at) = date('now')
+        GROUP BY user_id
+    """, user_ids)
+    reviews_today = {row['user_id']: row['reviews'] for row in cursor.fetchall()}
 
     conn.close()
 
-    return {
-        'total_cards': total_cards,
-        'cards_learned': learned,
-        'cards_due': due_today,
-        'reviews_today': reviews_today,
-        'average_ease': round(avg_ease, 2)
-    }
-
-
+    stats = {}
+    for user_id in user_ids:
+        rows = tiers.get(user_id, [])
+        unlocked = _unlocked_priority(rows)
+        row = progress.get(user_id)
+        stats[user_id] = {
+            'total_cards': total_cards,
+            'cards_learned': row['learned'] if row else 0,
+            'cards_due': sum(tier['due'] for tier in rows
+                             if tier['priority'] is not None and tier['priority'] <= unlocked),
+            'reviews_today': reviews_today.get(user_id, 0),
+            'average_ease': round((row['avg_ease'] if row else None) or 2.5, 2)
+        }
+    return stats
+
+
+@traced
 def get_card_progress(user: str, card_id: int):
     """Get progress data for a specific card and user."""
     user_data = get_or_create_user(user)
     user_id = user_data['id']
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
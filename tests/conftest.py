@@ -0,0 +1,43 @@
+"""
+Test configuration
+==================
+Points the app at a scratch database (and image directory) before any
+app module is imported, since database.py reads FRENCH_LEARNING_DB and
+creates the schema at import time. All tests in a run share it, so
+tests create their own users rather than assuming an empty database.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_scratch_dir = tempfile.mkdtemp(prefix='french_learning_tests_')
+os.environ['FRENCH_LEARNING_DB'] = str(Path(_scratch_dir) / 'test.db')
+os.environ['FRENCH_LEARNING_IMAGES_DIR'] = str(Path(_scratch_dir) / 'images')
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / 'web'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The Flask app, with the default deck and users loaded."""
+    from app import app as flask_app
+    from vocabulary import card_count, load_default_vocabulary
+    from users import setup_default_users
+
+    if card_count() == 0:
+        load_default_vocabulary()
+    setup_default_users()
+
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
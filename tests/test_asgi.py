@@ -0,0 +1,82 @@
+"""
+ASGI entry point tests
+======================
+Calls asgi.app directly with in-memory receive/send channels.
+"""
+
+import asyncio
+import json
+
+import asgi
+
+
+def run_app(scope: dict, messages: list) -> list:
+    """Run the app on one scope; returns the messages it sent."""
+    incoming = list(messages)
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent
+
+
+def http_scope(method: str, path: str, headers=()) -> dict:
+    return {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': list(headers)}
+
+
+def test_websocket_is_refused():
+    sent = run_app({'type': 'websocket', 'path': '/ws', 'headers': []}, [{'type': 'websocket.connect'}])
+
+    assert [message['type'] for message in sent] == ['websocket.close']
+
+
+def test_unknown_scope_type_is_ignored():
+    assert run_app({'type': 'something-else'}, []) == []
+
+
+def test_repeated_headers_are_joined():
+    environ = asgi.wsgi_environ(http_scope('GET', '/', [
+        (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+        (b'accept', b'text/html'), (b'accept', b'application/json'),
+    ]), b'')
+
+    assert environ['HTTP_COOKIE'] == 'a=1; b=2'
+    assert environ['HTTP_ACCEPT'] == 'text/html,application/json'
+
+
+def test_path_arguments_are_not_decoded_twice(monkeypatch):
+    calls = []
+
+    async def submit_review(request, name):
+        calls.append(name)
+        return 200, {}
+
+    monkeypatch.setitem(asgi.HANDLERS, 'submit_review', submit_review)
+    body = json.dumps({'card_id': 1, 'quality': 4}).encode()
+
+    # The server has already decoded /user/100%2541 to /user/100%41
+    sent = run_app(http_scope('POST', '/user/100%41/flashcard/review'),
+                   [{'type': 'http.request', 'body': body}])
+
+    assert sent[0]['status'] == 200
+    assert calls == ['100%41']
+
+
+def test_native_endpoint_with_decoded_name(app):
+    # A request for /user/Asgi%20User/... arrives with the path decoded
+    sent = run_app(http_scope('GET', '/user/Asgi User/quiz/question/animals'), [{'type': 'http.request'}])
+
+    assert sent[0]['status'] == 200
+    assert 'card' in json.loads(sent[1]['body'])
+
+
+def test_fallthrough_to_flask():
+    sent = run_app(http_scope('GET', '/api/users'), [{'type': 'http.request'}])
+
+    assert sent[0]['status'] == 200
+    assert isinstance(json.loads(sent[1]['body']), list)
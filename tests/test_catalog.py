@@ -0,0 +1,71 @@
+"""
+Catalog tests
+=============
+Snapshot filters and when get_catalog rechecks the catalog version.
+"""
+
+import sqlite3
+import time
+import uuid
+
+import catalog
+import database
+from catalog import get_catalog
+from query_stats import track
+from vocabulary import add_card, add_cards_bulk, get_card
+
+
+def new_category() -> str:
+    return f"catalog_{uuid.uuid4().hex[:8]}"
+
+
+def test_priority_zero_is_a_filter():
+    category = new_category()
+    add_cards_bulk([
+        {'french': 'zéro', 'english': 'zero', 'category': category, 'topic': 'catalog', 'priority': 0},
+        {'french': 'un', 'english': 'one', 'category': category, 'topic': 'catalog', 'priority': 1},
+    ])
+    snapshot = get_catalog()
+
+    assert [card['french'] for card in snapshot.select(category, priority=0)] == ['zéro']
+    assert all(card['priority'] == 0 for card in snapshot.select(priority=0))
+    assert [card['french'] for card in snapshot.select(category, topic='catalog', priority=0)] == ['zéro']
+    assert len(snapshot.select(category)) == 2
+
+
+def test_fresh_snapshot_runs_no_statements():
+    get_catalog()
+
+    with track() as stats:
+        get_catalog()
+
+    assert stats.statements == 0
+
+
+def test_own_writes_are_seen_at_once(monkeypatch):
+    monkeypatch.setattr(catalog, 'RECHECK_SECONDS', 3600)
+    get_catalog()
+
+    card_id = add_card(new_category(), 'catalog', 'nouveau', 'new')
+
+    assert get_card(card_id)['french'] == 'nouveau'
+
+
+def test_other_process_writes_are_seen_after_recheck_interval(monkeypatch):
+    monkeypatch.setattr(catalog, 'RECHECK_SECONDS', 0.2)
+    get_catalog()
+
+    # A write by another process: no bump_catalog_version call in this one
+    conn = sqlite3.connect(database.DB_PATH)
+    cursor = conn.execute("""
+        INSERT INTO cards (category, topic, french, english, priority)
+        VALUES (?, 'catalog', 'ailleurs', 'elsewhere', 1)
+    """, (new_category(),))
+    card_id = cursor.lastrowid
+    conn.execute("UPDATE catalog_meta SET version = version + 1 WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    assert get_catalog().get(card_id) is None
+    time.sleep(0.25)
+    assert get_catalog().get(card_id)['french'] == 'ailleurs'
@@ -0,0 +1,85 @@
+"""
+Concurrent write tests
+======================
+Several threads record reviews at once, with writes run inline (each in
+its own BEGIN IMMEDIATE transaction) and through the single writer
+thread. No "database is locked" error may escape and no review may be
+lost.
+"""
+
+import threading
+
+import pytest
+
+import writer
+from database import get_read_connection
+from spaced_repetition import review_card
+from users import get_or_create_user
+
+THREADS = 8
+REVIEWS_PER_THREAD = 15
+CARD_IDS = (1, 2, 3)
+# Passing, but keeps the ease factor at its floor so 40 repetitions of a
+# card do not push its interval past the largest date
+QUALITY = 3
+
+
+def locked_errors() -> float:
+    return sum(writer.DB_LOCKED.values.values())
+
+
+@pytest.mark.parametrize('single_writer', [False, True], ids=['inline', 'single_writer'])
+def test_concurrent_reviews(app, monkeypatch, single_writer):
+    monkeypatch.setattr(writer, 'SINGLE_WRITER', single_writer)
+    shared_user = f"Concurrent {'writer' if single_writer else 'inline'}"
+    own_users = [f"{shared_user} {i}" for i in range(THREADS)]
+    for name in [shared_user] + own_users:
+        get_or_create_user(name)
+    locked_before = locked_errors()
+
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def reviewer(index):
+        try:
+            barrier.wait()
+            for i in range(REVIEWS_PER_THREAD):
+                # Every thread reviews the same cards for the shared user, and
+                # one card for a user of its own
+                review_card(shared_user, CARD_IDS[i % len(CARD_IDS)], QUALITY)
+                review_card(own_users[index], CARD_IDS[0], QUALITY)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reviewer, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert locked_errors() == locked_before
+
+    shared_id = get_or_create_user(shared_user)['id']
+    own_ids = [get_or_create_user(name)['id'] for name in own_users]
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM review_history WHERE user_id = ?", (shared_id,))
+    shared_reviews = cursor.fetchone()[0]
+    cursor.execute(f"""
+        SELECT user_id, COUNT(*) FROM review_history
+        WHERE user_id IN ({', '.join('?' for _ in own_ids)})
+        GROUP BY user_id
+    """, own_ids)
+    own_reviews = dict(cursor.fetchall())
+    # Each passing review (quality >= 3) adds one repetition, so a lost
+    # update would leave repetitions short of the number of reviews
+    cursor.execute("SELECT card_id, repetitions FROM progress WHERE user_id = ?", (shared_id,))
+    repetitions = dict(cursor.fetchall())
+    conn.close()
+
+    assert shared_reviews == THREADS * REVIEWS_PER_THREAD
+    assert own_reviews == {user_id: REVIEWS_PER_THREAD for user_id in own_ids}
+    assert sum(repetitions.values()) == THREADS * REVIEWS_PER_THREAD
+    assert set(repetitions) == set(CARD_IDS)
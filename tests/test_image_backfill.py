@@ -0,0 +1,173 @@
+"""
+Image backfill tests
+====================
+Runs image_helper.backfill_images and fetch_url against the local stand-in
+server (image_stub_server.py, as used by `image_helper.py --backfill --stub`).
+"""
+
+import json
+import time
+import urllib.error
+import uuid
+
+import pytest
+
+import image_helper
+from image_helper import HostRateLimiter, backfill_images, fetch_url
+from image_store import lookup_source
+from image_stub_server import start_stub_server
+from vocabulary import add_cards_bulk, get_cards
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Start a stub server and point the placeholder source at it; returns a factory."""
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub_server(**options)
+        servers.append(server)
+        monkeypatch.setattr(image_helper, 'PLACEHOLDER_URL', f"{base_url}/placeholder.png?text={{text}}")
+        monkeypatch.setattr(image_helper, 'UNSPLASH_API_URL', base_url)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_cards(count: int, words: list = None) -> list:
+    """Add cards in a new category; new words by default, so their URLs are not stored yet."""
+    category = f"backfill_{uuid.uuid4().hex[:8]}"
+    words = words or [uuid.uuid4().hex[:12] for _ in range(count)]
+    add_cards_bulk([
+        {'french': f'mot {i}', 'english': word, 'category': category, 'topic': 'backfill'}
+        for i, word in enumerate(words)
+    ])
+    return get_cards(category=category)
+
+
+def test_backfill_sets_card_images(stub):
+    server, _ = stub()
+    cards = make_cards(3)
+
+    report = backfill_images(cards=cards, workers=2)
+
+    assert report['fetched'] == 3 and report['failed'] == 0 and report['updated'] == 3
+    assert server.stats['requests'] == 3
+    category = cards[0]['category']
+    assert all(card['image'].startswith('blob:') for card in get_cards(category=category))
+
+
+def test_rate_limit_spaces_requests_to_a_host(stub):
+    server, _ = stub()
+    cards = make_cards(6)
+
+    start = time.monotonic()
+    report = backfill_images(cards=cards, workers=6, rate=10)
+    elapsed = time.monotonic() - start
+
+    # Six requests to one host at 10/s need five 0.1s gaps, however many workers
+    assert report['fetched'] == 6
+    assert elapsed >= 0.45
+
+
+def test_rate_limit_is_per_host():
+    limiter = HostRateLimiter(rate=5)
+
+    start = time.monotonic()
+    for host in ('a.example', 'b.example', 'c.example', 'd.example'):
+        limiter.wait(f"http://{host}/image.png")
+    assert time.monotonic() - start < 0.1
+
+    limiter.wait('http://a.example/other.png')
+    assert time.monotonic() - start >= 0.15
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_fetch_retries_transient_errors(stub, status):
+    server, base_url = stub(fail_first=2, fail_status=status)
+
+    data = fetch_url(f"{base_url}/placeholder.png?text=retry", retries=3, backoff=0.01)
+
+    assert data.startswith(b'\x89PNG')
+    assert server.stats['requests'] == 3
+    assert server.stats['failures'] == 2
+
+
+def test_fetch_gives_up_after_retries(stub):
+    server, base_url = stub(fail_first=10, fail_status=503)
+
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        fetch_url(f"{base_url}/placeholder.png?text=down", retries=2, backoff=0.01)
+
+    assert excinfo.value.code == 503
+    assert server.stats['requests'] == 3
+
+
+def test_fetch_backs_off_between_attempts(stub):
+    server, base_url = stub(fail_first=2, fail_status=503)
+
+    start = time.monotonic()
+    fetch_url(f"{base_url}/placeholder.png?text=backoff", retries=2, backoff=0.1)
+
+    # Delays are backoff * 2**attempt with jitter of 0.5-1.5x: at least 0.05 + 0.1
+    assert time.monotonic() - start >= 0.15
+
+
+def test_fetch_does_not_retry_client_errors(stub):
+    server, base_url = stub(fail_first=10, fail_status=404)
+
+    with pytest.raises(urllib.error.HTTPError):
+        fetch_url(f"{base_url}/placeholder.png?text=missing", retries=3, backoff=0.01)
+
+    assert server.stats['requests'] == 1
+
+
+def test_backfill_resumes_from_progress_file(stub, tmp_path):
+    cards = make_cards(5)
+    progress_file = tmp_path / 'progress.json'
+
+    # An earlier run stopped after two cards
+    server, _ = stub()
+    first = backfill_images(cards=cards[:2], workers=2, progress_file=progress_file)
+    assert first['fetched'] == 2
+    done = json.loads(progress_file.read_text())
+    assert set(done) == {str(card['id']) for card in cards[:2]}
+
+    server, _ = stub()
+    report = backfill_images(cards=cards, workers=2, progress_file=progress_file)
+
+    assert report['resumed'] == 2
+    assert report['fetched'] == 3
+    assert report['updated'] == 5
+    assert server.stats['requests'] == 3
+    assert len(json.loads(progress_file.read_text())) == 5
+
+
+def test_backfill_skips_urls_already_stored(stub):
+    server, _ = stub()
+    cards = make_cards(3)
+    backfill_images(cards=cards, workers=2)
+    assert server.stats['requests'] == 3
+
+    # The same words on new cards map to the same URLs, now in image_sources
+    for card in cards:
+        assert lookup_source(image_helper._placeholder_image_url(card['english'])) is not None
+    copies = make_cards(3, words=[card['english'] for card in cards])
+    report = backfill_images(cards=copies, workers=2)
+
+    assert report['fetched'] == 3
+    assert server.stats['requests'] == 3
+
+
+def test_backfill_unsplash_source(stub):
+    server, _ = stub()
+    cards = make_cards(2)
+
+    report = backfill_images(cards=cards, source='unsplash', access_key='stub', workers=2)
+
+    # One search and one photo download per card
+    assert report['fetched'] == 2 and report['failed'] == 0
+    assert server.stats['requests'] == 4
@@ -0,0 +1,55 @@
+"""
+Image store tests
+=================
+Garbage collection of unreferenced blobs (image_store.collect_garbage).
+"""
+
+import uuid
+
+import pytest
+
+import image_store
+from image_store import blob_path, collect_garbage, has_blob, image_ref, put_blob
+from vocabulary import add_card
+
+
+def new_blob() -> str:
+    return put_blob(f"image {uuid.uuid4()}".encode(), 'image/png')
+
+
+def test_collect_garbage_removes_unreferenced_blobs():
+    unreferenced = new_blob()
+    referenced = new_blob()
+    add_card('gc', 'gc', f'mot {referenced[:8]}', 'word', image=image_ref(referenced))
+
+    report = collect_garbage(grace_seconds=0)
+
+    assert report['blobs_removed'] >= 1
+    assert not has_blob(unreferenced)
+    assert not blob_path(unreferenced).exists()
+    assert has_blob(referenced)
+
+
+def test_collect_garbage_dry_run_keeps_blobs():
+    unreferenced = new_blob()
+
+    report = collect_garbage(dry_run=True, grace_seconds=0)
+
+    assert report['blobs_removed'] >= 1
+    assert has_blob(unreferenced)
+
+
+def test_failed_sweep_keeps_files(monkeypatch):
+    unreferenced = new_blob()
+    sweep = image_store._sweep_blobs
+
+    def failing_sweep(cursor, *args):
+        sweep(cursor, *args)
+        raise RuntimeError("sweep failed")
+
+    monkeypatch.setattr(image_store, '_sweep_blobs', failing_sweep)
+    with pytest.raises(RuntimeError):
+        collect_garbage(grace_seconds=0)
+
+    # The row deletes were rolled back, so the file must still be there
+    assert has_blob(unreferenced)
@@ -0,0 +1,57 @@
+"""
+Profiler tests
+==============
+Both request profiler backends (cProfile and sampling) write dumps that
+the aggregate command can read.
+"""
+
+import threading
+import time
+
+import pytest
+
+import profiler
+from profiler import SamplingProfile, find_dumps, read_collapsed
+
+
+@pytest.fixture
+def profile_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiler, 'PROFILE_MODE', 'always')
+    monkeypatch.setattr(profiler, 'PROFILES_PER_MINUTE', 6000)
+    monkeypatch.setitem(profiler._allowance, 'tokens', 1.0)
+    return tmp_path
+
+
+def busy_loop(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profile_records_whole_stacks():
+    profile = SamplingProfile(threading.get_ident(), 0.001)
+    profile.enable()
+    busy_loop(0.1)
+    profile.disable()
+
+    total = sum(profile.stacks.values())
+    in_loop = sum(count for stack, count in profile.stacks.items()
+                  if 'test_profiler:test_sampling_profile_records_whole_stacks' in stack
+                  and 'test_profiler:busy_loop' in stack)
+    assert 0.05e6 <= total <= 1e6
+    assert in_loop >= total * 0.8
+
+
+@pytest.mark.parametrize('backend, suffix', [('cprofile', '.prof'), ('sample', '.collapsed')])
+def test_request_profile_dump(app, client, profile_dir, monkeypatch, backend, suffix):
+    monkeypatch.setattr(profiler, 'PROFILER', backend)
+
+    response = client.get('/user/Profiled/progress')
+
+    assert response.status_code == 200
+    dump = profile_dir / response.headers['X-Profile-Dump']
+    assert dump.suffix == suffix and dump.exists()
+    assert dump.with_suffix('.collapsed').exists()
+    assert find_dumps(profile_dir, 'progress_page') == [dump]
+    read_collapsed(dump.with_suffix('.collapsed'))
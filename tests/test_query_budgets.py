@@ -0,0 +1,92 @@
+"""
+Query budget tests
+==================
+Every page and API route must stay within its ROUTE_QUERY_BUDGETS entry
+(web/app.py), and the home page and user dashboard must run the same
+number of statements however many users and categories there are.
+"""
+
+import pytest
+
+from query_stats import track
+
+USER = 'Budget'
+CATEGORY = 'animals'
+
+# (method, path, JSON body) per endpoint, as in benchmarks/query_budgets.py
+REQUESTS = {
+    'home': ('GET', '/', None),
+    'user_dashboard': ('GET', f'/user/{USER}', None),
+    'flashcard_mode': ('GET', f'/user/{USER}/flashcard/{CATEGORY}', None),
+    'submit_review': ('POST', f'/user/{USER}/flashcard/review', {'card_id': 1, 'quality': 4}),
+    'quiz_mode': ('GET', f'/user/{USER}/quiz/{CATEGORY}', None),
+    'get_quiz': ('GET', f'/user/{USER}/quiz/question/{CATEGORY}', None),
+    'get_quiz_batch': ('GET', f'/user/{USER}/quiz/questions/{CATEGORY}?count=5', None),
+    'submit_quiz_answer': ('POST', f'/user/{USER}/quiz/answer', {'card_id': 1, 'correct': True}),
+    'progress_page': ('GET', f'/user/{USER}/progress', None),
+    'api_users': ('GET', '/api/users', None),
+    'api_user_stats': ('GET', f'/api/user/{USER}/stats', None),
+}
+
+
+def warm(client):
+    """Request every route once, so module-level caches are loaded."""
+    for method, path, body in REQUESTS.values():
+        client.open(path, method=method, json=body)
+
+
+@pytest.fixture
+def budget_client(app, client):
+    warm(client)
+    app.config['ENFORCE_QUERY_BUDGETS'] = True
+    yield client
+    app.config['ENFORCE_QUERY_BUDGETS'] = False
+
+
+def count_statements(client, endpoint: str) -> int:
+    method, path, body = REQUESTS[endpoint]
+    with track() as stats:
+        response = client.open(path, method=method, json=body)
+    assert response.status_code == 200, f"{endpoint}: {response.status_code}"
+    return stats.statements
+
+
+def test_every_budgeted_route_is_exercised():
+    from app import ROUTE_QUERY_BUDGETS
+
+    assert set(ROUTE_QUERY_BUDGETS) == set(REQUESTS)
+
+
+@pytest.mark.parametrize('endpoint', list(REQUESTS))
+def test_route_within_budget(budget_client, endpoint):
+    from app import ROUTE_QUERY_BUDGETS
+
+    assert count_statements(budget_client, endpoint) <= ROUTE_QUERY_BUDGETS[endpoint]
+
+
+def test_statements_do_not_grow_with_data(app, budget_client):
+    from spaced_repetition import review_card
+    from users import create_user
+    from vocabulary import add_cards_bulk
+
+    before = {endpoint: count_statements(budget_client, endpoint)
+              for endpoint in ('home', 'user_dashboard')}
+
+    add_cards_bulk([
+        {'french': f'budget-mot-{i}', 'english': f'budget word {i}', 'category': 'budget_extra',
+         'topic': 'budget'}
+        for i in range(20)
+    ])
+    for i in range(5):
+        name = f'Budget Extra {i}'
+        create_user(name)
+        review_card(name, 1, 4)
+
+    # The new cards invalidate the catalog; reload it before measuring again
+    app.config['ENFORCE_QUERY_BUDGETS'] = False
+    warm(budget_client)
+    app.config['ENFORCE_QUERY_BUDGETS'] = True
+
+    after = {endpoint: count_statements(budget_client, endpoint)
+             for endpoint in ('home', 'user_dashboard')}
+    assert after == before
@@ -0,0 +1,60 @@
+"""
+Card search tests
+=================
+vocabulary.search_cards, with and without the full-text index.
+"""
+
+import uuid
+
+import pytest
+
+import vocabulary
+from vocabulary import add_cards_bulk, search_cards
+
+
+@pytest.fixture(scope='module')
+def category():
+    category = f"search_{uuid.uuid4().hex[:8]}"
+    add_cards_bulk([
+        {'french': "l'école", 'english': 'school', 'category': category, 'topic': 'search'},
+        {'french': 'Ça va ?', 'english': 'how is it going?', 'category': category, 'topic': 'search'},
+        {'french': 'cent pour cent', 'english': '100%', 'category': category, 'topic': 'search'},
+        {'french': 'le tiret', 'english': 'dash_underscore', 'category': category, 'topic': 'search'},
+    ])
+    return category
+
+
+@pytest.fixture(params=['fts', 'like'])
+def search_mode(request, monkeypatch):
+    if request.param == 'like':
+        monkeypatch.setattr(vocabulary, 'has_search_index', lambda conn=None: False)
+    return request.param
+
+
+def french(cards) -> list:
+    return sorted(card['french'] for card in cards)
+
+
+def test_word_search(category, search_mode):
+    assert french(search_cards('school', category=category)) == ["l'école"]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('?', ['Ça va ?']),
+    ("'", ["l'école"]),
+    ('%', ['cent pour cent']),
+])
+def test_punctuation_only_queries_match_literally(category, search_mode, query, expected):
+    assert french(search_cards(query, category=category)) == expected
+
+
+def test_like_wildcards_are_literal(category, monkeypatch):
+    monkeypatch.setattr(vocabulary, 'has_search_index', lambda conn=None: False)
+
+    assert french(search_cards('h_w', category=category)) == []
+    assert french(search_cards('_', category=category)) == ['le tiret']
+
+
+@pytest.mark.parametrize('query', ['', '   '])
+def test_blank_query_matches_nothing(category, query):
+    assert search_cards(query, category=category) == []
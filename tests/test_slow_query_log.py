@@ -0,0 +1,72 @@
+"""
+Slow query log tests
+====================
+Each process writes its own log file, and read_log merges them.
+"""
+
+import json
+import os
+
+import pytest
+
+import slow_query_log
+from database import get_read_connection
+from slow_query_log import install, process_log_path, read_log, uninstall
+
+
+def run_query(label: str):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT '{label}' FROM cards LIMIT 1")
+    cursor.fetchall()
+    conn.close()
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / 'slow_queries.jsonl'
+    install(path, threshold_ms=0)
+    yield path
+    uninstall()
+    slow_query_log._settings['threshold_ms'] = slow_query_log.SLOW_QUERY_MS
+
+
+def test_logs_to_a_file_per_process(log_path):
+    run_query('here')
+
+    assert not log_path.exists()
+    assert process_log_path(log_path).exists()
+    records = read_log(log_path)
+    assert records and all(record['pid'] == os.getpid() for record in records)
+
+
+def test_read_log_merges_processes_and_rotations(log_path):
+    run_query('here')
+    other = process_log_path(log_path, pid=999999)
+    record = {'ts': '2000-01-01T00:00:00', 'ms': 1.0, 'slow': True, 'sql': 'SELECT ?', 'params': [],
+              'rows': 1, 'caller': 'other', 'pid': 999999}
+    other.write_text(json.dumps(record) + '\n')
+    other.with_name(f"{other.name}.1").write_text(json.dumps(dict(record, ts='1999-01-01T00:00:00')) + '\n')
+
+    records = read_log(log_path)
+
+    assert [r['ts'] for r in records[:2]] == ['1999-01-01T00:00:00', '2000-01-01T00:00:00']
+    assert {r['pid'] for r in records} == {999999, os.getpid()}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_process_opens_its_own_file(log_path):
+    run_query('parent')
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_query('child')
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    child_records = [json.loads(line) for line in process_log_path(log_path, pid=pid).read_text().splitlines()]
+    assert child_records and all(record['pid'] == pid for record in child_records)
+    parent_records = process_log_path(log_path).read_text()
+    assert str(pid) not in {str(json.loads(line)['pid']) for line in parent_records.splitlines()}
@@ -0,0 +1,239 @@
+"""
+Tracing
+=======
+Nested timing spans from web route to module function to SQL statement,
+exported as OpenTelemetry (OTLP/JSON) traces.
+
+    @traced
+    def get_summary(user):
+        ...
+
+Set FRENCH_LEARNING_TRACE to a file path (or "-" for stdout) to turn
+tracing on. Each finished trace is written as one line holding an OTLP
+ExportTraceServiceRequest, the format read by the OpenTelemetry
+Collector's otlpjsonfile receiver:
+
+    {"resourceSpans": [{"resource": {...}, "scopeSpans": [{"spans": [...]}]}]}
+
+A request to /user/<name>/progress then shows up as:
+
+    GET /user/<name>/progress
+      progress.get_summary
+        progress.get_learning_streak
+          SELECT review_history
+        spaced_repetition.get_review_stats
+          ...
+
+When FRENCH_LEARNING_TRACE is not set, @traced returns the function
+unchanged and no SQL hook is installed, so tracing costs nothing. The
+setting is read at import time.
+
+web/app.py opens a server span per request, continuing the trace of an
+incoming W3C traceparent header when there is one.
+"""
+
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+TRACE_OUTPUT = os.environ.get('FRENCH_LEARNING_TRACE') or None
+
+SERVICE_NAME = 'french-learning'
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+SQL_OPERATION = re.compile(r'^\s*(\w+)')
+SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+(\w+)', re.IGNORECASE)
+
+_current = ContextVar('trace_span', default=None)
+_output_lock = threading.Lock()
+_output = None
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'kind',
+                 'start_ns', 'end_ns', 'attributes', 'status', 'trace')
+
+    def __init__(self, name: str, parent=None, kind: int = SPAN_KIND_INTERNAL, attributes: dict = None,
+                 trace_id: str = None, parent_id: str = None):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.trace = parent.trace
+        else:
+            self.trace_id = trace_id or os.urandom(16).hex()
+            self.parent_id = parent_id
+            self.trace = []  # finished spans of this trace, exported with the root
+        self.trace.append(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': self.status},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def enabled() -> bool:
+    """Whether tracing is on."""
+    return TRACE_OUTPUT is not None
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, attributes: dict = None, traceparent: str = None):
+    """
+    Start a span as a child of the current one and make it current.
+
+    Args:
+        name: Span name
+        kind: SPAN_KIND_* value
+        attributes: Initial attributes
+        traceparent: W3C traceparent header to continue, for root spans
+
+    Returns:
+        tuple: (span, token); pass both to end_span()
+    """
+    parent = _current.get()
+    trace_id = parent_id = None
+    if parent is None and traceparent:
+        match = TRACEPARENT.match(traceparent.strip().lower())
+        if match:
+            trace_id, parent_id = match.groups()
+    span = Span(name, parent, kind, attributes, trace_id, parent_id)
+    return span, _current.set(span)
+
+
+def end_span(span: Span, token, error: BaseException = None):
+    """
+    Finish a span started by start_span(); exports the trace when it is the root.
+
+    Args:
+        span: Span to finish
+        token: Token returned with it
+        error: Exception that ended the span, if any
+    """
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.status = STATUS_ERROR
+        span.attributes['exception.type'] = type(error).__name__
+    _current.reset(token)
+    if span.trace and span.trace[0] is span:
+        _export(span.trace)
+
+
+def current_span() -> Span:
+    """The span in progress in this context, or None."""
+    return _current.get()
+
+
+def traced(fn=None, *, name: str = None):
+    """
+    Decorator timing each call of a function as a span.
+
+    Returns the function unchanged when tracing is off.
+
+    Args:
+        fn: Function to wrap
+        name: Span name (default 'module.function')
+    """
+    if fn is None:
+        return functools.partial(traced, name=name)
+    if TRACE_OUTPUT is None:
+        return fn
+
+    span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        span, token = start_span(span_name)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            end_span(span, token, e)
+            raise
+        end_span(span, token)
+        return result
+
+    return wrapper
+
+
+def _on_statement(sql, params, seconds):
+    parent = _current.get()
+    if parent is None:
+        return  # only statements inside a traced call are recorded
+    statement = ' '.join(sql.split())
+    operation = SQL_OPERATION.match(statement)
+    operation = operation.group(1).upper() if operation else 'SQL'
+    table = SQL_TABLE.search(statement)
+
+    span = Span(f"{operation} {table.group(1)}" if table else operation, parent, SPAN_KIND_CLIENT,
+                {'db.system': 'sqlite', 'db.operation': operation, 'db.statement': statement})
+    span.end_ns = time.time_ns()
+    span.start_ns = span.end_ns - int(seconds * 1e9)
+
+
+def _export(spans: list):
+    global _output
+    request = {'resourceSpans': [{
+        'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME),
+                                    _otlp_attribute('process.pid', os.getpid())]},
+        'scopeSpans': [{
+            'scope': {'name': 'french_learning.tracing'},
+            'spans': [span.to_otlp() for span in spans if span.end_ns is not None],
+        }],
+    }]}
+    line = json.dumps(request, separators=(',', ':')) + '\n'
+
+    with _output_lock:
+        if TRACE_OUTPUT == '-':
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            return
+        if _output is None:
+            _output = open(TRACE_OUTPUT, 'a', encoding='utf-8')
+        _output.write(line)
+        _output.flush()
+
+
+if TRACE_OUTPUT is not None:
+    from database import add_statement_hook
+    add_statement_hook(_on_statement)
@@ -4,12 +4,36 @@ User Management Module
 Manage multiple users/accounts for the French learning app.
 """
 
-from database import get_connection, init_db
+import threading
+import time
+from database import get_read_connection, init_db
+from tracing import traced
+from writer import run_write
 
 # Default users to create
 DEFAULT_USERS = ["Jack", "Nicola", "Family"]
 
+# Rows deleted per write transaction when purging a deleted user
+PURGE_BATCH_SIZE = 1000
 
+# Seconds to release the write lock between purge batches
+PURGE_PAUSE = 0.05
+
+# Background purge job state (one job per process)
+_purge_lock = threading.Lock()
+_purge_thread = None
+_purge_requested = False
+_purge_status = {'running': False, 'users_purged': 0, 'rows_deleted': 0, 'current': None, 'error': None}
+
+
+def _insert_user(cursor, name: str) -> int:
+    """Insert a user if the name is free and return its id (write function, see writer.py)."""
+    cursor.execute("INSERT OR IGNORE INTO users (name) VALUES (?)", (name,))
+    cursor.execute("SELECT id FROM users WHERE name = ?", (name,))
+    return cursor.fetchone()['id']
+
+
+@traced
 def create_user(name: str) -> int:
     """
     Create a new user.
@@ -20,19 +44,10 @@ def create_user(name: str) -> int:
     Returns:
         int: User ID
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("INSERT OR IGNORE INTO users (name) VALUES (?)", (name,))
-    conn.commit()
-
-    cursor.execute("SELECT id FROM users WHERE name = ?", (name,))
-    user_id = cursor.fetchone()['id']
-    conn.close()
-
-    return user_id
+    return run_write(_insert_user, name)
 
 
+@traced
 def get_user(name: str) -> dict:
     """
     Get a user by name.
@@ -43,46 +58,65 @@ def get_user(name: str) -> dict:
     Returns:
         dict: User data or None
     """
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM users WHERE name = ?", (name,))
+    cursor.execute("SELECT * FROM users WHERE name = ? AND deleted_at IS NULL", (name,))
     row = cursor.fetchone()
     conn.close()
 
     return dict(row) if row else None
 
 
+@traced
 def get_user_by_id(user_id: int) -> dict:
     """Get a user by ID."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    cursor.execute("SELECT * FROM users WHERE id = ? AND deleted_at IS NULL", (user_id,))
     row = cursor.fetchone()
     conn.close()
 
     return dict(row) if row else None
 
 
+@traced
 def get_all_users() -> list:
     """Get all users."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM users ORDER BY name")
+    cursor.execute("SELECT * FROM users WHERE deleted_at IS NULL ORDER BY name")
     users = [dict(row) for row in cursor.fetchall()]
     conn.close()
 
     return users
 
 
-def delete_user(name: str) -> bool:
+def _mark_user_deleted(cursor, name: str, user_id: int) -> bool:
+    """Mark a user deleted and free their name (write function, see writer.py)."""
+    cursor.execute("""
+        UPDATE users SET deleted_at = CURRENT_TIMESTAMP, name = ?
+        WHERE id = ? AND deleted_at IS NULL
+    """, (f"{name}#deleted-{user_id}", user_id))
+    return cursor.rowcount > 0
+
+
+@traced
+def delete_user(name: str, purge: bool = True) -> bool:
     """
     Delete a user and all their progress.
 
+    The user is marked deleted and renamed in one small write, so they
+    disappear immediately and the name can be reused. Their progress and
+    review history are removed afterwards by the background purge job,
+    in small batches that don't hold the write lock for long.
+
     Args:
         name: User's name
+        purge: Start the background purge job (otherwise call
+            purge_deleted_users later)
 
     Returns:
         bool: True if deleted
@@ -91,20 +125,151 @@ def delete_user(name: str) -> bool:
     if not user:
         return False
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    deleted = run_write(_mark_user_deleted, name, user['id'])
+
+    if deleted and purge:
+        start_purge_job()
+
+    return deleted
+
+
+def _purge_batch(cursor, table: str, user_id: int, batch_size: int) -> int:
+    """Delete the next batch of a user's rows from table; returns how many (write function, see writer.py)."""
+    cursor.execute(f"""
+        SELECT MIN(id) as first, MAX(id) as last, COUNT(*) as count FROM (
+            SELECT id FROM {table} WHERE user_id = ? ORDER BY id LIMIT ?
+        )
+    """, (user_id, batch_size))
+    batch = cursor.fetchone()
+
+    if not batch['count']:
+        return 0
+
+    cursor.execute(f"DELETE FROM {table} WHERE user_id = ? AND id BETWEEN ? AND ?",
+                   (user_id, batch['first'], batch['last']))
+    return cursor.rowcount
+
+
+def _delete_purged_user(cursor, user_id: int):
+    """Delete a soft-deleted user's row (write function, see writer.py)."""
+    cursor.execute("DELETE FROM users WHERE id = ? AND deleted_at IS NOT NULL", (user_id,))
+
+
+def _purge_table(table: str, user_id: int, batch_size: int, pause: float, progress=None) -> int:
+    """Delete a user's rows from table in id-ranged batches, one write each."""
+    total = 0
+
+    while True:
+        deleted = run_write(_purge_batch, table, user_id, batch_size)
+        if not deleted:
+            return total
+        total += deleted
+
+        if progress:
+            progress({'user_id': user_id, 'table': table, 'deleted': total})
 
-    cursor.execute("DELETE FROM review_history WHERE user_id = ?", (user['id'],))
-    cursor.execute("DELETE FROM progress WHERE user_id = ?", (user['id'],))
-    cursor.execute("DELETE FROM users WHERE id = ?", (user['id'],))
+        # Let other writers (e.g. review POSTs) take the lock
+        time.sleep(pause)
 
-    deleted = cursor.rowcount > 0
-    conn.commit()
+
+@traced
+def purge_deleted_users(batch_size: int = PURGE_BATCH_SIZE, pause: float = PURGE_PAUSE,
+                        progress=None) -> dict:
+    """
+    Remove the progress, history and user rows of soft-deleted users.
+
+    Args:
+        batch_size: Rows deleted per write transaction
+        pause: Seconds to sleep between batches
+        progress: Optional callback, called after every batch with
+            {'user_id', 'table', 'deleted'}
+
+    Returns:
+        dict: {'users_purged': int, 'rows_deleted': int}
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE deleted_at IS NOT NULL ORDER BY id")
+    user_ids = [row['id'] for row in cursor.fetchall()]
     conn.close()
 
-    return deleted
+    summary = {'users_purged': 0, 'rows_deleted': 0}
+
+    for user_id in user_ids:
+        for table in ('review_history', 'progress'):
+            summary['rows_deleted'] += _purge_table(table, user_id, batch_size, pause, progress)
+
+        run_write(_delete_purged_user, user_id)
+        summary['users_purged'] += 1
+
+    return summary
+
+
+def _run_purge_job():
+    """Background thread body: purge until no new deletions are requested."""
+    global _purge_thread, _purge_requested
+
+    def report(event):
+        _purge_status['current'] = event
+
+    try:
+        while True:
+            with _purge_lock:
+                _purge_requested = False
+
+            summary = purge_deleted_users(progress=report)
+            _purge_status['users_purged'] += summary['users_purged']
+            _purge_status['rows_deleted'] += summary['rows_deleted']
+
+            with _purge_lock:
+                # Go round again if a user was deleted while we were purging
+                if not _purge_requested:
+                    _purge_thread = None
+                    return
+    except BaseException as e:
+        # Leave the error for get_purge_status; the next start_purge_job retries
+        _purge_status['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        with _purge_lock:
+            if _purge_thread is threading.current_thread():
+                _purge_thread = None
+            _purge_status['running'] = _purge_thread is not None
+            _purge_status['current'] = None
+
+
+def start_purge_job() -> bool:
+    """
+    Start the background purge thread if it isn't already running.
+
+    Returns:
+        bool: True if a new job was started
+    """
+    global _purge_thread, _purge_requested
+
+    with _purge_lock:
+        _purge_requested = True
+        if _purge_thread is not None:
+            return False
+        _purge_status['running'] = True
+        _purge_status['error'] = None
+        _purge_thread = threading.Thread(target=_run_purge_job, name='user-purge', daemon=True)
+        _purge_thread.start()
+        return True
+
+
+def get_purge_status() -> dict:
+    """
+    Get progress of the background purge job in this process.
+
+    Returns:
+        dict: running, users_purged, rows_deleted, the latest batch
+        event ('current') and the error that stopped the last job (or None)
+    """
+    return dict(_purge_status)
 
 
+@traced
 def get_or_create_user(name: str) -> dict:
     """
     Get a user by name, creating if doesn't exist.
@@ -128,11 +293,12 @@ def setup_default_users():
         create_user(name)
 
 
+@traced
 def user_count() -> int:
     """Get total number of users."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
+    cursor.execute("SELECT COUNT(*) FROM users WHERE deleted_at IS NULL")
     count = cursor.fetchone()[0]
     conn.close()
     return count
@@ -15,7 +15,12 @@ Priority levels (within each category):
     5 - Extra (nice to have)
 """
 
-from database import get_connection
+import re
+from database import get_read_connection, bump_catalog_version, has_search_index
+from catalog import get_catalog
+from memory import deep_sizeof, register_cache
+from tracing import traced
+from writer import run_write
 
 
 # =============================================================================
@@ -584,232 +589,324 @@ PODCAST_VOCABULARY = [
 # Combine all vocabulary
 DEFAULT_VOCABULARY = GENERAL_VOCABULARY + ANIMALS_VOCABULARY + COLOURS_VOCABULARY + BODY_PARTS_VOCABULARY + FOOD_VOCABULARY + SENTENCE_FRAMES_VOCABULARY + PODCAST_VOCABULARY
 
+# The literals stay resident in every worker after seeding the database
+register_cache('vocabulary_literals', lambda: deep_sizeof((
+    GENERAL_VOCABULARY, ANIMALS_VOCABULARY, COLOURS_VOCABULARY, BODY_PARTS_VOCABULARY,
+    FOOD_VOCABULARY, SENTENCE_FRAMES_VOCABULARY, PODCAST_VOCABULARY, DEFAULT_VOCABULARY)))
+
 
 # =============================================================================
 # FUNCTIONS
 # =============================================================================
 
-def add_card(category: str, topic: str, french: str, english: str,
-             pronunciation: str = None, priority: int = 3, image: str = None) -> int:
-    """Add a new vocabulary card."""
-    conn = get_connection()
-    cursor = conn.cursor()
+# Card fields that update_card / update_cards_bulk may change
+UPDATABLE_FIELDS = {'french', 'english', 'pronunciation', 'topic', 'priority', 'category', 'image'}
+
+# Number of ids per IN (...) lookup in the bulk functions
+ID_BATCH = 500
+
+
+def _existing_card_ids(cursor, card_ids: list) -> set:
+    """Return the subset of card_ids that exist."""
+    existing = set()
+    card_ids = list(card_ids)
+    for start in range(0, len(card_ids), ID_BATCH):
+        batch = card_ids[start:start + ID_BATCH]
+        cursor.execute(f"SELECT id FROM cards WHERE id IN ({', '.join('?' for _ in batch)})", batch)
+        existing.update(row['id'] for row in cursor.fetchall())
+    return existing
 
+
+def _insert_card(cursor, card: dict) -> int:
+    """Insert one card and return its id (write function, see writer.py)."""
     cursor.execute("""
         INSERT INTO cards (category, topic, french, english, pronunciation, priority, image)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (category, topic, french, english, pronunciation, priority, image))
+        VALUES (:category, :topic, :french, :english, :pronunciation, :priority, :image)
+    """, card)
 
     card_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-
+    bump_catalog_version(cursor)
     return card_id
 
 
-def add_cards_bulk(cards: list) -> int:
-    """Add multiple cards at once."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    for card in cards:
-        if 'category' not in card:
-            card['category'] = 'general'
-        if 'priority' not in card:
-            card['priority'] = 3
-        if 'image' not in card:
-            card['image'] = None
+def _insert_cards(cursor, cards: list) -> int:
+    """Insert several cards and return how many (write function, see writer.py)."""
+    defaults = {'category': 'general', 'priority': 3, 'image': None, 'pronunciation': None}
 
     cursor.executemany("""
         INSERT INTO cards (category, topic, french, english, pronunciation, priority, image)
         VALUES (:category, :topic, :french, :english, :pronunciation, :priority, :image)
-    """, cards)
+    """, ({**defaults, **card} for card in cards))
 
     count = cursor.rowcount
-    conn.commit()
-    conn.close()
-
+    bump_catalog_version(cursor)
     return count
 
 
-def get_card(card_id: int) -> dict:
-    """Get a single card by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@traced
+def add_card(category: str, topic: str, french: str, english: str,
+             pronunciation: str = None, priority: int = 3, image: str = None) -> int:
+    """Add a new vocabulary card."""
+    return run_write(_insert_card, {
+        'category': category, 'topic': topic, 'french': french, 'english': english,
+        'pronunciation': pronunciation, 'priority': priority, 'image': image
+    })
 
-    cursor.execute("SELECT * FROM cards WHERE id = ?", (card_id,))
-    row = cursor.fetchone()
-    conn.close()
 
-    return dict(row) if row else None
+@traced
+def add_cards_bulk(cards: list) -> int:
+    """Add multiple cards at once (the input dicts are not modified)."""
+    return run_write(_insert_cards, cards)
 
 
+@traced
+def get_card(card_id: int) -> dict:
+    """Get a single card by ID."""
+    card = get_catalog().get(card_id)
+    return card.to_dict() if card else None
+
+
+@traced
 def get_cards(category: str = None, topic: str = None, priority: int = None) -> list:
     """Get all cards, optionally filtered."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    return [card.to_dict() for card in get_catalog().select(category, topic, priority)]
 
-    query = "SELECT * FROM cards WHERE 1=1"
-    params = []
 
-    if category:
-        query += " AND category = ?"
-        params.append(category)
+@traced
+def get_categories() -> list:
+    """Get list of all categories with card counts."""
+    counts = get_catalog().count_by('category')
+    return [{'category': category, 'count': counts[category]} for category in sorted(counts)]
 
-    if topic:
-        query += " AND topic = ?"
-        params.append(topic)
 
-    if priority:
-        query += " AND priority = ?"
-        params.append(priority)
+@traced
+def get_topics(category: str = None) -> list:
+    """Get list of all topics with card counts."""
+    counts = get_catalog().count_by('topic', category)
+    return [{'topic': topic, 'count': counts[topic]} for topic in sorted(counts)]
 
-    query += " ORDER BY category, priority, id"
-    cursor.execute(query, params)
 
-    cards = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+@traced
+def get_priorities(category: str = None) -> list:
+    """Get card counts by priority level."""
+    counts = get_catalog().count_by('priority', category)
+    # NULL first, as ORDER BY priority would
+    order = sorted(counts, key=lambda priority: (priority is not None, priority or 0))
+    return [{'priority': priority, 'count': counts[priority]} for priority in order]
 
-    return cards
 
+def _update_card(cursor, card_id: int, updates: dict) -> bool:
+    """Update one card's fields (write function, see writer.py)."""
+    set_clause = ', '.join(f'{k} = ?' for k in updates.keys())
+    values = list(updates.values()) + [card_id]
 
-def get_categories() -> list:
-    """Get list of all categories with card counts."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    cursor.execute(f"UPDATE cards SET {set_clause} WHERE id = ?", values)
+    updated = cursor.rowcount > 0
+    if updated:
+        bump_catalog_version(cursor)
+    return updated
 
-    cursor.execute("""
-        SELECT category, COUNT(*) as count
-        FROM cards
-        GROUP BY category
-        ORDER BY category
-    """)
 
-    categories = [{'category': row['category'], 'count': row['count']} for row in cursor.fetchall()]
-    conn.close()
+def _delete_card(cursor, card_id: int) -> bool:
+    """Delete one card and its progress data (write function, see writer.py)."""
+    cursor.execute("DELETE FROM review_history WHERE card_id = ?", (card_id,))
+    cursor.execute("DELETE FROM progress WHERE card_id = ?", (card_id,))
+    cursor.execute("DELETE FROM cards WHERE id = ?", (card_id,))
 
-    return categories
+    deleted = cursor.rowcount > 0
+    if deleted:
+        bump_catalog_version(cursor)
+    return deleted
 
 
-def get_topics(category: str = None) -> list:
-    """Get list of all topics with card counts."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@traced
+def update_card(card_id: int, **fields) -> bool:
+    """Update a card's fields."""
+    updates = {k: v for k, v in fields.items() if k in UPDATABLE_FIELDS}
 
-    if category:
-        cursor.execute("""
-            SELECT topic, COUNT(*) as count
-            FROM cards
-            WHERE category = ?
-            GROUP BY topic
-            ORDER BY topic
-        """, (category,))
-    else:
-        cursor.execute("""
-            SELECT topic, COUNT(*) as count
-            FROM cards
-            GROUP BY topic
-            ORDER BY topic
-        """)
-
-    topics = [{'topic': row['topic'], 'count': row['count']} for row in cursor.fetchall()]
-    conn.close()
+    if not updates:
+        return False
 
-    return topics
+    return run_write(_update_card, card_id, updates)
 
 
-def get_priorities(category: str = None) -> list:
-    """Get card counts by priority level."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@traced
+def delete_card(card_id: int) -> bool:
+    """Delete a card and its progress data."""
+    return run_write(_delete_card, card_id)
 
-    if category:
-        cursor.execute("""
-            SELECT priority, COUNT(*) as count
-            FROM cards
-            WHERE category = ?
-            GROUP BY priority
-            ORDER BY priority
-        """, (category,))
-    else:
-        cursor.execute("""
-            SELECT priority, COUNT(*) as count
-            FROM cards
-            GROUP BY priority
-            ORDER BY priority
-        """)
-
-    priorities = [{'priority': row['priority'], 'count': row['count']} for row in cursor.fetchall()]
-    conn.close()
 
-    return priorities
+def _update_cards(cursor, rows: list) -> set:
+    """
+    Apply (card_id, fields) rows and return the ids that exist (write function, see writer.py).
 
+    Rows changing the same set of fields share one executemany.
+    """
+    existing = _existing_card_ids(cursor, {card_id for card_id, _ in rows})
 
-def update_card(card_id: int, **fields) -> bool:
-    """Update a card's fields."""
-    allowed = {'french', 'english', 'pronunciation', 'topic', 'priority', 'category', 'image'}
-    updates = {k: v for k, v in fields.items() if k in allowed}
+    groups = {}
+    for card_id, fields in rows:
+        if card_id in existing:
+            key = tuple(sorted(fields))
+            groups.setdefault(key, []).append([fields[k] for k in key] + [card_id])
 
-    if not updates:
-        return False
+    for key, params in groups.items():
+        set_clause = ', '.join(f'{k} = ?' for k in key)
+        cursor.executemany(f"UPDATE cards SET {set_clause} WHERE id = ?", params)
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    if existing:
+        bump_catalog_version(cursor)
+    return existing
 
-    set_clause = ', '.join(f'{k} = ?' for k in updates.keys())
-    values = list(updates.values()) + [card_id]
 
-    cursor.execute(f"UPDATE cards SET {set_clause} WHERE id = ?", values)
-    updated = cursor.rowcount > 0
+def _delete_cards(cursor, card_ids: list) -> set:
+    """Delete cards and their progress data; returns the ids that existed (write function, see writer.py)."""
+    existing = _existing_card_ids(cursor, set(card_ids))
+    params = [(card_id,) for card_id in existing]
 
-    conn.commit()
-    conn.close()
+    # Cascades use the card_id indexes on review_history and progress
+    cursor.executemany("DELETE FROM review_history WHERE card_id = ?", params)
+    cursor.executemany("DELETE FROM progress WHERE card_id = ?", params)
+    cursor.executemany("DELETE FROM cards WHERE id = ?", params)
 
-    return updated
+    if existing:
+        bump_catalog_version(cursor)
+    return existing
 
 
-def delete_card(card_id: int) -> bool:
-    """Delete a card and its progress data."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@traced
+def update_cards_bulk(updates: list) -> list:
+    """
+    Update many cards in a single transaction.
 
-    cursor.execute("DELETE FROM review_history WHERE card_id = ?", (card_id,))
-    cursor.execute("DELETE FROM progress WHERE card_id = ?", (card_id,))
-    cursor.execute("DELETE FROM cards WHERE id = ?", (card_id,))
+    Rows changing the same set of fields share one executemany.
 
-    deleted = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    Args:
+        updates: List of dicts, each with an 'id' and the fields to change
+            (only UPDATABLE_FIELDS are applied)
 
-    return deleted
+    Returns:
+        list: One outcome per input row, in order:
+            {'id': card_id, 'status': 'updated' | 'not_found' | 'invalid'}
+    """
+    outcomes = []
+    rows = []  # (outcome, fields) for the valid rows
+
+    for row in updates:
+        card_id = row.get('id')
+        fields = {k: v for k, v in row.items() if k in UPDATABLE_FIELDS}
+        outcome = {'id': card_id, 'status': 'invalid'}
+        outcomes.append(outcome)
+        if card_id is not None and fields:
+            rows.append((outcome, fields))
+
+    existing = set()
+    if rows:
+        existing = run_write(_update_cards, [(outcome['id'], fields) for outcome, fields in rows])
+
+    for outcome, _ in rows:
+        outcome['status'] = 'updated' if outcome['id'] in existing else 'not_found'
+
+    return outcomes
+
+
+@traced
+def delete_cards_bulk(card_ids: list) -> list:
+    """
+    Delete many cards and their progress data in a single transaction.
+
+    Args:
+        card_ids: Card IDs to delete
+
+    Returns:
+        list: One outcome per input id, in order:
+            {'id': card_id, 'status': 'deleted' | 'not_found'}
+    """
+    card_ids = list(card_ids)
+    if not card_ids:
+        return []
+
+    existing = run_write(_delete_cards, list(dict.fromkeys(card_ids)))
+
+    return [{'id': card_id, 'status': 'deleted' if card_id in existing else 'not_found'}
+            for card_id in card_ids]
 
 
-def search_cards(query: str, category: str = None) -> list:
-    """Search cards by French or English text."""
-    conn = get_connection()
+def _fts_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Each word becomes a quoted term so FTS5 operators in the input are
+    treated as plain text. Words of two or more characters match as
+    prefixes so partially typed words match; a single character is
+    matched exactly, since expanding it would rank most of the catalog.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words)
+
+
+@traced
+def search_cards(query: str, category: str = None, limit: int = 50, offset: int = 0) -> list:
+    """
+    Search cards by French, English, pronunciation or topic.
+
+    Uses the cards_fts full-text index when available: matching is
+    accent-insensitive, partial words match as prefixes, and results are
+    ranked by relevance (bm25). Without FTS5, or for queries with no word
+    characters for it to index (e.g. "?!" or "'"), this falls back to a
+    LIKE scan of french and english that matches the text literally.
+
+    Args:
+        query: Search text
+        category: Optional category filter
+        limit: Maximum number of results (page size)
+        offset: Number of results to skip (for pagination)
+
+    Returns:
+        list: Matching cards, best match first
+    """
+    if not query.strip():
+        return []
+
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    search = f'%{query}%'
+    match = _fts_query(query)
 
-    if category:
-        cursor.execute("""
-            SELECT * FROM cards
-            WHERE (french LIKE ? OR english LIKE ?) AND category = ?
-            ORDER BY priority, id
-        """, (search, search, category))
+    if match and has_search_index(conn):
+        sql = """
+            SELECT c.* FROM cards_fts
+            JOIN cards c ON c.id = cards_fts.rowid
+            WHERE cards_fts MATCH ?
+        """
+        params = [match]
+
+        if category:
+            sql += " AND c.category = ?"
+            params.append(category)
+
+        sql += " ORDER BY cards_fts.rank, c.id LIMIT ? OFFSET ?"
+        params += [limit, offset]
     else:
-        cursor.execute("""
-            SELECT * FROM cards
-            WHERE french LIKE ? OR english LIKE ?
-            ORDER BY category, priority, id
-        """, (search, search))
+        search = '%' + re.sub(r'([\\%_])', r'\\\1', query) + '%'
+        sql = r"SELECT * FROM cards WHERE (french LIKE ? ESCAPE '\' OR english LIKE ? ESCAPE '\')"
+        params = [search, search]
+
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
 
+        sql += " ORDER BY category, priority, id LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+    cursor.execute(sql, params)
     cards = [dict(row) for row in cursor.fetchall()]
     conn.close()
 
     return cards
 
 
+@traced
 def load_default_vocabulary() -> int:
     """Load the default vocabulary into the database."""
     return add_cards_bulk(DEFAULT_VOCABULARY)
@@ -824,19 +921,15 @@ def reset_vocabulary():
     load_default_vocabulary()
 
 
+@traced
 def card_count(category: str = None) -> int:
     """Get total number of cards."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    catalog = get_catalog()
 
     if category:
-        cursor.execute("SELECT COUNT(*) FROM cards WHERE category = ?", (category,))
-    else:
-        cursor.execute("SELECT COUNT(*) FROM cards")
+        return catalog.count_by('category', category).get(category, 0)
 
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    return len(catalog)
 
 
 # Auto-load default vocabulary if database is empty
@@ -5,27 +5,96 @@ A web interface for the French learning system with flashcards,
 quiz mode, user management, and progress tracking.
 """
 
+import hmac
 import os
+import re
 import sys
+import time
+from collections import deque
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import (
+    Flask, render_template, request, jsonify, redirect, url_for,
+    abort, send_file, send_from_directory, g
+)
 
 from users import get_all_users, get_or_create_user
-from vocabulary import get_categories, get_cards
+from vocabulary import get_categories, get_cards, get_card
 from spaced_repetition import (
-    get_due_cards, review_card, get_priority_status,
-    get_review_stats, get_unlocked_priority
+    get_due_cards, review_card, get_priority_status, get_category_overview,
+    get_review_stats, get_review_stats_for_users, get_unlocked_priority
+)
+from quiz import (
+    get_quiz_categories, get_quiz_question, get_quiz_questions,
+    answer_quiz, get_category_info
+)
+from progress import (
+    get_summary, get_daily_reviews, get_difficult_cards, get_mastered_cards, get_learning_streaks
 )
-from quiz import get_quiz_categories, get_quiz_question, answer_quiz, get_category_info
-from progress import get_summary, get_daily_reviews, get_difficult_cards, get_mastered_cards
+from image_helper import IMAGES_DIR
+from image_store import get_blob, parse_image_ref
+import memory
+import metrics
+import profiler
+import query_stats
+import slow_query_log
+import tracing
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'french-learning-secret-key')
 
+# Let the front-end server (Apache mod_xsendfile, lighttpd, ...) send image files
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+
+# Stored images never change under a given hash
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Per-request SQL statistics (Server-Timing header and /debug/sql)
+app.config['SQL_STATS'] = os.environ.get('FRENCH_LEARNING_SQL_STATS', 'false').lower() == 'true'
+
+# Raise QueryBudgetExceeded when a route runs more statements than its budget
+app.config['ENFORCE_QUERY_BUDGETS'] = os.environ.get('FRENCH_LEARNING_QUERY_BUDGETS', 'false').lower() == 'true'
+
+# Log slow SQL statements to FRENCH_LEARNING_SLOW_QUERY_LOG (see slow_query_log.py)
+if slow_query_log.SLOW_QUERY_LOG:
+    slow_query_log.install()
+
+# Statement budgets per endpoint, measured on the default deck and users with
+# some headroom. Pages batch their per-user and per-category queries, so the
+# counts don't grow with the data; tests/test_query_budgets.py enforces them.
+ROUTE_QUERY_BUDGETS = {
+    'home': 8,
+    'user_dashboard': 12,
+    'flashcard_mode': 8,
+    'quiz_mode': 3,
+    'get_quiz': 8,
+    'get_quiz_batch': 8,
+    'submit_review': 8,
+    'submit_quiz_answer': 8,
+    'progress_page': 25,
+    'api_users': 2,
+    'api_user_stats': 8,
+}
+
+# Recent per-request stats served by /debug/sql
+SQL_STATS_HISTORY = 200
+_recent_sql_stats = deque(maxlen=SQL_STATS_HISTORY)
+
+# Route metrics served by /metrics (see metrics.py)
+REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                                    ['endpoint', 'method'])
+REQUESTS = metrics.counter('http_requests_total', 'Requests by endpoint and status', ['endpoint', 'method', 'status'])
+REQUESTS_IN_PROGRESS = metrics.gauge('http_requests_in_progress', 'Requests being handled')
+
+# Token required by /admin/ routes (X-Admin-Token header); unset disables them
+app.config['ADMIN_TOKEN'] = os.environ.get('FRENCH_LEARNING_ADMIN_TOKEN')
+
+memory.register_cache('sql_stats_history', lambda: memory.deep_sizeof(_recent_sql_stats))
+
 # Category display info
 CATEGORY_INFO = {
     'general': {'name': 'General French', 'emoji': '🇫🇷'},
@@ -38,19 +107,224 @@ CATEGORY_INFO = {
 }
 
 
+def _sql_stats_enabled() -> bool:
+    return app.config['SQL_STATS'] or app.config['ENFORCE_QUERY_BUDGETS']
+
+
+@app.before_request
+def start_profile():
+    """Profile this request if asked to (see profiler.py)."""
+    if profiler.enabled() and profiler.wants_profile(request.headers):
+        g.profile = profiler.start()
+
+
+@app.after_request
+def finish_profile(response):
+    """Write this request's profile and name the dump in a header."""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        path = profiler.stop(profile, request.endpoint or 'unknown')
+        response.headers['X-Profile-Dump'] = path.name
+    return response
+
+
+@app.teardown_request
+def abandon_profile(exc):
+    """Stop a profile left running by a failed request."""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.stop(profile, request.endpoint or 'unknown')
+
+
+@app.before_request
+def start_trace():
+    """Open a server span for this request when tracing is on (see tracing.py)."""
+    if tracing.enabled():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        g.trace_span, g.trace_token = tracing.start_span(
+            f"{request.method} {rule}", tracing.SPAN_KIND_SERVER,
+            {'http.method': request.method, 'http.route': rule, 'http.target': request.full_path.rstrip('?')},
+            traceparent=request.headers.get('traceparent'))
+
+
+@app.after_request
+def tag_trace(response):
+    """Record the response status on the request span."""
+    span = g.get('trace_span')
+    if span is not None:
+        span.attributes['http.status_code'] = response.status_code
+        if response.status_code >= 500:
+            span.status = tracing.STATUS_ERROR
+    return response
+
+
+@app.teardown_request
+def finish_trace(exc):
+    """Close the request span and export the trace."""
+    span = g.pop('trace_span', None)
+    if span is not None:
+        tracing.end_span(span, g.pop('trace_token'), exc)
+
+
+@app.before_request
+def start_metrics():
+    """Start timing this request."""
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_PROGRESS.inc()
+
+
+@app.after_request
+def record_metrics(response):
+    """Record this request's latency and status."""
+    start = g.get('metrics_start')
+    if start is not None:
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def finish_metrics(exc):
+    """Count the request as finished, even if it failed."""
+    if g.pop('metrics_start', None) is not None:
+        REQUESTS_IN_PROGRESS.dec()
+
+
+@app.before_request
+def start_sql_stats():
+    """Start counting SQL statements for this request."""
+    if _sql_stats_enabled():
+        query_stats.install()
+        g.sql_stats, g.sql_stats_token = query_stats.begin()
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def finish_sql_stats(response):
+    """Report this request's SQL statistics and check its query budget."""
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+        return response
+
+    endpoint = request.endpoint or 'unknown'
+    total_ms = (time.perf_counter() - g.request_start) * 1000
+    response.headers.add('Server-Timing',
+                         f'sql;dur={stats.seconds * 1000:.2f};desc="{stats.statements} statements", '
+                         f'db-connect;desc="{stats.connections} connections", '
+                         f'app;dur={total_ms:.2f}')
+
+    entry = stats.to_dict()
+    entry.update({'endpoint': endpoint, 'path': request.path, 'total_ms': round(total_ms, 3)})
+    _recent_sql_stats.append(entry)
+
+    budget = ROUTE_QUERY_BUDGETS.get(endpoint)
+    if budget is not None and stats.statements > budget:
+        if app.config['ENFORCE_QUERY_BUDGETS']:
+            query_stats.check_budget(stats, statements=budget, label=endpoint)
+        app.logger.warning("%s ran %d SQL statements (budget %d)", endpoint, stats.statements, budget)
+
+    return response
+
+
+@app.teardown_request
+def stop_sql_stats(exc):
+    """Stop counting, even if the request failed."""
+    token = g.pop('sql_stats_token', None)
+    if token is not None:
+        query_stats.end(token)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Operational metrics in the Prometheus text format.
+
+    Under gunicorn, set FRENCH_LEARNING_METRICS_DIR so every worker's
+    values are included whichever worker answers.
+    """
+    memory.update_metrics()
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _require_admin():
+    """Abort unless the request carries the admin token (404 if none is configured)."""
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        abort(403)
+
+
+@app.route('/admin/memory')
+def admin_memory():
+    """Memory report for the worker that answers: cache sizes and allocation growth.
+
+    Query parameters:
+        trace: 1 to diff tracemalloc snapshots (starts tracing on first use)
+        stop: 1 to stop tracemalloc
+        limit: Allocation sites to list (default 20)
+        group_by: lineno, filename or traceback
+    """
+    _require_admin()
+
+    report = {
+        'pid': os.getpid(),
+        'process': memory.process_memory(),
+        'caches': memory.cache_report(),
+    }
+
+    if request.args.get('stop') == '1':
+        memory.stop_tracemalloc()
+        report['tracemalloc'] = 'stopped'
+    elif request.args.get('trace') == '1':
+        limit = request.args.get('limit', 20, type=int)
+        group_by = request.args.get('group_by', 'lineno')
+        if group_by not in ('lineno', 'filename', 'traceback'):
+            return jsonify({'error': 'group_by must be lineno, filename or traceback'}), 400
+        report['tracemalloc'] = memory.tracemalloc_diff(limit=limit, group_by=group_by)
+
+    return jsonify(report)
+
+
+@app.route('/debug/sql')
+def debug_sql():
+    """Recent per-request SQL statistics, with per-endpoint summaries.
+
+    Only available when FRENCH_LEARNING_SQL_STATS is enabled.
+    """
+    if not app.config['SQL_STATS']:
+        abort(404)
+
+    recent = [entry for entry in _recent_sql_stats if entry['endpoint'] != 'debug_sql']
+    endpoints = {}
+    for entry in recent:
+        summary = endpoints.setdefault(entry['endpoint'], {
+            'requests': 0, 'max_statements': 0, 'max_connections': 0, 'sql_ms': 0.0,
+            'budget': ROUTE_QUERY_BUDGETS.get(entry['endpoint'])
+        })
+        summary['requests'] += 1
+        summary['max_statements'] = max(summary['max_statements'], entry['statements'])
+        summary['max_connections'] = max(summary['max_connections'], entry['connections'])
+        summary['sql_ms'] += entry['sql_ms']
+
+    for summary in endpoints.values():
+        summary['avg_sql_ms'] = round(summary.pop('sql_ms') / summary['requests'], 3)
+
+    return jsonify({'endpoints': endpoints, 'recent': recent[-50:]})
+
+
 @app.route('/')
 def home():
     """Home page - user selection."""
     users = get_all_users()
 
-    # Add stats for each user
+    # Stats for every user in a fixed number of queries
+    stats = get_review_stats_for_users(users)
+    streaks = get_learning_streaks(users)
     for user in users:
-        stats = get_review_stats(user['name'])
-        user['cards_learned'] = stats['cards_learned']
-        user['cards_due'] = stats['cards_due']
-        from progress import get_learning_streak
-        streak = get_learning_streak(user['name'])
-        user['current_streak'] = streak['current_streak']
+        user['cards_learned'] = stats[user['id']]['cards_learned']
+        user['cards_due'] = stats[user['id']]['cards_due']
+        user['current_streak'] = streaks[user['id']]['current_streak']
 
     return render_template('home.html', users=users)
 
@@ -62,6 +336,9 @@ def user_dashboard(name):
     categories = get_categories()
     quiz_categories = get_quiz_categories()
 
+    # Priority tiers and due counts for every category in one query
+    overview = get_category_overview(name, due_limit=100)
+
     # Enrich categories with display info and progress
     for cat in categories:
         cat_name = cat['category']
@@ -69,14 +346,8 @@ def user_dashboard(name):
         cat['name'] = info['name']
         cat['emoji'] = info['emoji']
         cat['is_quiz'] = cat_name in quiz_categories
-
-        # Get priority status for this category
-        priority_status = get_priority_status(name, cat_name)
-        cat['tiers'] = priority_status
-
-        # Count due cards
-        due_cards = get_due_cards(name, category=cat_name, limit=100)
-        cat['due_count'] = len(due_cards)
+        cat['tiers'] = overview.get(cat_name, {}).get('tiers', [])
+        cat['due_count'] = overview.get(cat_name, {}).get('due_count', 0)
 
     stats = get_review_stats(name)
 
@@ -166,6 +437,26 @@ def get_quiz(name, cat):
     return jsonify(question)
 
 
+@app.route('/user/<name>/quiz/questions/<cat>')
+def get_quiz_batch(name, cat):
+    """Get a batch of quiz questions (AJAX).
+
+    Query params:
+        count: Number of questions (default 5)
+        exclude: Comma-separated card IDs to avoid as targets
+    """
+    count = request.args.get('count', 5, type=int)
+    exclude = request.args.get('exclude', '')
+    exclude_ids = [int(x) for x in exclude.split(',') if x.strip().isdigit()]
+
+    questions = get_quiz_questions(name, cat, count=count, exclude_ids=exclude_ids)
+
+    if questions is None:
+        return jsonify({'error': 'Not enough cards for quiz'}), 400
+
+    return jsonify({'questions': questions})
+
+
 @app.route('/user/<name>/quiz/answer', methods=['POST'])
 def submit_quiz_answer(name):
     """Submit quiz answer (AJAX)."""
@@ -197,6 +488,51 @@ def progress_page(name):
                          mastered_cards=mastered)
 
 
+@app.route('/images/<image_hash>')
+def serve_image(image_hash):
+    """Serve a stored image by content hash.
+
+    The hash is a strong ETag and the response is cacheable forever.
+    Conditional and Range requests are answered by send_file.
+    """
+    if not IMAGE_HASH_PATTERN.match(image_hash):
+        abort(404)
+
+    blob = get_blob(image_hash)
+    if blob is None or not os.path.exists(blob['path']):
+        abort(404)
+
+    response = send_file(blob['path'], mimetype=blob['content_type'] or 'application/octet-stream',
+                         conditional=True, etag=image_hash, max_age=IMAGE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/cards/<int:card_id>/image')
+def serve_card_image(card_id):
+    """Serve a card's image.
+
+    Stored images redirect to their hash URL, so browsers cache the
+    content once however many cards share it. Older file-path images
+    under IMAGES_DIR are sent directly.
+    """
+    card = get_card(card_id)
+    if card is None or not card['image']:
+        abort(404)
+
+    image_hash = parse_image_ref(card['image'])
+    if image_hash:
+        return redirect(url_for('serve_image', image_hash=image_hash))
+
+    try:
+        relative = Path(card['image']).resolve().relative_to(IMAGES_DIR.resolve())
+    except ValueError:
+        abort(404)  # Emoji or a file outside the images directory
+
+    return send_from_directory(IMAGES_DIR, relative, conditional=True)
+
+
 @app.route('/api/users')
 def api_users():
     """API: Get all users."""
@@ -6,6 +6,16 @@ let totalCount = 0;
 let isAnswered = false;
 const MAX_QUESTIONS = 10;
 
+// Client-side question buffer so the next question renders instantly
+const BUFFER_SIZE = 3;
+let questionBuffer = [];
+let answeredIds = [];
+let bufferRequest = null;
+let bufferAbort = null;
+
+// Bumped by startNewQuiz, so batches requested for an earlier quiz are dropped
+let quizGeneration = 0;
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
     loadNextQuestion();
@@ -37,17 +47,25 @@ async function loadNextQuestion() {
         btn.disabled = false;
     });
 
-    // Show loading state
-    document.getElementById('quiz-french-word').textContent = 'Loading...';
-    document.getElementById('quiz-pronunciation').textContent = '';
-
     try {
-        const response = await fetch(questionUrl);
-        if (!response.ok) {
+        if (questionBuffer.length === 0) {
+            // Show loading state
+            document.getElementById('quiz-french-word').textContent = 'Loading...';
+            document.getElementById('quiz-pronunciation').textContent = '';
+            const generation = quizGeneration;
+            await fillBuffer();
+            if (generation !== quizGeneration) {
+                return;  // a new quiz started while we waited
+            }
+        }
+
+        currentQuestion = questionBuffer.shift();
+        if (!currentQuestion) {
             throw new Error('Failed to load question');
         }
 
-        currentQuestion = await response.json();
+        // Top up the buffer in the background
+        fillBuffer();
 
         // Update question display
         document.getElementById('quiz-french-word').textContent = currentQuestion.card.french;
@@ -57,7 +75,15 @@ async function loadNextQuestion() {
         currentQuestion.options.forEach((option, index) => {
             const btn = document.querySelector(`.option-btn[data-index="${index}"]`);
             const imageSpan = btn.querySelector('.option-image');
-            imageSpan.textContent = option.image;
+            const src = optionImageSrc(option);
+            if (src) {
+                const img = document.createElement('img');
+                img.src = src;
+                img.alt = '';
+                imageSpan.replaceChildren(img);
+            } else {
+                imageSpan.textContent = option.image;
+            }
         });
 
     } catch (error) {
@@ -66,8 +92,101 @@ async function loadNextQuestion() {
     }
 }
 
+// URL for an option's picture, or null if the image is an emoji
+function optionImageSrc(option) {
+    const image = option.image || '';
+    if (image.startsWith('blob:')) {
+        return imageUrl.replace('__hash__', image.slice(5));
+    }
+    if (/[\/\\.]/.test(image)) {
+        return cardImageUrl.replace(/0\/image$/, `${option.id}/image`);
+    }
+    return null;
+}
+
+// Warm the browser cache for buffered questions' pictures
+function preloadImages(questions) {
+    questions.forEach(question => {
+        question.options.forEach(option => {
+            const src = optionImageSrc(option);
+            if (src) {
+                new Image().src = src;
+            }
+        });
+    });
+}
+
+// Fetch a batch of questions into the buffer (one request at a time)
+function fillBuffer() {
+    if (bufferRequest) {
+        return bufferRequest;
+    }
+
+    const remaining = MAX_QUESTIONS - totalCount - (currentQuestion && !isAnswered ? 1 : 0);
+    const needed = Math.min(BUFFER_SIZE - questionBuffer.length, remaining - questionBuffer.length);
+    if (needed <= 0) {
+        return Promise.resolve();
+    }
+
+    // Skip cards already answered, buffered or on screen
+    const exclude = answeredIds.concat(questionBuffer.map(q => q.card.id));
+    if (currentQuestion) {
+        exclude.push(currentQuestion.card.id);
+    }
+
+    const url = `${questionsUrl}?count=${needed}&exclude=${exclude.join(',')}`;
+
+    const generation = quizGeneration;
+    const controller = new AbortController();
+    bufferAbort = controller;
+
+    bufferRequest = fetch(url, { signal: controller.signal })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Failed to load questions');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (generation !== quizGeneration) {
+                return;
+            }
+            questionBuffer.push(...data.questions);
+            preloadImages(data.questions);
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error('Error loading questions:', error);
+            }
+        })
+        .finally(() => {
+            if (generation === quizGeneration) {
+                bufferRequest = null;
+                bufferAbort = null;
+            }
+        });
+
+    return bufferRequest;
+}
+
+// Post an answer without blocking the UI
+function submitAnswer(cardId, isCorrect) {
+    fetch(answerUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            card_id: cardId,
+            correct: isCorrect
+        })
+    }).catch(error => {
+        console.error('Error submitting answer:', error);
+    });
+}
+
 // Handle option selection
-async function selectOption(index) {
+function selectOption(index) {
     if (isAnswered || !currentQuestion) return;
 
     isAnswered = true;
@@ -99,21 +218,9 @@ async function selectOption(index) {
         correctBtn.classList.add('show-correct');
     }
 
-    // Submit answer to server
-    try {
-        await fetch(answerUrl, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                card_id: currentQuestion.card.id,
-                correct: isCorrect
-            })
-        });
-    } catch (error) {
-        console.error('Error submitting answer:', error);
-    }
+    // Submit answer to server in the background
+    answeredIds.push(currentQuestion.card.id);
+    submitAnswer(currentQuestion.card.id, isCorrect);
 
     // Update score display
     document.getElementById('score-correct').textContent = correctCount;
@@ -210,6 +317,16 @@ function startNewQuiz() {
     totalCount = 0;
     currentQuestion = null;
     isAnswered = false;
+    questionBuffer = [];
+    answeredIds = [];
+
+    // Drop any batch still loading for the previous quiz
+    quizGeneration++;
+    if (bufferAbort) {
+        bufferAbort.abort();
+    }
+    bufferRequest = null;
+    bufferAbort = null;
 
     document.getElementById('score-correct').textContent = '0';
     document.getElementById('score-total').textContent = '0';
@@ -0,0 +1,272 @@
+"""
+Single Writer
+=============
+Serializes database writes through one writer thread per process.
+
+SQLite allows one writer at a time. Without this, every web thread that
+records a review opens its own connection and competes for the write
+lock, sleeping in SQLite's busy handler and retrying while the others
+commit. With FRENCH_LEARNING_SINGLE_WRITER=true, mutations are queued
+instead and run by a single thread:
+
+    future = submit(_insert_user, name)     # concurrent.futures.Future
+    user_id = future.result()
+
+    user_id = run_write(_insert_user, name) # submit and wait
+
+A write function takes a cursor as its first argument, runs its
+statements and returns a result; it never commits. The writer thread
+drains whatever is queued (up to BATCH_SIZE) into one BEGIN IMMEDIATE
+transaction, so a burst of reviews costs one lock acquisition and one
+commit. Each write runs in its own savepoint: one that raises is rolled
+back on its own and its future gets the exception, while the rest of the
+batch commits. Futures are resolved only after the commit.
+
+When the writer is disabled (the default), run_write runs the function
+in the calling thread, in a BEGIN IMMEDIATE transaction of its own.
+
+Either way the write lock is taken before the write function runs, so
+its reads and writes are atomic: two tabs reviewing the same card are
+applied one after the other, never both from the same starting point.
+SQLite's own busy wait is kept short (BUSY_TIMEOUT_MS); when the lock is
+still held (SQLITE_BUSY, "database is locked") the whole transaction is
+rolled back and retried after a jittered, exponentially growing pause,
+up to WRITE_ATTEMPTS times. Retries and give-ups are counted in the
+db_write_retries_total and db_locked_errors_total metrics.
+
+A write function may be run again when its transaction is retried, so
+it must not depend on state it consumed on an earlier attempt.
+
+Asyncio code can await a write with asyncio.wrap_future(submit(...)).
+
+For the writer not to be blocked by readers (and vice versa), also set
+FRENCH_LEARNING_JOURNAL_MODE=wal. Each gunicorn worker has its own
+writer, so writes from different workers still take turns on the lock.
+"""
+
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from database import get_connection
+from metrics import counter, gauge, histogram
+
+SINGLE_WRITER = os.environ.get('FRENCH_LEARNING_SINGLE_WRITER', 'false').lower() == 'true'
+
+# Most writes committed in one transaction
+BATCH_SIZE = 64
+
+# Busy handling: SQLite waits up to BUSY_TIMEOUT_MS for the lock, then the
+# transaction is retried after a random pause of up to
+# min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) seconds
+WRITE_ATTEMPTS = 10
+BUSY_TIMEOUT_MS = 100
+BACKOFF_BASE = 0.005
+BACKOFF_MAX = 0.5
+
+WRITE_RETRIES = counter('db_write_retries_total', 'Write transactions retried after SQLITE_BUSY', ['operation'])
+DB_LOCKED = counter('db_locked_errors_total', 'Writes abandoned because the database stayed locked', ['operation'])
+WRITE_BATCH = histogram('db_write_batch_size', 'Writes committed per writer transaction',
+                        buckets=(1, 2, 4, 8, 16, 32, 64))
+WRITE_QUEUE = gauge('db_write_queue_depth', 'Writes waiting for the writer thread')
+
+# Writer state, per process (a forked worker starts its own thread)
+_start_lock = threading.Lock()
+_queue = None
+_writer_thread = None
+_writer_pid = None
+
+
+class _Write:
+    __slots__ = ('fn', 'args', 'kwargs', 'future')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+def enabled() -> bool:
+    """Whether writes go through the writer thread."""
+    return SINGLE_WRITER
+
+
+def _ensure_writer():
+    global _queue, _writer_thread, _writer_pid
+    if _writer_pid == os.getpid():
+        return
+    with _start_lock:
+        if _writer_pid != os.getpid():
+            _queue = queue.SimpleQueue()
+            _writer_thread = threading.Thread(target=_writer_loop, args=(_queue,), name='db-writer', daemon=True)
+            _writer_thread.start()
+            _writer_pid = os.getpid()
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """
+    Queue a write for the writer thread.
+
+    Args:
+        fn: Write function, called as fn(cursor, *args, **kwargs)
+
+    Returns:
+        Future: Resolves to fn's result once its transaction commits
+    """
+    _ensure_writer()
+    if threading.current_thread() is _writer_thread:
+        raise RuntimeError("Write functions cannot queue further writes")
+    write = _Write(fn, args, kwargs)
+    _queue.put(write)
+    return write.future
+
+
+def run_write(fn, *args, **kwargs):
+    """
+    Run a write function and return its result once committed.
+
+    Goes through the writer thread when enabled, otherwise runs on a new
+    connection in the calling thread.
+
+    Args:
+        fn: Write function, called as fn(cursor, *args, **kwargs)
+
+    Returns:
+        Whatever fn returns
+    """
+    if SINGLE_WRITER:
+        return submit(fn, *args, **kwargs).result()
+
+    return with_busy_retry(_operation_name(fn), lambda: _run_inline(fn, args, kwargs))
+
+
+def is_busy(error: Exception) -> bool:
+    """Whether an error means another connection holds the lock (SQLITE_BUSY)."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def with_busy_retry(operation: str, attempt):
+    """
+    Call attempt() until it doesn't fail with SQLITE_BUSY.
+
+    Each retry sleeps a random time up to an exponentially growing cap
+    (full jitter), so writers that collided spread out instead of
+    colliding again.
+
+    Args:
+        operation: Name used in the retry metrics
+        attempt: Callable running one whole transaction; it must leave
+            nothing behind when it fails
+
+    Returns:
+        Whatever attempt returns
+
+    Raises:
+        sqlite3.OperationalError: If still busy after WRITE_ATTEMPTS tries
+    """
+    for tries in range(1, WRITE_ATTEMPTS + 1):
+        try:
+            return attempt()
+        except sqlite3.OperationalError as e:
+            if not is_busy(e):
+                raise
+            if tries == WRITE_ATTEMPTS:
+                DB_LOCKED.inc(operation=operation)
+                raise
+            WRITE_RETRIES.inc(operation=operation)
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** tries)))
+
+
+def _operation_name(fn) -> str:
+    return getattr(fn, '__name__', 'write').lstrip('_')
+
+
+def _open_write_connection():
+    conn = get_connection(timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.isolation_level = None  # transactions are managed explicitly
+    return conn
+
+
+def _run_inline(fn, args, kwargs):
+    conn = _open_write_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(cursor, *args, **kwargs)
+            cursor.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        return result
+    finally:
+        conn.close()
+
+
+def _writer_loop(pending: queue.SimpleQueue):
+    while True:
+        batch = [pending.get()]
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(pending.get_nowait())
+            except queue.Empty:
+                break
+
+        batch = [write for write in batch if write.future.set_running_or_notify_cancel()]
+        if batch:
+            _run_batch(batch)
+        WRITE_QUEUE.set(pending.qsize())
+
+
+def _run_batch(batch: list):
+    # A connection per batch (not per write) follows reset_db and DB_PATH changes
+    conn = _open_write_connection()
+    try:
+        outcomes = with_busy_retry('batch', lambda: _commit_batch(conn, batch))
+    except Exception as e:
+        # Lock never freed, failed commit...: nothing in the batch was written
+        for write in batch:
+            write.future.set_exception(e)
+        return
+    finally:
+        conn.close()
+
+    WRITE_BATCH.observe(len(batch))
+    for write, result, error in outcomes:
+        if error is not None:
+            write.future.set_exception(error)
+        else:
+            write.future.set_result(result)
+
+
+def _commit_batch(conn, batch: list) -> list:
+    """Run a batch in one transaction; returns (write, result, error) per write."""
+    cursor = conn.cursor()
+    outcomes = []
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for write in batch:
+            cursor.execute("SAVEPOINT write")
+            try:
+                result = write.fn(cursor, *write.args, **write.kwargs)
+            except Exception as e:
+                cursor.execute("ROLLBACK TO write")
+                cursor.execute("RELEASE write")
+                outcomes.append((write, None, e))
+            else:
+                cursor.execute("RELEASE write")
+                outcomes.append((write, result, None))
+        cursor.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    return outcomes